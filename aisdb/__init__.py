@@ -25,6 +25,8 @@ from .database.dbconn import DBConn, SQLiteDBConn, PostgresDBConn
 
 from .database.dbqry import DBQuery
 
+from .database.archive import MonthArchive, export_month_archive
+
 from .database import sqlfcn
 
 from .database import sqlfcn_callbacks
@@ -59,6 +61,12 @@ from .proc_util import (
     write_csv,
 )
 
+from .track import Track
+
+from .track_batch import TrackBatch
+
+from .pipeline import run_pipeline
+
 from .track_gen import (
     TrackGen,
     split_timedelta,
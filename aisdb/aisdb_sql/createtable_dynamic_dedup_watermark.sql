@@ -0,0 +1,4 @@
+CREATE TABLE IF NOT EXISTS dynamic_dedup_watermark (
+    month TEXT PRIMARY KEY,
+    xid BIGINT NOT NULL
+);
@@ -0,0 +1,7 @@
+CREATE VIRTUAL TABLE IF NOT EXISTS rtree_{0}_dynamic USING rtree(
+  id,
+  longitude0, longitude1,
+  latitude0, latitude1,
+  +mmsi INTEGER,
+  +time INTEGER
+);
@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+    path TEXT PRIMARY KEY,
+    size BIGINT NOT NULL,
+    mtime DOUBLE PRECISION NOT NULL,
+    hash TEXT NOT NULL,
+    ingested_bytes BIGINT NOT NULL
+);
@@ -0,0 +1,12 @@
+CREATE TABLE IF NOT EXISTS partition_catalog (
+    month TEXT PRIMARY KEY,
+    row_count BIGINT NOT NULL,
+    mmsi_count BIGINT NOT NULL,
+    time_min INTEGER,
+    time_max INTEGER,
+    longitude_min REAL,
+    longitude_max REAL,
+    latitude_min REAL,
+    latitude_max REAL,
+    updated_at BIGINT NOT NULL
+);
@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS static_aggregate_watermark (
+    month TEXT PRIMARY KEY,
+    watermark BIGINT NOT NULL,
+    row_count BIGINT NOT NULL
+);
@@ -0,0 +1,12 @@
+CREATE TABLE IF NOT EXISTS vessel_day_summary (
+    day INTEGER NOT NULL,
+    mmsi INTEGER NOT NULL,
+    row_count BIGINT NOT NULL,
+    time_min INTEGER NOT NULL,
+    time_max INTEGER NOT NULL,
+    longitude_min REAL NOT NULL,
+    longitude_max REAL NOT NULL,
+    latitude_min REAL NOT NULL,
+    latitude_max REAL NOT NULL,
+    PRIMARY KEY (day, mmsi)
+);
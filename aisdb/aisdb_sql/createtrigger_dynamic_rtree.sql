@@ -0,0 +1,9 @@
+CREATE TRIGGER IF NOT EXISTS rtree_{0}_dynamic_insert
+AFTER INSERT ON ais_{0}_dynamic
+BEGIN
+  INSERT INTO rtree_{0}_dynamic
+    (longitude0, longitude1, latitude0, latitude1, mmsi, time)
+  VALUES
+    (new.longitude, new.longitude, new.latitude, new.latitude,
+     new.mmsi, new.time);
+END;
@@ -0,0 +1,10 @@
+  SELECT DISTINCT
+    d.mmsi, 
+    d.time, 
+    d.longitude,
+    d.latitude,
+    d.sog,
+    d.cog
+  FROM ais_dynamic AS d
+  WHERE
+    ({}) AND
@@ -0,0 +1,12 @@
+  SELECT 
+    agg.mmsi, 
+    TRIM(agg.vessel_name) as vessel_name, 
+    agg.ship_type,
+    agg.dim_bow, 
+    agg.dim_stern, 
+    agg.dim_port, 
+    agg.dim_star, 
+    agg.imo,
+    {} AS time0,
+    {} AS time1
+  FROM static_{}_aggregate AS agg
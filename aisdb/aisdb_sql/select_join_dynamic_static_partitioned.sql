@@ -0,0 +1,22 @@
+SELECT DISTINCT
+    dynamic_all.mmsi,
+    dynamic_all.time,
+    dynamic_all.longitude,
+    dynamic_all.latitude,
+    dynamic_all.sog,
+    dynamic_all.cog,
+    static_all.imo,
+    static_all.vessel_name,
+    static_all.dim_bow,
+    static_all.dim_stern,
+    static_all.dim_port,
+    static_all.dim_star,
+    static_all.ship_type,
+    ref.coarse_type_txt AS ship_type_txt
+  FROM dynamic_all
+  LEFT JOIN static_all ON
+    dynamic_all.mmsi = static_all.mmsi AND
+    dynamic_all.time >= static_all.time0 AND
+    dynamic_all.time < static_all.time1
+  LEFT JOIN ref ON
+    static_all.ship_type = ref.coarse_type
@@ -0,0 +1,291 @@
+''' memory-mapped columnar archives of monthly tables, for replaying closed
+    months without a database connection
+'''
+
+from datetime import datetime
+import json
+import os
+
+import numpy as np
+import psycopg
+
+from aisdb.database.dbconn import PostgresDBConn, SQLiteDBConn
+from aisdb.gis import dt_2_epoch
+
+# fixed-width numpy types of position report columns stored in the archive,
+# in the order they are selected from ais_{month}_dynamic.
+# null values in float columns are stored as NaN
+_dynamic_dtypes = {
+    'mmsi': np.uint32,
+    'time': np.uint32,
+    'longitude': np.float64,
+    'latitude': np.float64,
+    'sog': np.float32,
+    'cog': np.float32,
+}
+
+# static vessel columns stored for each MMSI in the archive.
+# null values are stored as zero or an empty string
+_static_dtypes = {
+    'imo': np.int64,
+    'vessel_name': str,
+    'ship_type': np.int64,
+    'ship_type_txt': str,
+    'dim_bow': np.int64,
+    'dim_stern': np.int64,
+    'dim_port': np.int64,
+    'dim_star': np.int64,
+}
+
+_sql_select_dynamic = '''
+  SELECT d.mmsi, d.time, d.longitude, d.latitude, d.sog, d.cog
+  FROM ais_{month}_dynamic AS d
+  ORDER BY d.mmsi, d.time
+'''
+
+_sql_select_static = '''
+  SELECT
+    agg.mmsi, agg.imo, TRIM(agg.vessel_name) AS vessel_name, agg.ship_type,
+    ref.coarse_type_txt AS ship_type_txt, agg.dim_bow, agg.dim_stern,
+    agg.dim_port, agg.dim_star
+  FROM static_{month}_aggregate AS agg
+  LEFT JOIN coarsetype_ref AS ref ON agg.ship_type = ref.coarse_type
+  ORDER BY agg.mmsi
+'''
+
+# archive format version stored in metadata.json
+_archive_version = 1
+
+
+def _tuple_cursor(dbconn):
+    ''' create a cursor returning rows as tuples '''
+    if isinstance(dbconn, PostgresDBConn):
+        return dbconn.cursor(row_factory=psycopg.rows.tuple_row)
+    cur = dbconn.cursor()
+    cur.row_factory = None
+    return cur
+
+
+def _table_exists(cur, dbconn, name):
+    if isinstance(dbconn, PostgresDBConn):
+        cur.execute(
+            'SELECT table_name FROM information_schema.tables '
+            'WHERE table_name = %s', [name])
+    else:
+        cur.execute(
+            'SELECT name FROM sqlite_master '
+            'WHERE type="table" AND name=?', [name])
+    return cur.fetchall() != []
+
+
+def export_month_archive(dbconn,
+                         month: str,
+                         dirpath: str,
+                         batchsize: int = 10**5,
+                         verbose: bool = True):
+    ''' write position reports and static vessel data for a month to a
+        columnar archive, which can be read without a database using
+        :class:`MonthArchive`.
+
+        the archive is a directory named ``ais_{month}`` containing a
+        ``.npy`` file for each position report column, sorted by MMSI and
+        time, and an index of the first row of each MMSI. static columns
+        from the ``static_{month}_aggregate`` table are stored for each
+        MMSI in the index. the month should be closed, as rows inserted
+        after exporting will not be included in the archive. an existing
+        archive for the month will be replaced
+
+        args:
+            dbconn (:class:`aisdb.database.dbconn.ConnectionType`)
+                database connection object
+            month (string)
+                month to export, with format YYYYmm
+            dirpath (string)
+                parent directory of the archive
+            batchsize (int)
+                number of rows fetched from the database at a time
+            verbose (bool)
+                logs messages to stdout
+
+        returns:
+            path to the archive directory
+    '''
+    assert isinstance(dbconn, (SQLiteDBConn, PostgresDBConn))
+    path = os.path.join(dirpath, f'ais_{month}')
+    os.makedirs(path, exist_ok=True)
+    cur = _tuple_cursor(dbconn)
+
+    if not _table_exists(cur, dbconn, f'ais_{month}_dynamic'):
+        raise ValueError(f'no table ais_{month}_dynamic in database')
+    if (_table_exists(cur, dbconn, f'ais_{month}_static')
+            and not _table_exists(cur, dbconn, f'static_{month}_aggregate')):
+        dbconn.aggregate_static_msgs([month], verbose)
+
+    if verbose:
+        print(f'exporting ais_{month}_dynamic to {path}...')
+    cur.execute(f'SELECT COUNT(*) FROM ais_{month}_dynamic')
+    count = cur.fetchone()[0]
+    if count == 0:
+        raise ValueError(f'no rows to export in ais_{month}_dynamic')
+
+    # columns are written to memory-mapped files as rows are fetched
+    columns = {
+        col: np.lib.format.open_memmap(os.path.join(path, f'{col}.npy'),
+                                       mode='w+',
+                                       dtype=dtype,
+                                       shape=(count, ))
+        for col, dtype in _dynamic_dtypes.items()
+    }
+    dtype = np.dtype([(col, np.float64 if np.dtype(dt).kind == 'f' else dt)
+                      for col, dt in _dynamic_dtypes.items()])
+    cur.execute(_sql_select_dynamic.format(month=month))
+    offset = 0
+    res = cur.fetchmany(batchsize)
+    while len(res) > 0:
+        batch = np.array(
+            [tuple(np.nan if v is None else v for v in row) for row in res],
+            dtype=dtype)
+        for col, arr in columns.items():
+            arr[offset:offset + len(batch)] = batch[col]
+        offset += len(batch)
+        res = cur.fetchmany(batchsize)
+    assert offset == count, 'rows were inserted while exporting'
+
+    # index of the first row of each MMSI. the last offset is the row count
+    mmsi = columns['mmsi']
+    starts = np.append(0, np.nonzero(mmsi[1:] != mmsi[:-1])[0] + 1)
+    index_mmsi = np.array(mmsi[starts])
+    index_offsets = np.append(starts, count).astype(np.int64)
+    np.save(os.path.join(path, 'index_mmsi.npy'), index_mmsi)
+    np.save(os.path.join(path, 'index_offsets.npy'), index_offsets)
+    for arr in columns.values():
+        arr.flush()
+    del columns, mmsi
+
+    # static columns aligned with the MMSI index
+    static = {col: [None] * len(index_mmsi) for col in _static_dtypes.keys()}
+    if _table_exists(cur, dbconn, f'static_{month}_aggregate'):
+        cur.execute(_sql_select_static.format(month=month))
+        for row in cur.fetchall():
+            i = np.searchsorted(index_mmsi, row[0])
+            if i == len(index_mmsi) or index_mmsi[i] != row[0]:
+                continue
+            for col, val in zip(_static_dtypes.keys(), row[1:]):
+                static[col][i] = val
+    for col, dtype in _static_dtypes.items():
+        if dtype is str:
+            values = np.array([v or '' for v in static[col]], dtype=str)
+        else:
+            values = np.array([v or 0 for v in static[col]], dtype=dtype)
+        np.save(os.path.join(path, f'static_{col}.npy'), values)
+    cur.close()
+
+    with open(os.path.join(path, 'metadata.json'), 'w') as f:
+        json.dump(
+            {
+                'version': _archive_version,
+                'month': month,
+                'row_count': int(count),
+                'mmsi_count': len(index_mmsi),
+                'exported': datetime.now().isoformat(),
+            }, f)
+    if verbose:
+        print(f'exported {count} rows for {len(index_mmsi)} vessels')
+    return path
+
+
+class MonthArchive():
+    ''' read-only, memory-mapped columnar archive of a month, created with
+        :func:`export_month_archive`. arrays are sliced for each MMSI without
+        copying, so tracks can be replayed without a database connection.
+
+        attributes:
+            path (string)
+                archive directory
+            month (string)
+                month of the archive, with format YYYYmm
+            mmsis (numpy.ndarray)
+                unique MMSIs in the archive, in sorted order
+
+        example:
+
+        >>> from aisdb import TrackGen
+        >>> from aisdb.database.archive import MonthArchive
+        >>> archive = MonthArchive('archive/ais_202107')
+        >>> for track in TrackGen(archive.gen_qry(), decimate=False):
+        ...     print(track['mmsi'], track['time'])
+    '''
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'metadata.json'), 'r') as f:
+            self.metadata = json.load(f)
+        if self.metadata['version'] != _archive_version:
+            raise ValueError(
+                f'unsupported archive version {self.metadata["version"]}')
+        self.path = path
+        self.month = self.metadata['month']
+        self.mmsis = np.load(os.path.join(path, 'index_mmsi.npy'))
+        self._offsets = np.load(os.path.join(path, 'index_offsets.npy'))
+        self._dynamic = {
+            col: np.load(os.path.join(path, f'{col}.npy'), mmap_mode='r')
+            for col in _dynamic_dtypes.keys()
+        }
+        self._static = {
+            col: np.load(os.path.join(path, f'static_{col}.npy'),
+                         mmap_mode='r')
+            for col in _static_dtypes.keys()
+        }
+
+    def __len__(self):
+        return self.metadata['row_count']
+
+    def _rows(self, i, start, end):
+        ''' columns for the i-th MMSI in the index, within the time range '''
+        lo, hi = self._offsets[i], self._offsets[i + 1]
+        if start is not None or end is not None:
+            time = self._dynamic['time'][lo:hi]
+            if start is not None:
+                lo += np.searchsorted(time, dt_2_epoch(start), side='left')
+            if end is not None:
+                hi = self._offsets[i] + np.searchsorted(
+                    time, dt_2_epoch(end), side='right')
+        if lo >= hi:
+            return None
+        return dict(
+            **{col: arr[lo:hi]
+               for col, arr in self._dynamic.items()},
+            **{col: arr[i:i + 1]
+               for col, arr in self._static.items()},
+        )
+
+    def gen_qry(self, start=None, end=None, mmsis=None):
+        ''' yield a dictionary of column arrays for each MMSI in the archive,
+            in the same format as
+            :meth:`aisdb.database.dbqry.DBQuery.gen_qry` with
+            ``columnar=True``. results can be passed to
+            :func:`aisdb.track_gen.TrackGen`
+
+            args:
+                start (datetime)
+                    if not None, positions before this time are skipped
+                end (datetime)
+                    if not None, positions after this time are skipped
+                mmsis (list)
+                    if not None, only these vessels will be selected
+
+            yields:
+                dictionary of column arrays for each unique MMSI.
+                static columns contain a single value
+        '''
+        if mmsis is None:
+            indexes = range(len(self.mmsis))
+        else:
+            mmsis = np.unique(np.asarray(mmsis, dtype=self.mmsis.dtype))
+            indexes = np.searchsorted(self.mmsis, mmsis)
+            found = indexes < len(self.mmsis)
+            found[found] = self.mmsis[indexes[found]] == mmsis[found]
+            indexes = indexes[found]
+        for i in indexes:
+            rows = self._rows(i, start, end)
+            if rows is not None:
+                yield rows
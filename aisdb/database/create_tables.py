@@ -9,5 +9,42 @@ with open(os.path.join(sqlpath, 'createtable_dynamic_clustered.sql'),
 with open(os.path.join(sqlpath, 'createtable_static.sql'), 'r') as f:
     sql_createtable_static = f.read()
 
+with open(os.path.join(sqlpath, 'psql_createtable_dynamic_noindex.sql'),
+          'r') as f:
+    sql_createtable_dynamic_noindex = f.read()
+
 with open(os.path.join(sqlpath, 'createtable_static_aggregate.sql'), 'r') as f:
     sql_aggregate = f.read()
+
+with open(os.path.join(sqlpath, 'createtable_static_aggregate_watermark.sql'),
+          'r') as f:
+    sql_aggregate_watermark = f.read()
+
+with open(os.path.join(sqlpath, 'createtable_ingest_manifest.sql'), 'r') as f:
+    sql_createtable_ingest_manifest = f.read()
+
+with open(os.path.join(sqlpath, 'createtable_dynamic_dedup_watermark.sql'),
+          'r') as f:
+    sql_dedup_watermark = f.read()
+
+with open(os.path.join(sqlpath, 'createtable_partition_catalog.sql'),
+          'r') as f:
+    sql_partition_catalog = f.read()
+
+with open(os.path.join(sqlpath, 'createtable_vessel_day_summary.sql'),
+          'r') as f:
+    sql_vessel_day_summary = f.read()
+
+with open(os.path.join(sqlpath, 'createtable_dynamic_rtree.sql'), 'r') as f:
+    sql_createtable_dynamic_rtree = f.read()
+
+with open(os.path.join(sqlpath, 'createtrigger_dynamic_rtree.sql'), 'r') as f:
+    sql_createtrigger_dynamic_rtree = f.read()
+
+with open(os.path.join(sqlpath, 'psql_createtable_dynamic_partitioned.sql'),
+          'r') as f:
+    sql_createtable_dynamic_partitioned = f.read()
+
+with open(os.path.join(sqlpath, 'psql_createtable_static_partitioned.sql'),
+          'r') as f:
+    sql_createtable_static_partitioned = f.read()
@@ -3,20 +3,36 @@
     Also see: https://docs.python.org/3/library/sqlite3.html#connection-objects
 '''
 
-from calendar import monthrange
+from calendar import monthrange, timegm
 from collections import Counter
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime
 from enum import Enum
+from itertools import groupby
+from operator import itemgetter
+from time import monotonic
 import ipaddress
 import os
+import queue
 import re
 import warnings
 
 from aisdb import sqlite3, sqlpath
 from aisdb.database.create_tables import (
     sql_aggregate,
+    sql_aggregate_watermark,
+    sql_createtable_dynamic_noindex,
+    sql_createtable_dynamic_partitioned,
+    sql_createtable_dynamic_rtree,
     sql_createtable_static,
+    sql_createtable_static_partitioned,
+    sql_createtrigger_dynamic_rtree,
+    sql_dedup_watermark,
+    sql_partition_catalog,
+    sql_vessel_day_summary,
 )
+from aisdb.gis import dt_2_epoch, epoch_2_dt
 
 import numpy as np
 import psycopg
@@ -24,10 +40,391 @@ import psycopg
 with open(os.path.join(sqlpath, 'coarsetype.sql'), 'r') as f:
     coarsetype_sql = f.read().split(';')
 
+# columns selected from ais_{month}_static for aggregation. the order of
+# columns must match the static_{month}_aggregate table definition
+_static_aggregate_columns = (
+    'mmsi',
+    'imo',
+    'vessel_name',
+    'ship_type',
+    'call_sign',
+    'dim_bow',
+    'dim_stern',
+    'dim_port',
+    'dim_star',
+    'draught',
+)
+
+_sql_select_static_aggregate = '''
+  SELECT
+    s.mmsi, s.imo, TRIM(vessel_name) as vessel_name, s.ship_type,
+    s.call_sign, s.dim_bow, s.dim_stern, s.dim_port, s.dim_star,
+    s.draught
+  FROM ais_{month}_static AS s {where}
+  ORDER BY s.mmsi, s.time, s.imo, s.source
+'''
+
+
+def _sql_upsert_static_aggregate(month, placeholder):
+    ''' SQL statement inserting aggregated rows into static_{month}_aggregate,
+        replacing existing rows for the same MMSI
+    '''
+    values = ','.join(placeholder for _ in _static_aggregate_columns)
+    updates = ',\n    '.join(f'{col} = excluded.{col}'
+                              for col in _static_aggregate_columns[1:])
+    return (f'INSERT INTO static_{month}_aggregate VALUES ({values})\n'
+            f'ON CONFLICT (mmsi) DO UPDATE SET\n    {updates}')
+
+
+# statistics stored in the partition_catalog table for each month.
+# the order of columns must match the partition_catalog table definition.
+# the updated_at column is set to the epoch time when the statistics were
+# computed
+_sql_select_partition_stats = '''
+  SELECT
+    COUNT(*) AS row_count,
+    COUNT(DISTINCT mmsi) AS mmsi_count,
+    MIN(time) AS time_min,
+    MAX(time) AS time_max,
+    MIN(longitude) AS longitude_min,
+    MAX(longitude) AS longitude_max,
+    MIN(latitude) AS latitude_min,
+    MAX(latitude) AS latitude_max
+  FROM ais_{month}_dynamic
+'''
+
+_partition_catalog_columns = (
+    'month',
+    'row_count',
+    'mmsi_count',
+    'time_min',
+    'time_max',
+    'longitude_min',
+    'longitude_max',
+    'latitude_min',
+    'latitude_max',
+    'updated_at',
+)
+
+
+def _catalog_complete(stats):
+    ''' True if the statistics of a partition catalog row were computed
+        after the end of the month. data may still be added to the current
+        month, e.g. by the receiver, so statistics of months that had not
+        ended are not used to skip months or narrow the database date range
+    '''
+    y, m = int(stats['month'][:4]), int(stats['month'][4:])
+    month_end = timegm((y + m // 12, m % 12 + 1, 1, 0, 0, 0))
+    return stats['updated_at'] >= month_end
+
+
+def _sql_upsert_partition_catalog(placeholder):
+    ''' SQL statement inserting monthly statistics into partition_catalog,
+        replacing the existing row for the same month
+    '''
+    values = ','.join(placeholder for _ in _partition_catalog_columns)
+    updates = ',\n    '.join(f'{col} = excluded.{col}'
+                              for col in _partition_catalog_columns[1:])
+    return (f'INSERT INTO partition_catalog VALUES ({values})\n'
+            f'ON CONFLICT (month) DO UPDATE SET\n    {updates}')
+
+
+# summarize position reports for each vessel and day into the
+# vessel_day_summary table. days are counted from the epoch.
+# rows for existing days are merged, in case reports for the same day are
+# stored in different monthly tables
+_sql_insert_vessel_day_summary = '''
+INSERT INTO vessel_day_summary
+  SELECT
+    time / 86400, mmsi, COUNT(*), MIN(time), MAX(time),
+    MIN(longitude), MAX(longitude), MIN(latitude), MAX(latitude)
+  FROM ais_{month}_dynamic
+  WHERE true
+  GROUP BY time / 86400, mmsi
+ON CONFLICT (day, mmsi) DO UPDATE SET
+  row_count = vessel_day_summary.row_count + excluded.row_count,
+  time_min = {least}(vessel_day_summary.time_min, excluded.time_min),
+  time_max = {greatest}(vessel_day_summary.time_max, excluded.time_max),
+  longitude_min = {least}(vessel_day_summary.longitude_min,
+                          excluded.longitude_min),
+  longitude_max = {greatest}(vessel_day_summary.longitude_max,
+                             excluded.longitude_max),
+  latitude_min = {least}(vessel_day_summary.latitude_min,
+                         excluded.latitude_min),
+  latitude_max = {greatest}(vessel_day_summary.latitude_max,
+                            excluded.latitude_max)
+'''
+
+
+def _month_days(month):
+    ''' range of days since the epoch in a month, as a tuple of the first
+        day of the month and the first day of the following month
+    '''
+    y, m = int(month[:4]), int(month[4:])
+    first = dt_2_epoch(datetime(y, m, 1)) // 86400
+    return first, first + monthrange(y, m)[1]
+
+
+def _fetch_batches(cur, batchsize=10**5):
+    ''' yield rows from an executed cursor, fetching in batches '''
+    res = cur.fetchmany(batchsize)
+    while len(res) > 0:
+        yield from res
+        res = cur.fetchmany(batchsize)
+
+
+def _aggregate_static_rows(rows):
+    ''' compute the most frequently repeated non-null value for each column
+        of static vessel reports, grouped by MMSI.
+
+        rows must be sorted by MMSI, with the MMSI in the first column.
+        null, zero, and empty values are ignored. in the case of a tie, the
+        value appearing first will be kept. rows where the resulting MMSI
+        is null will be skipped
+
+        args:
+            rows (iterable)
+                sequence of row tuples
+
+        yields:
+            list of aggregated column values for each MMSI
+    '''
+    for _, group in groupby(rows, key=itemgetter(0)):
+        aggregated = []
+        for col in zip(*group):
+            counts = Counter(filter(None, col))
+            aggregated.append(
+                counts.most_common(1)[0][0] if len(counts) > 0 else None)
+        if aggregated[0] is None:
+            continue
+        yield aggregated
+
+
+# numpy dtypes used to encode fixed-width Postgres column types in binary
+# COPY format. other column types are encoded as UTF-8 text
+_pgcopy_dtypes = {
+    'smallint': '>i2',
+    'integer': '>i4',
+    'bigint': '>i8',
+    'real': '>f4',
+    'double precision': '>f8',
+    'boolean': '?',
+}
+
+# binary COPY signature, flags field, and header extension length
+_pgcopy_header = b'PGCOPY\n\xff\r\n\x00' + np.zeros(2, '>i4').tobytes()
+
+# binary COPY end of data marker
+_pgcopy_trailer = np.array(-1, '>i2').tobytes()
+
+# columns identifying duplicate rows when merging staged rows in bulk_load().
+# these are the primary key columns of the SQLite table schemas
+_bulk_load_keys = {
+    'dynamic':
+    ('mmsi', 'time', 'longitude', 'latitude', 'sog', 'cog', 'source'),
+    'static': ('mmsi', 'time', 'imo', 'source'),
+}
+
+
+# indexes created for each month by rebuild_indexes_parallel(), as a mapping
+# of index name suffix to indexed columns
+_dynamic_indexes = {
+    'cluster': '(mmsi, time, longitude, latitude, source)',
+    'mmsi': '(mmsi)',
+    'time': '(time)',
+    'lon': '(longitude)',
+    'lat': '(latitude)',
+}
+_static_indexes = {
+    'mmsi': '(mmsi)',
+    'time': '(time)',
+}
+
+
+def _pgcopy_field(values, data_type):
+    ''' encode a column of values in binary COPY format.
+        None, NaN, and masked values will be encoded as null
+
+        returns:
+            tuple of (field lengths, concatenated field data). null values
+            have a length of -1
+    '''
+    if data_type not in _pgcopy_dtypes:
+        encoded = [
+            None if v is None or v is np.ma.masked else str(v).encode()
+            for v in values
+        ]
+        lengths = np.array([-1 if v is None else len(v) for v in encoded],
+                           dtype=np.int64)
+        data = np.frombuffer(b''.join(v for v in encoded if v is not None),
+                             dtype=np.uint8)
+        return lengths, data
+
+    null = np.ma.getmaskarray(values)
+    values = np.ma.getdata(values)
+    if values.dtype == object:
+        null = null | np.equal(values, None)
+        values = np.where(null, 0, values)
+    if values.dtype.kind == 'f':
+        null = null | np.isnan(values)
+    dtype = np.dtype(_pgcopy_dtypes[data_type])
+    data = values[~null].astype(dtype).view(np.uint8)
+    lengths = np.where(null, -1, dtype.itemsize).astype(np.int64)
+    return lengths, data
+
+
+def _pgcopy_rows(fields):
+    ''' assemble columns encoded by _pgcopy_field() into rows of binary
+        COPY data. each row contains the number of fields, followed by the
+        length and data of each field
+    '''
+    count = len(fields[0][0])
+    sizes = [4 + np.maximum(lengths, 0) for lengths, _ in fields]
+    rowsize = 2 + np.sum(sizes, axis=0)
+    buf = np.empty(np.sum(rowsize), dtype=np.uint8)
+    pos = np.cumsum(rowsize) - rowsize
+
+    buf[pos[:, None] + np.arange(2)] = np.full(
+        count, len(fields), dtype='>i2').view(np.uint8).reshape(count, 2)
+    pos = pos + 2
+    for (lengths, data), size in zip(fields, sizes):
+        buf[pos[:, None] + np.arange(4)] = lengths.astype('>i4').view(
+            np.uint8).reshape(count, 4)
+        datalen = np.maximum(lengths, 0)
+        offsets = np.arange(len(data)) - np.repeat(
+            np.cumsum(datalen) - datalen, datalen)
+        buf[np.repeat(pos + 4, datalen) + offsets] = data
+        pos = pos + size
+    return buf.tobytes()
+
+
+# names of monthly position report and static report tables
+_dynamic_table_pattern = re.compile(r'ais_([0-9]{6})_dynamic')
+_static_table_pattern = re.compile(r'ais_([0-9]{6})_static')
+
+# schema metadata cached for each database, keyed by the value of
+# _DBConn._schema_key(). see _DBConn._schema()
+_schema_cache = {}
+
 
 class _DBConn():
     ''' AISDB Database connection handler '''
 
+    # seconds before cached schema metadata is queried again, so that
+    # long-running processes will find tables created by other processes
+    schema_cache_ttl = 60
+
+    # schema metadata of a database which is not shared between connections
+    _private_schema = None
+
+    def _schema(self):
+        ''' schema metadata of the database, as a dictionary with keys:
+            tables (frozenset of table names), catalog (rows of the
+            partition_catalog table), and aggregates (status of static
+            aggregates, see :meth:`static_aggregate_status`).
+
+            metadata is queried once and cached for each database, so that
+            new connections to the same database in this process, e.g. one
+            for each REST API request, do not query metadata again. the
+            cache is cleared by connection methods creating tables or adding
+            data, and by :func:`aisdb.database.decoder.decode_msgs`
+        '''
+        key = self._schema_key()
+        schema = (self._private_schema
+                  if key is None else _schema_cache.get(key, None))
+        if schema is None or (monotonic() - schema['loaded'] >
+                              self.schema_cache_ttl):
+            schema = self._query_schema()
+            schema['loaded'] = monotonic()
+            if key is None:
+                self._private_schema = schema
+            else:
+                _schema_cache[key] = schema
+        return schema
+
+    def table_names(self):
+        ''' names of tables in the database.
+            see :meth:`_schema` for info on caching
+
+            returns:
+                frozenset of table names
+        '''
+        return self._schema()['tables']
+
+    def static_aggregate_status(self, month):
+        ''' status of the static_{month}_aggregate table.
+            see :meth:`_schema` for info on caching
+
+            args:
+                month (string)
+                    month with format YYYYmm
+
+            returns:
+                'missing' if the aggregate table does not exist,
+                'stale' if static reports were added since the last
+                aggregation, or 'current'
+        '''
+        return self._schema()['aggregates'].get(month, 'missing')
+
+    def invalidate_schema_cache(self):
+        ''' clear the cached schema metadata of the database. this should be
+            called after creating or dropping tables, or adding static
+            reports, by other means than the connection methods
+        '''
+        key = self._schema_key()
+        if key is None:
+            self._private_schema = None
+        else:
+            _schema_cache.pop(key, None)
+
+    def _query_aggregates(self, cur, tables, latest):
+        ''' compare the watermark of each static aggregate with the latest
+            value of ``latest`` in the static table of the same month, e.g.
+            'MAX(rowid)'. see :meth:`aggregate_static_msgs`
+
+            returns:
+                dictionary of aggregate status keyed by month
+        '''
+        months = [
+            match.group(1)
+            for match in map(_static_table_pattern.fullmatch, tables)
+            if match is not None
+            and f'static_{match.group(1)}_aggregate' in tables
+        ]
+        watermarks = {}
+        if 'static_aggregate_watermark' in tables:
+            cur.execute('SELECT month, watermark '
+                        'FROM static_aggregate_watermark')
+            watermarks = {
+                row['month']: row['watermark']
+                for row in cur.fetchall()
+            }
+        aggregates = {}
+        for i in range(0, len(months), 100):
+            cur.execute(' UNION ALL '.join(
+                f'SELECT \'{month}\' AS month, {latest} AS latest '
+                f'FROM ais_{month}_static' for month in months[i:i + 100]))
+            for row in cur.fetchall():
+                watermark = watermarks.get(row['month'], None)
+                current = (watermark is not None
+                           and (row['latest'] or 0) <= watermark)
+                aggregates[row['month']] = 'current' if current else 'stale'
+        return aggregates
+
+    def _set_db_daterange(self):
+        # the temporal range of monthly database tables will be stored as a
+        # dictionary attribute db_daterange
+        self._set_partition_catalog(self._dynamic_months(),
+                                    self._schema()['catalog'])
+
+    def _dynamic_months(self):
+        ''' months having a dynamic table, with format YYYYmm '''
+        return sorted([
+            match.group(1) for match in map(_dynamic_table_pattern.fullmatch,
+                                            self.table_names())
+            if match is not None
+        ])
+
     def _create_table_coarsetype(self):
         ''' create a table to describe integer vessel type as a human-readable
             string.
@@ -39,8 +436,46 @@ class _DBConn():
             #cur.execute(stmt)
             self.execute(stmt)
         self.commit()
+        self.invalidate_schema_cache()
         #cur.close()
 
+    def _set_partition_catalog(self, db_months, catalog):
+        ''' store partition catalog rows in the partition_catalog attribute,
+            and set the db_daterange attribute.
+            only rows computed after the end of their month are kept, as
+            other months may have had data added since. months in the
+            catalog span the range of their message times, and months
+            without any rows are skipped. months missing from the catalog
+            span the entire month
+
+            args:
+                db_months (list)
+                    months having a dynamic table, with format YYYYmm
+                catalog (list)
+                    rows of the partition_catalog table as dictionaries
+        '''
+        self.partition_catalog = {
+            row['month']: row
+            for row in catalog if _catalog_complete(row)
+        }
+        ranges = []
+        for month in db_months:
+            stats = self.partition_catalog.get(month, None)
+            if stats is None:
+                y, m = int(month[:4]), int(month[4:])
+                ranges.append((date(y, m, 1), date(y, m, monthrange(y,
+                                                                    m)[1])))
+            elif stats['row_count'] > 0:
+                ranges.append((epoch_2_dt(stats['time_min']).date(),
+                               epoch_2_dt(stats['time_max']).date()))
+        if ranges != []:
+            self.db_daterange = {
+                'start': min(rng[0] for rng in ranges),
+                'end': max(rng[1] for rng in ranges),
+            }
+        else:
+            self.db_daterange = {}
+
 
 class SQLiteDBConn(_DBConn, sqlite3.Connection):
     ''' SQLite3 database connection object
@@ -51,6 +486,8 @@ class SQLiteDBConn(_DBConn, sqlite3.Connection):
             db_daterange (dict)
                 temporal range of monthly database tables. keys are DB file
                 names
+            partition_catalog (dict)
+                rows of the partition_catalog table, keyed by month
     '''
 
     def __init__(self, dbpath):
@@ -61,46 +498,168 @@ class SQLiteDBConn(_DBConn, sqlite3.Connection):
         )
         self.dbpath = dbpath
         self.row_factory = sqlite3.Row
-        coarsetype_exists_qry = (
-            'SELECT * FROM sqlite_master '
-            r'WHERE type="table" AND name LIKE "coarsetype_ref" ')
-        cur = self.cursor()
-        cur.execute(coarsetype_exists_qry)
-        if len(cur.fetchall()) == 0:
+        if 'coarsetype_ref' not in self.table_names():
             self._create_table_coarsetype()
         self._set_db_daterange()
 
-    def _set_db_daterange(self):
-        # query the temporal range of monthly database tables
-        # results will be stored as a dictionary attribute db_daterange
-        sql_qry = ('SELECT * FROM sqlite_master '
-                   r'WHERE type="table" AND name LIKE "ais_%_dynamic" ')
+    def _schema_key(self):
+        # in-memory and temporary databases are private to the connection
+        if self.dbpath in ('', ':memory:'):
+            return None
+        return ('sqlite', os.path.realpath(self.dbpath))
+
+    def _query_schema(self):
         cur = self.cursor()
-        cur.execute(sql_qry)
-        dynamic_tables = cur.fetchall()
-        if dynamic_tables != []:
-            db_months = sorted(
-                [table['name'].split('_')[1] for table in dynamic_tables])
-            self.db_daterange = {
-                'start':
-                datetime(int(db_months[0][:4]), int(db_months[0][4:]),
-                         1).date(),
-                'end':
-                datetime((y := int(db_months[-1][:4])),
-                         (m := int(db_months[-1][4:])),
-                         monthrange(y, m)[1]).date(),
-            }
-        else:
-            self.db_daterange = {}
+        cur.execute('SELECT name FROM sqlite_master WHERE type="table"')
+        tables = frozenset(table['name'] for table in cur.fetchall())
+        catalog = []
+        if 'partition_catalog' in tables:
+            cur.execute('SELECT * FROM partition_catalog')
+            catalog = [dict(row) for row in cur.fetchall()]
+        aggregates = self._query_aggregates(cur, tables, 'MAX(rowid)')
         cur.close()
+        return dict(tables=tables, catalog=catalog, aggregates=aggregates)
+
+    @contextmanager
+    def _pragma_profile(self, pragmas):
+        ''' apply connection settings for the duration of a context, and
+            restore the previous settings on exit
+        '''
+        self.commit()
+        previous = {
+            name: self.execute(f'PRAGMA {name}').fetchone()[0]
+            for name in pragmas.keys()
+        }
+        for name, value in pragmas.items():
+            self.execute(f'PRAGMA {name} = {value}')
+        try:
+            yield self
+        finally:
+            self.commit()
+            if str(pragmas.get('journal_mode', '')).lower() == 'wal':
+                self.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            for name, value in previous.items():
+                self.execute(f'PRAGMA {name} = {value}')
+
+    def bulk_ingest(self, cache_size=-1024 * 1024, mmap_size=2**30):
+        ''' context manager applying fast insert settings to the database
+            connection. the database is switched to write-ahead logging with
+            synchronous writes disabled, using a large page cache, memory
+            mapped I/O, and in-memory temporary tables.
+            previous settings are restored and the write-ahead log is
+            checkpointed on exit.
+            data written in this context may be lost if the operating system
+            crashes before exiting.
+
+            only the write-ahead log journal mode is stored in the database
+            file, and applies to other connections to the same database,
+            such as the connection opened by the message decoder. the other
+            settings apply to this connection only, e.g. when merging staging
+            databases or aggregating static reports
 
-    def aggregate_static_msgs(self, months_str: list, verbose: bool = True):
+            args:
+                cache_size (int)
+                    page cache size. negative values are in kibibytes
+                mmap_size (int)
+                    maximum number of bytes of the database file to map in
+                    memory
+        '''
+        return self._pragma_profile({
+            'journal_mode': 'WAL',
+            'synchronous': 'OFF',
+            'cache_size': cache_size,
+            'mmap_size': mmap_size,
+            'temp_store': 'MEMORY',
+        })
+
+    def read_optimized(self, cache_size=-1024 * 1024, mmap_size=2**30):
+        ''' context manager applying settings for serving queries. reads
+            use a large page cache, memory mapped I/O, and in-memory
+            temporary tables.
+            previous settings are restored on exit.
+
+            writes are not disabled, since queries may create tables, e.g.
+            when static reports are aggregated by
+            :class:`aisdb.database.dbqry.DBQuery`
+
+            args:
+                cache_size (int)
+                    page cache size. negative values are in kibibytes
+                mmap_size (int)
+                    maximum number of bytes of the database file to map in
+                    memory
+        '''
+        return self._pragma_profile({
+            'cache_size': cache_size,
+            'mmap_size': mmap_size,
+            'temp_store': 'MEMORY',
+        })
+
+    def create_rtree_index(self, months_str: list, verbose: bool = True):
+        ''' create an R*Tree spatial index of vessel positions for each
+            month, in the virtual table ``rtree_{month}_dynamic``.
+            existing rows are added to the index, and new rows will be added
+            by a trigger upon insert.
+            queries using a bounding box callback, e.g.
+            :func:`aisdb.database.sqlfcn_callbacks.in_time_bbox_validmmsi`,
+            will use the index automatically when it exists
+
+            args:
+                months_str (list)
+                    list of strings with format: YYYYmm
+                verbose (bool)
+                    logs messages to stdout
+        '''
+        cur = self.cursor()
+        for month in months_str:
+            cur.execute(
+                'SELECT name FROM sqlite_master '
+                'WHERE type="table" AND name=?', [f'ais_{month}_dynamic'])
+            if cur.fetchall() == []:
+                continue
+            cur.execute(
+                'SELECT name FROM sqlite_master '
+                'WHERE type="table" AND name=?', [f'rtree_{month}_dynamic'])
+            if cur.fetchall() != []:
+                continue
+            if verbose:
+                print(f'creating spatial index rtree_{month}_dynamic...')
+            cur.execute(sql_createtable_dynamic_rtree.format(month))
+            cur.execute(
+                f'INSERT INTO rtree_{month}_dynamic '
+                '(longitude0, longitude1, latitude0, latitude1, mmsi, time) '
+                'SELECT longitude, longitude, latitude, latitude, mmsi, time '
+                f'FROM ais_{month}_dynamic')
+            cur.execute(sql_createtrigger_dynamic_rtree.format(month))
+        self.commit()
+        self.invalidate_schema_cache()
+
+    def rtree_months(self):
+        ''' list months having an R*Tree spatial index.
+            see :meth:`create_rtree_index`
+        '''
+        return sorted([
+            name.split('_')[1] for name in self.table_names()
+            if re.fullmatch(r'rtree_[0-9]{6}_dynamic', name)
+        ])
+
+    def aggregate_static_msgs(self,
+                              months_str: list,
+                              verbose: bool = True,
+                              incremental: bool = True):
         ''' collect an aggregate of static vessel reports for each unique MMSI
             identifier. The most frequently repeated values for each MMSI will
             be kept when multiple different reports appear for the same MMSI
 
             this function should be called every time data is added to the database
 
+            The last aggregated rowid for each month is stored in the
+            static_aggregate_watermark table. If incremental is True, only
+            vessels having new static reports since the last aggregation
+            will be updated. The aggregate table will be rebuilt entirely if
+            no watermark exists, or if rows were deleted since the last
+            aggregation
+
             args:
                 dbconn (:class:`aisdb.database.dbconn.SQLiteDBConn`)
                     database connection object
@@ -108,12 +667,15 @@ class SQLiteDBConn(_DBConn, sqlite3.Connection):
                     list of strings with format: YYYYmm
                 verbose (bool)
                     logs messages to stdout
+                incremental (bool)
+                    if False, the aggregate table will always be rebuilt
         '''
 
         assert hasattr(self, 'dbpath')
         assert not hasattr(self, 'dbpaths')
 
         cur = self.cursor()
+        cur.execute(sql_aggregate_watermark)
 
         for month in months_str:
             # check for monthly tables in dbfiles containing static reports
@@ -125,70 +687,167 @@ class SQLiteDBConn(_DBConn, sqlite3.Connection):
 
             cur.execute(sql_createtable_static.format(month))
 
-            if verbose:
-                print('aggregating static reports into '
-                      f'static_{month}_aggregate...')
-            cur.execute('SELECT DISTINCT s.mmsi FROM '
-                        f'ais_{month}_static AS s')
-            mmsis = np.array(cur.fetchall(), dtype=int).flatten()
-
-            cur.execute('DROP TABLE IF EXISTS '
-                        f'static_{month}_aggregate')
-
-            sql_select = '''
-              SELECT
-                s.mmsi, s.imo, TRIM(vessel_name) as vessel_name, s.ship_type,
-                s.call_sign, s.dim_bow, s.dim_stern, s.dim_port, s.dim_star,
-                s.draught
-              FROM ais_{}_static AS s WHERE s.mmsi = ?
-            '''.format(month)
-
-            agg_rows = []
-            for mmsi in mmsis:
-                _ = cur.execute(sql_select, (str(mmsi), ))
-                cur_mmsi = cur.fetchall()
-
-                cols = np.array(cur_mmsi, dtype=object).T
-                assert len(cols) > 0
-
-                filtercols = np.array(
-                    [
-                        np.array(list(filter(None, col)), dtype=object)
-                        for col in cols
-                    ],
-                    dtype=object,
-                )
+            cur.execute(
+                'SELECT name FROM sqlite_master '
+                'WHERE type="table" AND name=?', [f'static_{month}_aggregate'])
+            aggregate_exists = cur.fetchall() != []
 
-                paddedcols = np.array(
-                    [col if len(col) > 0 else [None] for col in filtercols],
-                    dtype=object,
-                )
+            cur.execute(
+                'SELECT watermark, row_count FROM static_aggregate_watermark '
+                'WHERE month = ?', [month])
+            res = cur.fetchone()
 
-                aggregated = [
-                    Counter(col).most_common(1)[0][0] for col in paddedcols
-                ]
+            # rowids are assigned in ascending order upon insert.
+            # if the count of rows up to the watermark has changed, rows were
+            # deleted or renumbered and the aggregate must be rebuilt
+            cur.execute(
+                f'SELECT COUNT(*), MAX(rowid) FROM ais_{month}_static')
+            row_count, max_rowid = cur.fetchone()
+            if (incremental and aggregate_exists and res is not None):
+                watermark, prev_count = res
+                cur.execute(
+                    f'SELECT COUNT(*) FROM ais_{month}_static '
+                    'WHERE rowid > ?', [watermark])
+                if row_count - cur.fetchone()[0] != prev_count:
+                    watermark = None
+            else:
+                watermark = None
 
-                agg_rows.append(aggregated)
+            if watermark is not None and row_count == prev_count:
+                if verbose:
+                    print(f'static_{month}_aggregate is up to date')
+                continue
 
+            if watermark is None:
+                if verbose:
+                    print('aggregating static reports into '
+                          f'static_{month}_aggregate...')
+
+                # a single ordered pass over the static table.
+                # rows are sorted by the primary key, so the static reports
+                # for each MMSI will be consecutive
+                cur.execute(
+                    _sql_select_static_aggregate.format(month=month, where=''))
+                agg_rows = list(_aggregate_static_rows(_fetch_batches(cur)))
+
+                cur.execute('DROP TABLE IF EXISTS '
+                            f'static_{month}_aggregate')
+                cur.execute(sql_aggregate.format(month))
+
+                if len(agg_rows) == 0:
+                    warnings.warn('no rows to aggregate! '
+                                  f'table: static_{month}_aggregate')
+            else:
+                if verbose:
+                    print('updating static reports in '
+                          f'static_{month}_aggregate...')
+
+                # aggregate all static reports for vessels having new reports
+                where = (f'WHERE s.mmsi IN (SELECT DISTINCT mmsi '
+                         f'FROM ais_{month}_static WHERE rowid > ?)')
+                cur.execute(
+                    _sql_select_static_aggregate.format(month=month,
+                                                        where=where),
+                    [watermark])
+                agg_rows = list(_aggregate_static_rows(_fetch_batches(cur)))
+
+            cur.executemany(_sql_upsert_static_aggregate(month, '?'),
+                            agg_rows)
             cur.execute(
-                sql_aggregate.format(month).replace(
-                    f'static_{month}_aggregate', f'static_{month}_aggregate'))
+                'INSERT INTO static_aggregate_watermark VALUES (?,?,?) '
+                'ON CONFLICT (month) DO UPDATE SET '
+                'watermark = excluded.watermark, '
+                'row_count = excluded.row_count',
+                [month, max_rowid or 0, row_count])
+
+            self.commit()
+        self.invalidate_schema_cache()
+
+    def update_partition_catalog(self,
+                                 months_str: list,
+                                 verbose: bool = True):
+        ''' store the row count, count of unique MMSIs, time range, and
+            bounding box of monthly dynamic tables in the partition_catalog
+            table. queries will use the catalog to skip months that are empty
+            or outside of the queried time range, without reading from
+            the monthly tables. statistics computed before the end of a month
+            are not used to skip that month, since data may still be added
+            to it
+
+            this function is called by
+            :func:`aisdb.database.decoder.decode_msgs` and
+            :meth:`aisdb.database.dbconn.PostgresDBConn.bulk_load`, and must
+            be called after adding data to a past month by other means
 
-            if len(agg_rows) == 0:
-                warnings.warn('no rows to aggregate! '
-                              f'table: static_{month}_aggregate')
+            args:
+                months_str (list)
+                    list of strings with format: YYYYmm
+                verbose (bool)
+                    logs messages to stdout
+        '''
+        cur = self.cursor()
+        cur.execute(sql_partition_catalog)
+
+        for month in months_str:
+            cur.execute(
+                'SELECT name FROM sqlite_master '
+                'WHERE type="table" AND name=?', [f'ais_{month}_dynamic'])
+            if cur.fetchall() == []:
                 continue
+            if verbose:
+                print(f'updating partition catalog for month {month}...')
+            updated_at = int(datetime.now().timestamp())
+            cur.execute(_sql_select_partition_stats.format(month=month))
+            stats = cur.fetchone()
+            cur.execute(_sql_upsert_partition_catalog('?'),
+                        [month, *stats, updated_at])
 
-            skip_nommsi = np.array(agg_rows, dtype=object)
-            assert len(skip_nommsi.shape) == 2
-            skip_nommsi = skip_nommsi[skip_nommsi[:, 0] != None]
-            assert len(skip_nommsi) > 1
-            cur.executemany((
-                f'INSERT INTO static_{month}_aggregate '
-                f"VALUES ({','.join(['?' for _ in range(skip_nommsi.shape[1])])}) "
-            ), skip_nommsi)
+        self.commit()
+        self.invalidate_schema_cache()
+        self._set_db_daterange()
 
-            self.commit()
+    def update_vessel_day_summary(self,
+                                  months_str: list,
+                                  verbose: bool = True):
+        ''' summarize the position reports of each vessel on each day in the
+            vessel_day_summary table. the summary contains the bounding box,
+            first and last report time, and count of reports for each vessel
+            and day. query callbacks ending in ``_summary`` in
+            :mod:`aisdb.database.sqlfcn_callbacks` use it to find vessels
+            in a region before reading from the monthly tables.
+            existing summaries for each month will be replaced
+
+            this function is called by
+            :func:`aisdb.database.decoder.decode_msgs`, and should be called
+            after adding data to the database by other means
+
+            args:
+                months_str (list)
+                    list of strings with format: YYYYmm
+                verbose (bool)
+                    logs messages to stdout
+        '''
+        cur = self.cursor()
+        cur.execute(sql_vessel_day_summary)
+
+        for month in months_str:
+            cur.execute(
+                'SELECT name FROM sqlite_master '
+                'WHERE type="table" AND name=?', [f'ais_{month}_dynamic'])
+            if cur.fetchall() == []:
+                continue
+            if verbose:
+                print(f'summarizing vessel days for month {month}...')
+            cur.execute(
+                'DELETE FROM vessel_day_summary WHERE day >= ? AND day < ?',
+                _month_days(month))
+            cur.execute(
+                _sql_insert_vessel_day_summary.format(month=month,
+                                                      least='min',
+                                                      greatest='max'))
+
+        self.commit()
+        self.invalidate_schema_cache()
 
 
 # default to local SQLite database
@@ -226,33 +885,42 @@ class PostgresDBConn(_DBConn, psycopg.Connection):
             # Alternatively, connect using a connection string:
             dbconn = PostgresDBConn('Postgresql://localhost:5433')
 
+        attributes:
+            partitioned (bool)
+                True if the database uses the partitioned schema created by
+                :meth:`migrate_partitioned`
+
     '''
 
-    def _set_db_daterange(self):
+    def _schema_key(self):
+        # connection parameters, excluding the password
+        return ('postgres', self.conn.info.dsn)
 
-        dynamic_tables_qry = psycopg.sql.SQL(
-            "select table_name from information_schema.tables "
-            r"where table_name LIKE 'ais\_______\_dynamic' ORDER BY table_name"
-        )
-        cur = self.cursor()
-        cur.execute(dynamic_tables_qry)
-        dynamic_tables = cur.fetchall()
+    def _query_schema(self):
+        with self.cursor() as cur:
+            cur.execute('SELECT table_name FROM information_schema.tables '
+                        'WHERE table_schema = current_schema()')
+            tables = frozenset(table['table_name']
+                               for table in cur.fetchall())
+            catalog = []
+            if 'partition_catalog' in tables:
+                cur.execute('SELECT * FROM partition_catalog')
+                catalog = cur.fetchall()
+            aggregates = self._query_aggregates(cur, tables, 'MAX(time)')
+
+            # declaratively partitioned tables have relkind 'p'
+            cur.execute(
+                'SELECT relkind FROM pg_class '
+                'WHERE relname = \'ais_dynamic\' AND relkind = \'p\'')
+            partitioned = cur.fetchall() != []
+        return dict(tables=tables,
+                    catalog=catalog,
+                    aggregates=aggregates,
+                    partitioned=partitioned)
 
-        if dynamic_tables != []:
-            db_months = sorted([
-                table['table_name'].split('_')[1] for table in dynamic_tables
-            ])
-            self.db_daterange = {
-                'start':
-                datetime(int(db_months[0][:4]), int(db_months[0][4:]),
-                         1).date(),
-                'end':
-                datetime((y := int(db_months[-1][:4])),
-                         (m := int(db_months[-1][4:])),
-                         monthrange(y, m)[1]).date(),
-            }
-        else:
-            self.db_daterange = {}
+    def _set_db_daterange(self):
+        super()._set_db_daterange()
+        self.partitioned = self._schema()['partitioned']
 
     def __enter__(self):
         self.conn.__enter__()
@@ -325,15 +993,7 @@ class PostgresDBConn(_DBConn, psycopg.Connection):
         self.pgconn = self.conn.pgconn
         self._adapters = self.conn.adapters
 
-        cur = self.cursor()
-
-        coarsetype_qry = ("select table_name from information_schema.tables "
-                          "where table_name = 'coarsetype_ref'")
-
-        cur.execute(coarsetype_qry)
-        coarsetype_exists = cur.fetchone()
-
-        if not coarsetype_exists:
+        if 'coarsetype_ref' not in self.table_names():
             self._create_table_coarsetype()
 
         self._set_db_daterange()
@@ -343,6 +1003,130 @@ class PostgresDBConn(_DBConn, psycopg.Connection):
         with self.cursor() as cur:
             cur.execute(sql, args)
 
+    def bulk_load(self,
+                  month: str,
+                  arrays: dict,
+                  table: str = 'dynamic',
+                  staging: bool = False,
+                  batchsize: int = 10**5,
+                  verbose: bool = True):
+        ''' insert columns of values into ``ais_{month}_{table}`` using
+            binary COPY. the table will be created if it doesn't exist yet.
+            as with :func:`aisdb.database.decoder.decode_msgs`, new dynamic
+            tables are created without indexes, which can be created
+            afterwards using :meth:`rebuild_indexes_parallel`.
+            if the partition catalog is used to skip the month in queries,
+            the catalog statistics of the month will be updated
+
+            args:
+                month (string)
+                    month of the target table, in YYYYMM format
+                arrays (dict)
+                    column values keyed by column name. values are numpy
+                    arrays or sequences of equal length, or a single value
+                    to be repeated for every row. None, NaN, and masked
+                    values will be inserted as null
+                table (string)
+                    either 'dynamic' or 'static'
+                staging (bool)
+                    if True, rows are copied into a temporary staging table
+                    and merged into the table, skipping rows having the same
+                    key columns as an existing row or another staged row.
+                    key columns are the primary key of the SQLite table
+                    schema, so that duplicates are skipped whether or not
+                    the table has a primary key constraint, e.g. for tables
+                    created by :func:`aisdb.database.decoder.decode_msgs`.
+                    concurrent loads into the same table may still insert
+                    duplicates
+                batchsize (int)
+                    number of rows encoded and sent at a time
+                verbose (bool)
+                    print the number of rows inserted
+
+            returns:
+                number of rows inserted
+        '''
+        if table not in ('dynamic', 'static'):
+            raise ValueError(f'table must be dynamic or static. got {table}')
+        name = f'ais_{month}_{table}'
+
+        sizes = {np.size(v) for v in arrays.values() if np.ndim(v) > 0}
+        if len(sizes) != 1:
+            raise ValueError('arrays must have equal length')
+        count = sizes.pop()
+        arrays = {
+            col: (np.full(count, v, dtype=object) if np.ndim(v) == 0 else v)
+            for col, v in arrays.items()
+        }
+
+        cur = self.cursor()
+        if table == 'dynamic':
+            cur.execute(sql_createtable_dynamic_noindex.format(month))
+        else:
+            cur.execute(sql_createtable_static.format(month))
+        if self.partitioned:
+            self.migrate_partitioned([month], verbose=False)
+        cur.execute(
+            'SELECT column_name, data_type, is_nullable '
+            'FROM information_schema.columns '
+            'WHERE table_schema = current_schema() AND table_name = %s',
+            [name])
+        schema = cur.fetchall()
+        data_types = {row['column_name']: row['data_type'] for row in schema}
+        nullable = {
+            row['column_name']: row['is_nullable'] == 'YES'
+            for row in schema
+        }
+        unknown = set(arrays.keys()) - set(data_types.keys())
+        if len(unknown) > 0:
+            raise ValueError(f'unknown columns for {name}: {unknown}')
+        columns = list(arrays.keys())
+
+        target = name
+        if staging:
+            target = f'staging_{name}'
+            cur.execute(f'CREATE TEMP TABLE {target} '
+                        f'(LIKE {name} INCLUDING DEFAULTS)')
+
+        with cur.copy(f'COPY {target} ({",".join(columns)}) '
+                      'FROM STDIN (FORMAT BINARY)') as copy:
+            copy.write(_pgcopy_header)
+            for i in range(0, count, batchsize):
+                copy.write(
+                    _pgcopy_rows([
+                        _pgcopy_field(arrays[col][i:i + batchsize],
+                                      data_types[col]) for col in columns
+                    ]))
+            copy.write(_pgcopy_trailer)
+        inserted = count
+
+        if staging:
+            # nullable key columns are compared with IS NOT DISTINCT FROM,
+            # so that rows with null values are also skipped. rows
+            # conflicting with a primary key constraint are ignored, if the
+            # table has one
+            keys = _bulk_load_keys[table]
+            match = ' AND '.join(
+                f't.{col} IS NOT DISTINCT FROM s.{col}' if nullable[col] else
+                f't.{col} = s.{col}' for col in keys)
+            cur.execute(f'''
+                INSERT INTO {name} ({",".join(columns)})
+                SELECT DISTINCT ON ({",".join(keys)}) {",".join(columns)}
+                FROM {target} AS s
+                WHERE NOT EXISTS (SELECT 1 FROM {name} AS t WHERE {match})
+                ON CONFLICT DO NOTHING''')
+            inserted = cur.rowcount
+            cur.execute(f'DROP TABLE {target}')
+
+        self.commit()
+        cur.close()
+        if table == 'dynamic' and month in self.partition_catalog:
+            self.update_partition_catalog([month], verbose=False)
+        self.invalidate_schema_cache()
+        if verbose:
+            print(f'inserted {inserted} rows into {name}')
+        return inserted
+
     def rebuild_indexes(self, month, verbose=True):
         if verbose:
             print(f'indexing {month}...')
@@ -397,35 +1181,243 @@ class PostgresDBConn(_DBConn, psycopg.Connection):
         if verbose:
             print(f'done clustering: {month}')
 
-    def deduplicate_dynamic_msgs(self, month: str, verbose=True):
+    def rebuild_indexes_parallel(self,
+                                 months: list,
+                                 workers: int = 4,
+                                 maintenance_work_mem: str = None,
+                                 concurrently: bool = False,
+                                 cluster: bool = None,
+                                 verbose: bool = True):
+        ''' build indexes for monthly tables in parallel, using a pool of
+            database connections.
+
+            indexes on static tables are built independently. for dynamic
+            tables, the combined index is built first and used to cluster
+            the table, after which the remaining indexes are built on the
+            sorted table. indexes for different months are built at the same
+            time
+
+            args:
+                months (list)
+                    months to index, in YYYYMM format
+                workers (int)
+                    maximum number of indexes built at once. one connection
+                    will be opened for each worker
+                maintenance_work_mem (string)
+                    memory available to each index build, e.g. '1GB'. if None,
+                    the server default will be used
+                concurrently (bool)
+                    if True, indexes will be created using CREATE INDEX
+                    CONCURRENTLY, so that tables can be queried while
+                    indexing. invalid indexes left by a previously failed
+                    build will be dropped and rebuilt
+                cluster (bool)
+                    if True, dynamic tables will be clustered using the
+                    combined index. note that clustering locks the table
+                    from reads and writes, so it cannot be combined with
+                    concurrently. if None, tables will be clustered unless
+                    concurrently is True
+                verbose (bool)
+                    print timings for each index
+
+            returns:
+                dictionary of build time in seconds, keyed by (month, index
+                name)
+        '''
+        if cluster is None:
+            cluster = not concurrently
+        elif cluster and concurrently:
+            raise ValueError('CLUSTER locks the table, and cannot be used '
+                             'with concurrently=True')
+
+        # release locks held by this connection before indexing
+        self.commit()
+
+        connections = queue.Queue()
+        for _ in range(workers):
+            connections.put(
+                psycopg.connect(self.connection_string, autocommit=True))
+        timings = {}
+
+        def _run(month, name, sql, idx_name=None):
+            conn = connections.get()
+            try:
+                if maintenance_work_mem is not None:
+                    conn.execute(
+                        "SELECT set_config('maintenance_work_mem', %s, false)",
+                        [maintenance_work_mem])
+                if concurrently and idx_name is not None:
+                    invalid = conn.execute(
+                        'SELECT c.relname FROM pg_index AS i '
+                        'JOIN pg_class AS c ON c.oid = i.indexrelid '
+                        'WHERE NOT i.indisvalid AND c.relname = %s',
+                        [idx_name]).fetchall()
+                    if invalid != []:
+                        conn.execute(f'DROP INDEX CONCURRENTLY {idx_name}')
+                dt = datetime.now()
+                conn.execute(sql)
+                timings[(month, name)] = (datetime.now() - dt).total_seconds()
+            finally:
+                connections.put(conn)
+            if verbose:
+                print(f'done indexing {name}: {month} '
+                      f'({timings[(month, name)]:.2f}s)')
+
+        create = 'CREATE INDEX'
+        if concurrently:
+            create += ' CONCURRENTLY'
+
+        def _index(month, table, suffix, columns):
+            idx_name = f'idx_ais_{month}_{table}_{suffix}'
+            _run(
+                month, f'{table}_{suffix}',
+                f'{create} IF NOT EXISTS {idx_name} '
+                f'ON ais_{month}_{table} {columns}', idx_name)
+
+        def _index_dynamic(month, executor):
+            _index(month, 'dynamic', 'cluster', _dynamic_indexes['cluster'])
+            if cluster:
+                _run(
+                    month, 'cluster_table',
+                    f'CLUSTER ais_{month}_dynamic '
+                    f'USING idx_ais_{month}_dynamic_cluster')
+            return [
+                executor.submit(_index, month, 'dynamic', suffix, columns)
+                for suffix, columns in _dynamic_indexes.items()
+                if suffix != 'cluster'
+            ]
+
+        start = datetime.now()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                jobs = []
+                for month in months:
+                    jobs.append(
+                        executor.submit(_index_dynamic, month, executor))
+                    jobs += [
+                        executor.submit(_index, month, 'static', suffix,
+                                        columns)
+                        for suffix, columns in _static_indexes.items()
+                    ]
+                while len(jobs) > 0:
+                    result = jobs.pop(0).result()
+                    if isinstance(result, list):
+                        jobs += result
+        finally:
+            while not connections.empty():
+                connections.get().close()
+
+        if verbose:
+            elapsed = (datetime.now() - start).total_seconds()
+            print(f'indexed {len(months)} months in {elapsed:.2f}s')
+        return timings
+
+    def deduplicate_dynamic_msgs(self,
+                                 month: str,
+                                 verbose=True,
+                                 incremental: bool = True):
+        ''' delete rows in ais_{month}_dynamic having the same MMSI, time,
+            and source as another row. the first inserted row is kept
+
+            The oldest transaction ID running at the time of deduplication is
+            stored in the dynamic_dedup_watermark table. If incremental is
+            True, only rows inserted since the last deduplication will be
+            compared against the table, so that the table does not need to
+            be sorted in full. New rows are found by comparing the age of the
+            inserting transaction with the age of the watermark, which is
+            valid across transaction ID wraparound and for frozen rows. Ages
+            are only comparable within 2**31 transactions, so if more
+            transactions than this have run since the last deduplication, the
+            full table will be deduplicated. Transaction IDs are not indexed,
+            so finding new rows requires a sequential scan of the table
+
+            args:
+                month (string)
+                    month to deduplicate, in YYYYMM format
+                verbose (bool)
+                    print the number of rows deleted
+                incremental (bool)
+                    if False, the full table will be deduplicated
+        '''
         dbconn = self.conn
-        dbconn.execute(f'''
-            DELETE FROM ais_{month}_dynamic WHERE ctid IN
-                (SELECT ctid FROM
-                    (SELECT *, ctid, row_number() OVER
-                        (PARTITION BY mmsi, time, source ORDER BY ctid)
-                    FROM ais_{month}_dynamic ) AS duplicates_{month}
-                WHERE row_number > 1)
-            ''')
+        dbconn.execute(sql_dedup_watermark)
+        current = dbconn.execute(
+            'SELECT txid_snapshot_xmin(txid_current_snapshot()) AS xid'
+        ).fetchone()['xid']
+        prev = dbconn.execute(
+            'SELECT xid FROM dynamic_dedup_watermark WHERE month = %s',
+            [month]).fetchone()
+
+        # transaction ages can be compared within 2**31 transactions
+        if incremental and prev is not None and (0 <= current - prev['xid'] <
+                                                 2**31):
+            # rows inserted by transactions since the previous watermark.
+            # age() is computed modulo 2**32 relative to the current
+            # transaction, and is the maximum integer for frozen rows
+            cur = dbconn.execute(
+                f'''
+                WITH new_rows AS (
+                    SELECT DISTINCT mmsi, time, source
+                    FROM ais_{month}_dynamic
+                    WHERE age(xmin) <= age(%s::text::xid)
+                )
+                DELETE FROM ais_{month}_dynamic WHERE ctid IN
+                    (SELECT ctid FROM
+                        (SELECT d.ctid, row_number() OVER
+                            (PARTITION BY d.mmsi, d.time, d.source
+                             ORDER BY d.ctid)
+                        FROM ais_{month}_dynamic AS d
+                        JOIN new_rows USING (mmsi, time, source)
+                        ) AS duplicates_{month}
+                    WHERE row_number > 1)
+                ''', [prev['xid'] & 0xffffffff])
+        else:
+            cur = dbconn.execute(f'''
+                DELETE FROM ais_{month}_dynamic WHERE ctid IN
+                    (SELECT ctid FROM
+                        (SELECT *, ctid, row_number() OVER
+                            (PARTITION BY mmsi, time, source ORDER BY ctid)
+                        FROM ais_{month}_dynamic ) AS duplicates_{month}
+                    WHERE row_number > 1)
+                ''')
+        deleted = cur.rowcount
+
+        dbconn.execute(
+            'INSERT INTO dynamic_dedup_watermark (month, xid) '
+            'VALUES (%s, %s) ON CONFLICT (month) DO UPDATE SET '
+            'xid = excluded.xid', [month, current])
         dbconn.commit()
         if verbose:
-            print(f'done deduplicating: {month}')
+            print(f'done deduplicating: {month} ({deleted} rows deleted)')
 
-    def aggregate_static_msgs(self, months_str: list, verbose: bool = True):
+    def aggregate_static_msgs(self,
+                              months_str: list,
+                              verbose: bool = True,
+                              incremental: bool = True):
         ''' collect an aggregate of static vessel reports for each unique MMSI
             identifier. The most frequently repeated values for each MMSI will
             be kept when multiple different reports appear for the same MMSI
 
             this function should be called every time data is added to the database
 
+            The latest aggregated report time for each month is stored in the
+            static_aggregate_watermark table. If incremental is True, only
+            vessels having newer static reports since the last aggregation
+            will be updated. The aggregate table will be rebuilt entirely if
+            no watermark exists, or if reports older than the watermark were
+            inserted or deleted since the last aggregation
+
             args:
                 months_str (list)
                     list of strings with format: YYYYmm
                 verbose (bool)
                     logs messages to stdout
+                incremental (bool)
+                    if False, the aggregate table will always be rebuilt
         '''
 
         cur = self.cursor()
+        cur.execute(sql_aggregate_watermark)
 
         for month in months_str:
             # check for monthly tables in dbfiles containing static reports
@@ -435,73 +1427,241 @@ class PostgresDBConn(_DBConn, psycopg.Connection):
             if static_tables == []:
                 continue
 
-            if verbose:
-                print('aggregating static reports into '
-                      f'static_{month}_aggregate...')
-            cur.execute(f'SELECT DISTINCT s.mmsi FROM ais_{month}_static AS s')
-            mmsi_res = cur.fetchall()
-            if mmsi_res == []:
-                mmsis = np.array([], dtype=int)
+            cur.execute('SELECT table_name FROM information_schema.tables '
+                        f'WHERE table_name = \'static_{month}_aggregate\'')
+            aggregate_exists = cur.fetchall() != []
+
+            cur.execute(
+                'SELECT watermark, row_count FROM static_aggregate_watermark '
+                'WHERE month = %s', [month])
+            res = cur.fetchone()
+
+            cur.execute('SELECT COUNT(*) AS row_count, MAX(time) AS max_time '
+                        f'FROM ais_{month}_static')
+            stats = cur.fetchone()
+
+            # if the count of rows up to the watermark has changed, older
+            # reports were added or removed and the aggregate must be rebuilt
+            if (incremental and aggregate_exists and res is not None):
+                watermark = res['watermark']
+                cur.execute(
+                    'SELECT COUNT(*) AS row_count '
+                    f'FROM ais_{month}_static WHERE time <= %s', [watermark])
+                if cur.fetchone()['row_count'] != res['row_count']:
+                    watermark = None
             else:
-                mmsis = np.array(sorted([r['mmsi'] for r in mmsi_res]),
-                                 dtype=int).flatten()
+                watermark = None
+
+            if watermark is not None and (stats['row_count']
+                                          == res['row_count']):
+                if verbose:
+                    print(f'static_{month}_aggregate is up to date')
+                continue
+
+            with self.conn.cursor(row_factory=psycopg.rows.tuple_row) as sel:
+                if watermark is None:
+                    if verbose:
+                        print('aggregating static reports into '
+                              f'static_{month}_aggregate...')
+                    sel.execute(
+                        psycopg.sql.SQL(
+                            _sql_select_static_aggregate.format(month=month,
+                                                                where='')))
+                else:
+                    if verbose:
+                        print('updating static reports in '
+                              f'static_{month}_aggregate...')
+                    # aggregate all static reports for vessels having new
+                    # reports
+                    where = ('WHERE s.mmsi IN (SELECT DISTINCT mmsi '
+                             f'FROM ais_{month}_static WHERE time > %s)')
+                    sel.execute(
+                        psycopg.sql.SQL(
+                            _sql_select_static_aggregate.format(month=month,
+                                                                where=where)),
+                        [watermark])
+                agg_rows = list(_aggregate_static_rows(_fetch_batches(sel)))
+
+            if watermark is None:
+                cur.execute(
+                    psycopg.sql.SQL(
+                        f'DROP TABLE IF EXISTS static_{month}_aggregate'))
+                cur.execute(sql_aggregate.format(month))
+
+                if len(agg_rows) == 0:
+                    warnings.warn('no rows to aggregate! '
+                                  f'table: static_{month}_aggregate')
+
+            cur.executemany(
+                psycopg.sql.SQL(_sql_upsert_static_aggregate(month, '%s')),
+                agg_rows)
+            cur.execute(
+                'INSERT INTO static_aggregate_watermark VALUES (%s,%s,%s) '
+                'ON CONFLICT (month) DO UPDATE SET '
+                'watermark = excluded.watermark, '
+                'row_count = excluded.row_count',
+                [month, stats['max_time'] or 0, stats['row_count']])
 
+            self.commit()
+        self.invalidate_schema_cache()
+
+    def update_partition_catalog(self,
+                                 months_str: list,
+                                 verbose: bool = True):
+        ''' store the row count, count of unique MMSIs, time range, and
+            bounding box of monthly dynamic tables in the partition_catalog
+            table. queries will use the catalog to skip months that are empty
+            or outside of the queried time range, without reading from
+            the monthly tables. statistics computed before the end of a month
+            are not used to skip that month, since data may still be added
+            to it
+
+            this function is called by
+            :func:`aisdb.database.decoder.decode_msgs` and
+            :meth:`aisdb.database.dbconn.PostgresDBConn.bulk_load`, and must
+            be called after adding data to a past month by other means
+
+            args:
+                months_str (list)
+                    list of strings with format: YYYYmm
+                verbose (bool)
+                    logs messages to stdout
+        '''
+        cur = self.cursor(row_factory=psycopg.rows.tuple_row)
+        cur.execute(sql_partition_catalog)
+
+        for month in months_str:
+            cur.execute('SELECT table_name FROM information_schema.tables '
+                        f'WHERE table_name = \'ais_{month}_dynamic\'')
+            if cur.fetchall() == []:
+                continue
+            if verbose:
+                print(f'updating partition catalog for month {month}...')
+            updated_at = int(datetime.now().timestamp())
             cur.execute(
                 psycopg.sql.SQL(
-                    f'DROP TABLE IF EXISTS static_{month}_aggregate'))
-
-            sql_select = psycopg.sql.SQL(f'''
-              SELECT
-                s.mmsi, s.imo, TRIM(vessel_name) as vessel_name, s.ship_type,
-                s.call_sign, s.dim_bow, s.dim_stern, s.dim_port, s.dim_star,
-                s.draught
-              FROM ais_{month}_static AS s WHERE s.mmsi = %s
-            ''')
-
-            agg_rows = []
-            for mmsi in mmsis:
-                _ = cur.execute(sql_select, (str(mmsi), ))
-                cur_mmsi = [tuple(i.values()) for i in cur.fetchall()]
-                cols = np.array(cur_mmsi, dtype=object).T
-                assert len(cols) > 0
-
-                filtercols = np.array(
-                    [
-                        np.array(list(filter(None, col)), dtype=object)
-                        for col in cols
-                    ],
-                    dtype=object,
-                )
+                    _sql_select_partition_stats.format(month=month)))
+            stats = cur.fetchone()
+            cur.execute(
+                psycopg.sql.SQL(_sql_upsert_partition_catalog('%s')),
+                [month, *stats, updated_at])
 
-                paddedcols = np.array(
-                    [col if len(col) > 0 else [None] for col in filtercols],
-                    dtype=object,
-                )
+        self.commit()
+        self.invalidate_schema_cache()
+        self._set_db_daterange()
 
-                aggregated = [
-                    Counter(col).most_common(1)[0][0] for col in paddedcols
-                ]
+    def update_vessel_day_summary(self,
+                                  months_str: list,
+                                  verbose: bool = True):
+        ''' summarize the position reports of each vessel on each day in the
+            vessel_day_summary table. the summary contains the bounding box,
+            first and last report time, and count of reports for each vessel
+            and day. query callbacks ending in ``_summary`` in
+            :mod:`aisdb.database.sqlfcn_callbacks` use it to find vessels
+            in a region before reading from the monthly tables.
+            existing summaries for each month will be replaced
+
+            this function is called by
+            :func:`aisdb.database.decoder.decode_msgs`, and should be called
+            after adding data to the database by other means
 
-                agg_rows.append(aggregated)
+            args:
+                months_str (list)
+                    list of strings with format: YYYYmm
+                verbose (bool)
+                    logs messages to stdout
+        '''
+        cur = self.cursor()
+        cur.execute(sql_vessel_day_summary)
 
-            cur.execute(sql_aggregate.format(month))
+        for month in months_str:
+            cur.execute('SELECT table_name FROM information_schema.tables '
+                        f'WHERE table_name = \'ais_{month}_dynamic\'')
+            if cur.fetchall() == []:
+                continue
+            if verbose:
+                print(f'summarizing vessel days for month {month}...')
+            cur.execute(
+                'DELETE FROM vessel_day_summary WHERE day >= %s AND day < %s',
+                _month_days(month))
+            cur.execute(
+                psycopg.sql.SQL(
+                    _sql_insert_vessel_day_summary.format(
+                        month=month, least='LEAST', greatest='GREATEST')))
 
-            if len(agg_rows) == 0:
-                warnings.warn('no rows to aggregate! '
-                              f'table: static_{month}_aggregate')
-                return
+        self.commit()
+        self.invalidate_schema_cache()
+
+    def migrate_partitioned(self,
+                            months_str: list = None,
+                            verbose: bool = True):
+        ''' attach monthly tables as partitions of the ais_dynamic and
+            ais_static tables, which are partitioned by range of time.
+            the partitioned tables will be created if they don't exist yet.
+
+            queries created by :func:`aisdb.database.sqlfcn.crawl_dynamic`
+            and :func:`aisdb.database.sqlfcn.crawl_dynamic_static` will
+            select from the partitioned tables using a single time range
+            predicate, so that Postgres can prune partitions outside of the
+            queried months and scan the remaining partitions in parallel.
+            monthly tables are not copied, and may still be updated directly.
+            new monthly tables created by
+            :func:`aisdb.database.decoder.decode_msgs` are attached
+            automatically once the database has been migrated
+
+            the time range of each month is validated before attaching, so
+            that reads are not blocked while the table is scanned. tables
+            containing rows outside of their month will raise
+            psycopg.errors.CheckViolation
 
-            skip_nommsi = np.array(agg_rows, dtype=object)
-            assert len(skip_nommsi.shape) == 2
-            skip_nommsi = skip_nommsi[skip_nommsi[:, 0] != None]
-            assert len(skip_nommsi) > 1
-            insert_vals = ','.join(['%s' for _ in range(skip_nommsi.shape[1])])
-            insert_stmt = psycopg.sql.SQL(
-                f'INSERT INTO static_{month}_aggregate '
-                f'VALUES ({insert_vals})')
-            cur.executemany(insert_stmt, map(tuple, skip_nommsi))
+            args:
+                months_str (list)
+                    list of strings with format: YYYYmm. if None, all
+                    monthly tables will be attached
+                verbose (bool)
+                    logs messages to stdout
+        '''
+        cur = self.cursor()
+        cur.execute(sql_createtable_dynamic_partitioned)
+        cur.execute(sql_createtable_static_partitioned)
+        self.commit()
 
-            self.commit()
+        if months_str is None:
+            months_str = self._dynamic_months()
+
+        for month in months_str:
+            start, end = (day * 86400 for day in _month_days(month))
+            for table in ('dynamic', 'static'):
+                name = f'ais_{month}_{table}'
+                if name not in self.table_names():
+                    continue
+                cur.execute(
+                    'SELECT c.relname FROM pg_inherits AS i '
+                    'JOIN pg_class AS c ON c.oid = i.inhrelid '
+                    'WHERE c.relname = %s', [name])
+                if cur.fetchall() != []:
+                    continue
+                if verbose:
+                    print(f'attaching {name} to ais_{table}...')
+
+                # a valid constraint matching the partition bounds allows
+                # the table to be attached without scanning it again
+                cur.execute(f'ALTER TABLE {name} '
+                            f'ADD CONSTRAINT {name}_time_range '
+                            f'CHECK (time >= {start} AND time < {end}) '
+                            'NOT VALID')
+                cur.execute(f'ALTER TABLE {name} '
+                            f'VALIDATE CONSTRAINT {name}_time_range')
+                cur.execute(f'ALTER TABLE ais_{table} '
+                            f'ATTACH PARTITION {name} '
+                            f'FOR VALUES FROM ({start}) TO ({end})')
+                cur.execute(f'ALTER TABLE {name} '
+                            f'DROP CONSTRAINT {name}_time_range')
+                self.commit()
+
+        cur.close()
+        self.partitioned = True
+        self.invalidate_schema_cache()
 
 
 class ConnectionType(Enum):
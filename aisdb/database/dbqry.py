@@ -5,8 +5,14 @@
 from collections import UserDict
 from datetime import datetime, timedelta, date
 from functools import reduce
-import warnings
+from itertools import count, groupby
+from operator import itemgetter
+import heapq
+import queue
+import re
 import sqlite3
+import threading
+import warnings
 
 import numpy as np
 import psycopg
@@ -14,9 +20,58 @@ import psycopg
 from aisdb.database import sqlfcn, sqlfcn_callbacks
 from aisdb.database.create_tables import sql_createtable_dynamic
 from aisdb.database.dbconn import PostgresDBConn, SQLiteDBConn
+from aisdb.database.sql_query_strings import sql_params
+from aisdb.gis import dt_2_epoch
 from aisdb.webdata.marinetraffic import VesselInfo
 
 
+# string literals, quoted identifiers, and comments in SQL code, where '?'
+# is not a parameter placeholder
+_sql_quoted = re.compile(
+    r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", flags=re.DOTALL)
+
+
+def _psycopg_placeholders(sql):
+    ''' convert '?' parameter placeholders to the '%s' format used by
+        psycopg. question marks in string literals, quoted identifiers, and
+        comments are not converted. percent signs are escaped everywhere,
+        since psycopg does not parse SQL quotes
+    '''
+    parts = []
+    pos = 0
+    for match in _sql_quoted.finditer(sql):
+        code = sql[pos:match.start()]
+        parts.append(code.replace('%', '%%').replace('?', '%s'))
+        parts.append(match.group().replace('%', '%%'))
+        pos = match.end()
+    parts.append(sql[pos:].replace('%', '%%').replace('?', '%s'))
+    return ''.join(parts)
+
+
+# numpy types used for columns fetched by DBQuery.gen_qry(columnar=True).
+# null values in float columns will be stored as NaN, and columns not listed
+# here are stored as python objects
+_columnar_dtypes = {
+    'mmsi': np.int64,
+    'time': np.int64,
+    'longitude': np.float64,
+    'latitude': np.float64,
+    'sog': np.float64,
+    'cog': np.float64,
+    'rot': np.float64,
+    'heading': np.float64,
+}
+
+
+# unique names for Postgres server-side cursors
+_cursor_ids = count()
+
+# maximum fraction of the area of a month in the partition catalog that may
+# be covered by the query bounding box, for the month to be queried using an
+# SQLite R*Tree index. scanning the table is faster for larger regions
+_rtree_max_overlap = 0.05
+
+
 class DBQuery(UserDict):
     ''' A database abstraction allowing the creation of SQL code via arguments
         passed to __init__(). Args are stored as a dictionary (UserDict).
@@ -26,7 +81,9 @@ class DBQuery(UserDict):
                 database connection object
             callback (function)
                 anonymous function yielding SQL code specifying "WHERE"
-                clauses. common queries are included in
+                clauses, as a string or a tuple of SQL code and a list of
+                parameters for '?' placeholders. common queries are
+                included in
                 :mod:`aisdb.database.sqlfcn_callbacks`, e.g.
                 >>> from aisdb.database.sqlfcn_callbacks import in_timerange_validmmsi
                 >>> callback = in_timerange_validmmsi
@@ -114,89 +171,130 @@ class DBQuery(UserDict):
         assert isinstance(self.data['start'], (datetime, date))
         self.data.update({'months': sqlfcn_callbacks.dt2monthstr(**self.data)})
 
-    def _build_tables_sqlite(self,
-                             cur: sqlite3.Cursor,
-                             month: str,
-                             rng_string: str,
-                             reaggregate_static: bool = False,
-                             verbose: bool = False):
-        # check if static tables exist
-        cur.execute(
-            'SELECT * FROM sqlite_master '
-            'WHERE type="table" AND name=?', [f'ais_{month}_static'])
-        if len(cur.fetchall()) == 0:
-            #sqlite_createtable_staticreport(self.dbconn, month)
-            warnings.warn(f'No results found in ais_{month}_static')
-
-        # check if aggregate tables exist
-        cur.execute(('SELECT * FROM sqlite_master '
-                     'WHERE type="table" and name=?'),
-                    [f'static_{month}_aggregate'])
-        res = cur.fetchall()
-
-        if len(res) == 0 or reaggregate_static:
-            if verbose:
-                print(f'building static index for month {month}...',
-                      flush=True)
-            self.dbconn.aggregate_static_msgs([month], verbose)
-
-        # check if dynamic tables exist
-        cur.execute(
-            'SELECT * FROM sqlite_master WHERE '
-            'type="table" and name=?', [f'ais_{month}_dynamic'])
-        if len(cur.fetchall()) == 0:
-            if isinstance(self.dbconn, SQLiteDBConn):
-                self.dbconn.execute(sql_createtable_dynamic.format(month))
-
-            warnings.warn('No data for selected time range! '
-                          f'{rng_string}')
+    def _catalog_months(self):
+        ''' select months to be queried using the partition catalog of the
+            database connection. months without any rows are skipped.
+            if the query callback selects a time range or bounding box,
+            months outside of the time range or bounding box are also skipped.
+            months missing from the catalog, or with statistics computed
+            before the end of the month, are always queried
+        '''
+        catalog = getattr(self.dbconn, 'partition_catalog', {})
+        months = [
+            month for month in self.data['months']
+            if month not in catalog or catalog[month]['row_count'] > 0
+        ]
+        if not any(month in catalog for month in months):
+            return months
+
+        # check which filters are applied by the callback.
+        # any disjunction could select rows outside of the filters
+        where, _ = sql_params(self['callback'](month=months[0],
+                                               alias='d',
+                                               **self.data))
+        if re.search(r'\bOR\b', where, flags=re.IGNORECASE):
+            return months
+        filter_time = (re.search(r'd\.time\s*>=', where)
+                       and re.search(r'd\.time\s*<=', where))
+        bbox = [self.data.get(k) for k in ('xmin', 'xmax', 'ymin', 'ymax')]
+        filter_bbox = (re.search(r'd\.longitude\s*>=', where)
+                       and re.search(r'd\.latitude\s*<=', where)
+                       and None not in bbox
+                       and -180 <= bbox[0] < bbox[1] <= 180)
+
+        selected = []
+        for month in months:
+            stats = catalog.get(month, None)
+            if stats is None:
+                selected.append(month)
+            elif filter_time and (
+                    stats['time_max'] < dt_2_epoch(self['start'])
+                    or stats['time_min'] > dt_2_epoch(self['end'])):
+                continue
+            elif filter_bbox and (stats['longitude_max'] < bbox[0]
+                                  or stats['longitude_min'] > bbox[1]
+                                  or stats['latitude_max'] < bbox[2]
+                                  or stats['latitude_min'] > bbox[3]):
+                continue
+            else:
+                selected.append(month)
+        return selected
 
-    def _build_tables_postgres(self,
-                               cur: psycopg.Cursor,
-                               month: str,
-                               rng_string: str,
-                               reaggregate_static: bool = False,
-                               verbose: bool = False):
+    def _rtree_months(self, months):
+        ''' select months to be queried using an SQLite R*Tree index.
+            months are skipped if the query bounding box covers a large part
+            of the area of the month in the partition catalog
+        '''
+        if not all(k in self.data.keys()
+                   for k in ('xmin', 'xmax', 'ymin', 'ymax')):
+            return []
+        catalog = getattr(self.dbconn, 'partition_catalog', {})
+        selected = []
+        for month in self.dbconn.rtree_months():
+            if month not in months:
+                continue
+            stats = catalog.get(month, None)
+            if stats is not None and stats['row_count'] > 0:
+                width = stats['longitude_max'] - stats['longitude_min']
+                height = stats['latitude_max'] - stats['latitude_min']
+                overlap_x = (min(self['xmax'], stats['longitude_max']) -
+                             max(self['xmin'], stats['longitude_min']))
+                overlap_y = (min(self['ymax'], stats['latitude_max']) -
+                             max(self['ymin'], stats['latitude_min']))
+                overlap = max(overlap_x, 0) * max(overlap_y, 0)
+                if overlap > _rtree_max_overlap * width * height:
+                    continue
+            selected.append(month)
+        return selected
+
+    def _build_tables(self,
+                      month: str,
+                      rng_string: str,
+                      reaggregate_static: bool = False,
+                      verbose: bool = False):
+        ''' check that tables exist for the queried month.
+            table names and the status of static aggregates are cached for
+            each database, so no metadata is queried unless tables are
+            created.
+            static aggregates are only built here if reaggregate_static is
+            True, as they are kept up to date when data is added by
+            :func:`aisdb.database.decoder.decode_msgs`. aggregates should
+            be updated using
+            :meth:`aisdb.database.dbconn.SQLiteDBConn.aggregate_static_msgs`
+            after adding static reports by other means
+        '''
+        tables = self.dbconn.table_names()
 
         # check if static tables exist
-        static_qry = psycopg.sql.SQL('''
-            SELECT table_name
-            FROM information_schema.tables
-            WHERE information_schema.tables.table_name = {TABLE}
-        ''').format(TABLE=psycopg.sql.Literal(f'ais_{month}_static'))
-        cur.execute(static_qry)
-        count_static = cur.fetchall()
-
-        if len(count_static) == 0:
+        static_exists = f'ais_{month}_static' in tables
+        if not static_exists:
             warnings.warn('No static data for selected time range! '
                           f'{rng_string}')
 
         # check if aggregate tables exist
-        cur.execute(
-            psycopg.sql.SQL('''
-            SELECT table_name
-            FROM information_schema.tables
-            WHERE table_name = {TABLE}
-        ''').format(TABLE=psycopg.sql.Literal(f'static_{month}_aggregate')))
-        res = cur.fetchall()
-
-        if len(res) == 0 or reaggregate_static:
+        if static_exists and reaggregate_static:
             if verbose:
                 print(f'building static index for month {month}...',
                       flush=True)
             self.dbconn.aggregate_static_msgs([month], verbose)
+        elif static_exists:
+            status = self.dbconn.static_aggregate_status(month)
+            if status == 'missing':
+                raise RuntimeError(
+                    f'static_{month}_aggregate does not exist. create it '
+                    'using dbconn.aggregate_static_msgs(), or query with '
+                    'reaggregate_static=True')
+            elif status == 'stale':
+                warnings.warn(f'static_{month}_aggregate does not include '
+                              'the latest static reports. update it using '
+                              'dbconn.aggregate_static_msgs()')
 
         # check if dynamic tables exist
-        cur.execute(
-            psycopg.sql.SQL('''
-            SELECT table_name
-            FROM information_schema.tables
-            WHERE table_name = {TABLE}
-        ''').format(TABLE=psycopg.sql.Literal(f'ais_{month}_dynamic')))
-
-        if len(cur.fetchall()) == 0:  # pragma: no cover
-            #if isinstance(self.dbconn, ConnectionType.SQLITE.value):
-            #    sqlite_createtable_dynamicreport(self.dbconn, month)
+        if f'ais_{month}_dynamic' not in tables:
+            if isinstance(self.dbconn, SQLiteDBConn):
+                self.dbconn.execute(sql_createtable_dynamic.format(month))
+                self.dbconn.invalidate_schema_cache()
+
             warnings.warn('No data for selected time range! '
                           f'{rng_string}')
 
@@ -217,11 +315,12 @@ class DBQuery(UserDict):
         print('retrieving vessel info ', end='', flush=True)
         for month in self.data['months']:
             # check unique mmsis
-            sql = (
-                'SELECT DISTINCT(mmsi) '
-                f'FROM ais_{month}_dynamic AS d WHERE '
-                f'{sqlfcn_callbacks.in_validmmsi_bbox(alias="d", **boundary)}')
-            mmsis = self.dbconn.execute(sql).fetchall()
+            where, params = sqlfcn_callbacks.in_validmmsi_bbox(alias='d',
+                                                               **boundary)
+            sql = ('SELECT DISTINCT(mmsi) '
+                   f'FROM ais_{month}_dynamic AS d WHERE {where}')
+            mmsis = self.dbconn.execute(*self._bind(self.dbconn,
+                                                    (sql, params))).fetchall()
             print('.', end='', flush=True)  # first dot
 
             # retrieve vessel metadata
@@ -230,10 +329,282 @@ class DBQuery(UserDict):
                                            retry_404=retry_404,
                                            infotxt=f'{month} ')
 
+    def _limit(self, qry):
+        ''' append the row limit to a tuple of SQL code and parameters '''
+        if 'limit' not in self.data.keys():
+            return qry
+        sql, params = qry
+        return sql + '\nLIMIT ?', params + [int(self.data['limit'])]
+
+    def _bind(self, conn, qry):
+        ''' convert a query to arguments for cursor.execute().
+            queries may be a tuple of SQL code and parameters, or SQL code
+            as a string for callbacks that do not use parameters.
+            '?' parameter placeholders are converted to the format used by
+            psycopg for Postgres connections
+        '''
+        sql, params = sql_params(qry)
+        if isinstance(conn, psycopg.Connection):
+            sql = _psycopg_placeholders(sql)
+        return sql, params
+
+    def _cursor(self, conn, batchsize, row_factory=None):
+        ''' create a cursor for fetching query results in batches.
+            for Postgres, a named server-side cursor is used, so that rows are
+            transferred as they are fetched instead of buffering the entire
+            result set in client memory
+        '''
+        if isinstance(conn, psycopg.Connection):
+            kwargs = {}
+            if row_factory is not None:
+                kwargs['row_factory'] = row_factory
+            cur = conn.cursor(name=f'aisdb_qry_{next(_cursor_ids)}', **kwargs)
+            cur.itersize = batchsize
+        else:
+            cur = conn.cursor()
+        return cur
+
+    def _gen_qry_columnar(self,
+                          qry,
+                          verbose=False,
+                          batchsize=10**5,
+                          conn=None,
+                          warn_empty=True):
+        ''' run the query and fetch rows as tuples into numpy column arrays.
+            rows are fetched in batches, and boundaries between MMSIs are
+            found by comparing adjacent values in the mmsi column.
+            rows for the last MMSI in each batch are carried over to the next
+            batch
+
+            yields:
+                dictionary of numpy column arrays for each unique MMSI
+        '''
+        conn = self.dbconn if conn is None else conn
+        cur = self._cursor(conn, batchsize, psycopg.rows.tuple_row)
+        if not isinstance(conn, psycopg.Connection):
+            cur.row_factory = None
+
+        try:
+            dt = datetime.now()
+            cur.execute(*self._bind(conn, qry))
+            res = cur.fetchmany(batchsize)
+            delta = datetime.now() - dt
+
+            if verbose:
+                print(f'query time: {delta.total_seconds():.2f}s\n'
+                      'fetching rows...')
+            if res == []:
+                if warn_empty:
+                    warnings.warn('No results for query!')
+                return
+
+            columns = [col[0] for col in cur.description]
+            dtype = np.dtype([(col, _columnar_dtypes.get(col, object))
+                              for col in columns])
+            carry = np.empty(0, dtype=dtype)
+
+            while len(res) > 0:
+                buf = np.empty(len(carry) + len(res), dtype=dtype)
+                buf[:len(carry)] = carry
+                buf[len(carry):] = res
+                batch = {
+                    col: np.ascontiguousarray(buf[col])
+                    for col in columns
+                }
+
+                mmsi = batch['mmsi']
+                start = 0
+                for end in np.nonzero(mmsi[1:] != mmsi[:-1])[0] + 1:
+                    yield {col: arr[start:end] for col, arr in batch.items()}
+                    start = end
+                carry = buf[start:]
+
+                res = cur.fetchmany(batchsize)
+
+            yield {col: np.ascontiguousarray(carry[col]) for col in columns}
+        finally:
+            cur.close()
+
+    def _gen_qry_rows(self,
+                      qry,
+                      verbose=False,
+                      batchsize=10**5,
+                      conn=None,
+                      warn_empty=True):
+        ''' run the query and yield a list of rows for each unique MMSI '''
+        conn = self.dbconn if conn is None else conn
+        cur = self._cursor(conn, batchsize)
+
+        try:
+            # get rows in batches, yield sets of rows for each unique MMSI
+            mmsi_rows: list = []
+            dt = datetime.now()
+            _ = cur.execute(*self._bind(conn, qry))
+            res: list = cur.fetchmany(batchsize)
+            delta = datetime.now() - dt
+
+            if verbose:
+                print(f'query time: {delta.total_seconds():.2f}s\n'
+                      'fetching rows...')
+            if res == [] and warn_empty:
+                # raise SyntaxError(f'no results for query!\n{qry}')
+                warnings.warn('No results for query!')
+
+            while len(res) > 0:
+                mmsi_rows += res
+                mmsi_rowvals = np.array([r['mmsi'] for r in mmsi_rows])
+                ummsi_idx = np.where(
+                    mmsi_rowvals[:-1] != mmsi_rowvals[1:])[0] + 1
+                ummsi_idx = reduce(np.append,
+                                   ([0], ummsi_idx, [len(mmsi_rows)]))
+                for i in range(len(ummsi_idx) - 2):
+                    yield mmsi_rows[ummsi_idx[i]:ummsi_idx[i + 1]]
+                if len(ummsi_idx) > 2:
+                    mmsi_rows = mmsi_rows[ummsi_idx[i + 1]:]
+
+                res = cur.fetchmany(batchsize)
+            yield mmsi_rows
+        finally:
+            cur.close()
+
+    def _connect(self):
+        ''' open a new connection to the database, for use by a thread '''
+        if isinstance(self.dbconn, PostgresDBConn):
+            return psycopg.connect(self.dbconn.connection_string,
+                                   row_factory=psycopg.rows.dict_row)
+        conn = sqlite3.connect(self.dbconn.dbpath, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _gen_qry_month(self, qry, columnar, batchsize, results, stop):
+        ''' parallel worker for _gen_qry_parallel(). runs the query on a new
+            connection, and puts results for each MMSI into the results queue.
+            the end of results is marked by None, or by an exception raised
+            while querying
+        '''
+
+        def _put(item):
+            # wait for space in the queue, unless the consumer has stopped
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            conn = self._connect()
+            if columnar:
+                rowgen = self._gen_qry_columnar(qry,
+                                                batchsize=batchsize,
+                                                conn=conn,
+                                                warn_empty=False)
+            else:
+                rowgen = self._gen_qry_rows(qry,
+                                            batchsize=batchsize,
+                                            conn=conn,
+                                            warn_empty=False)
+            try:
+                for rows in rowgen:
+                    if len(rows) > 0 and not _put(rows):
+                        return
+            finally:
+                # close the cursor before the connection
+                rowgen.close()
+                conn.close()
+            _put(None)
+        except Exception as err:
+            _put(err)
+
+    def _gen_qry_parallel(self,
+                          fcn,
+                          qry_args,
+                          columnar=False,
+                          verbose=False,
+                          itersize=10**5):
+        ''' query each month in a separate thread and connection, and merge
+            the results in order of MMSI.
+            since monthly tables do not overlap in time, results for the same
+            MMSI are concatenated in order of month
+        '''
+        months = qry_args['months']
+        qrys = []
+        for month in months:
+            qry = self._limit(sql_params(fcn(**dict(qry_args,
+                                                    months=[month]))))
+            qrys.append(qry)
+            if verbose:
+                print(*qry, sep='\n')
+
+        # each thread buffers a limited number of MMSIs. smaller batches are
+        # fetched so that merged results can be yielded sooner
+        batchsize = max(itersize // len(months), min(itersize, 10**4))
+        queues = [queue.Queue(maxsize=64) for _ in months]
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self._gen_qry_month,
+                             args=(qry, columnar, batchsize, results, stop),
+                             daemon=True) for qry, results in zip(qrys, queues)
+        ]
+        for thread in threads:
+            thread.start()
+
+        def _iter_results(i, results):
+            while (rows := results.get()) is not None:
+                if isinstance(rows, Exception):
+                    raise rows
+                mmsi = rows['mmsi'][0] if columnar else rows[0]['mmsi']
+                yield mmsi, i, rows
+
+        limit = self.data.get('limit', None)
+        count = 0
+        try:
+            # k-way merge of sorted streams. ties on MMSI are ordered by
+            # month, so rows are never compared directly
+            merged = heapq.merge(
+                *[_iter_results(i, q) for i, q in enumerate(queues)])
+            for _, group in groupby(merged, key=itemgetter(0)):
+                parts = [rows for _, _, rows in group]
+                if columnar:
+                    rows = {
+                        col: np.concatenate([part[col] for part in parts])
+                        for col in parts[0].keys()
+                    } if len(parts) > 1 else parts[0]
+                    size = len(rows['mmsi'])
+                else:
+                    rows = reduce(list.__add__, parts)
+                    size = len(rows)
+                if limit is not None and count + size >= limit:
+                    if columnar:
+                        rows = {
+                            col: arr[:limit - count]
+                            for col, arr in rows.items()
+                        }
+                    else:
+                        rows = rows[:limit - count]
+                    yield rows
+                    count = limit
+                    break
+                count += size
+                yield rows
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        if count == 0:
+            warnings.warn('No results for query!')
+            if not columnar:
+                yield []
+
     def gen_qry(self,
                 fcn=sqlfcn.crawl_dynamic,
                 reaggregate_static=False,
-                verbose=False):
+                verbose=False,
+                columnar=False,
+                parallel=False,
+                itersize=10**5):
         ''' queries the database using the supplied SQL function.
 
             args:
@@ -243,10 +614,26 @@ class DBQuery(UserDict):
                     Callback function that will generate SQL code using
                     the args stored in self
                 reaggregate_static (bool)
-                    If True, the metadata aggregate tables will be regenerated
-                    from
+                    If True, the metadata aggregate tables will be updated
+                    with any static reports added since the last aggregation
                 verbose (bool)
                     Log info to stdout
+                columnar (bool)
+                    If True, rows are fetched as tuples into numpy column
+                    arrays, and a dictionary of column arrays will be yielded
+                    for each MMSI instead of a list of rows. Null values in
+                    float columns will be NaN.
+                    :func:`aisdb.track_gen.TrackGen` accepts either format
+                parallel (bool)
+                    If True, the query for each month will be run in a
+                    separate thread and database connection, and the sorted
+                    results are merged by MMSI as they are fetched. Results
+                    will be yielded in the same order
+                itersize (int)
+                    Number of rows fetched from the database at a time.
+                    Postgres queries use a server-side cursor, so memory
+                    usage is bounded by itersize rather than the size of the
+                    query result
 
             yields:
                 numpy array of rows for each unique MMSI
@@ -274,8 +661,13 @@ class DBQuery(UserDict):
         assert isinstance(db_rng['start'], date)
         assert isinstance(db_rng['end'], date)
 
-        cur = self.dbconn.cursor()
-        for month in self.data['months']:
+        months = self._catalog_months()
+        if months == []:
+            if verbose:
+                print('skipping query (no data in range)...')
+            return
+
+        for month in months:
             month_date = datetime(int(month[:4]), int(month[4:]), 1)
             qry_start = self["start"] - timedelta(days=self["start"].day)
 
@@ -287,46 +679,31 @@ class DBQuery(UserDict):
             rng_string += ' -> '
             rng_string += f'{db_rng["end"].year}-{db_rng["end"].month:02d}-{db_rng["end"].day:02d}'
 
-            if isinstance(self.dbconn, SQLiteDBConn):
-                self._build_tables_sqlite(cur, month, rng_string,
-                                          reaggregate_static, verbose)
-            elif isinstance(self.dbconn, PostgresDBConn):
-                self._build_tables_postgres(cur, month, rng_string,
-                                            reaggregate_static, verbose)
-            else:
-                assert False
-
-        qry = fcn(**self.data)
+            self._build_tables(month, rng_string, reaggregate_static,
+                               verbose)
+
+        qry_args = dict(self.data, months=months)
+        qry_args['dialect'] = ('postgres' if isinstance(
+            self.dbconn, PostgresDBConn) else 'sqlite')
+        if isinstance(self.dbconn, SQLiteDBConn):
+            # bounding box callbacks will use R*Tree indexes for these months
+            qry_args['rtree_months'] = self._rtree_months(months)
+        elif self.dbconn.partitioned:
+            # select from the partitioned tables in a single query
+            qry_args['partitioned'] = True
+
+        if parallel:
+            yield from self._gen_qry_parallel(fcn, qry_args, columnar,
+                                              verbose, itersize)
+            return
 
-        if 'limit' in self.data.keys():
-            qry += f'\nLIMIT {self.data["limit"]}'
+        qry = self._limit(sql_params(fcn(**qry_args)))
 
         if verbose:
-            print(qry)
-
-        # get 500k rows at a time, yield sets of rows for each unique MMSI
-        mmsi_rows: list = []
-        dt = datetime.now()
-        _ = cur.execute(qry)
-        res: list = cur.fetchmany(10**5)
-        delta = datetime.now() - dt
+            print(*qry, sep='\n')
 
-        if verbose:
-            print(
-                f'query time: {delta.total_seconds():.2f}s\nfetching rows...')
-        if res == []:
-            # raise SyntaxError(f'no results for query!\n{qry}')
-            warnings.warn('No results for query!')
+        if columnar:
+            yield from self._gen_qry_columnar(qry, verbose, itersize)
+            return
 
-        while len(res) > 0:
-            mmsi_rows += res
-            mmsi_rowvals = np.array([r['mmsi'] for r in mmsi_rows])
-            ummsi_idx = np.where(mmsi_rowvals[:-1] != mmsi_rowvals[1:])[0] + 1
-            ummsi_idx = reduce(np.append, ([0], ummsi_idx, [len(mmsi_rows)]))
-            for i in range(len(ummsi_idx) - 2):
-                yield mmsi_rows[ummsi_idx[i]:ummsi_idx[i + 1]]
-            if len(ummsi_idx) > 2:
-                mmsi_rows = mmsi_rows[ummsi_idx[i + 1]:]
-
-            res = cur.fetchmany(10**5)
-        yield mmsi_rows
+        yield from self._gen_qry_rows(qry, verbose, itersize)
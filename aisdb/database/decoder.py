@@ -3,25 +3,80 @@
 '''
 
 from hashlib import md5
+from contextlib import ExitStack, contextmanager, nullcontext
 from functools import partial
-from copy import deepcopy
 from datetime import timedelta
+from itertools import chain
+from multiprocessing import Pool
 import gzip
 import os
-import pickle
+import shutil
 import tempfile
+import threading
+import warnings
 import zipfile
 
 from dateutil.rrule import rrule, MONTHLY
 import psycopg
 
 from aisdb.aisdb import decoder
+from aisdb.database.create_tables import (
+    sql_createtable_dynamic,
+    sql_createtable_dynamic_noindex,
+    sql_createtable_ingest_manifest,
+    sql_createtable_static,
+)
 from aisdb.database.dbconn import SQLiteDBConn, PostgresDBConn
 from aisdb.proc_util import getfiledate
-from aisdb import sqlpath
+from aisdb import sqlite3
+
+
+# bytes hashed at the start of each file, and preceding the ingested offset
+_hash_window = 1000
+
+
+def _content_hash(path, f, offset):
+    ''' md5 hash of the first kilobyte of data, and of the kilobyte
+        preceding the ingested byte offset.
+        the second window moves with the offset as a file grows, so that a
+        file can be verified as an extension of previously ingested data
+        without hashing the entire file
+    '''
+    # skip header row in CSV format(~1.6kb)
+    start = 1600 if path[-4:].lower() == '.csv' else 0
+    digest = md5()
+    f.seek(start)
+    digest.update(f.read(max(0, min(_hash_window, offset - start))))
+    tail_start = max(start, offset - _hash_window)
+    if offset > tail_start:
+        f.seek(tail_start)
+        digest.update(f.read(offset - tail_start))
+    return digest.hexdigest()
+
+
+def _last_line_end(f, size):
+    ''' byte offset following the last newline character in the first
+        ``size`` bytes of a file. a partially written line at the end of a
+        growing file will be decoded again on the next ingest
+    '''
+    pos = size
+    while pos > 0:
+        start = max(0, pos - _hash_window * 64)
+        f.seek(start)
+        i = f.read(pos - start).rfind(b'\n')
+        if i >= 0:
+            return start + i + 1
+        pos = start
+    return 0
 
 
 class FileChecksums():
+    ''' ingest manifest recording the path, size, modification time,
+        content hash, and number of bytes ingested for each file loaded into
+        the database.
+        unchanged files will be skipped, and only newly appended data will be
+        decoded from files that have grown since the last ingest
+    '''
 
     def __init__(self, *, dbconn):
         assert isinstance(dbconn, (PostgresDBConn, SQLiteDBConn))
@@ -35,60 +90,63 @@ class FileChecksums():
             os.mkdir(self.tmp_dir)
 
     def checksums_table(self):
-        ''' instantiates new database connection and creates a checksums
-            hashmap table if it doesn't exist yet.
+        ''' creates the ingest_manifest table if it doesn't exist yet.
 
             creates a temporary directory and saves path to ``self.tmp_dir``
+        '''
+        self.dbconn.execute(sql_createtable_ingest_manifest)
+        self.dbconn.commit()
 
-            creates SQLite connection attribute ``self.dbconn``, which should
-            be closed after use
+    def load_manifest(self):
+        ''' fetch all manifest records in a single query
 
-            e.g.
-                self.dbconn.close()
+            returns:
+                dictionary of manifest records keyed by file path
+        '''
+        cur = self.dbconn.cursor()
+        cur.execute('SELECT path, size, mtime, hash, ingested_bytes '
+                    'FROM ingest_manifest')
+        manifest = {row['path']: dict(row) for row in cur.fetchall()}
+        cur.close()
+        return manifest
+
+    def load_legacy_checksums(self):
+        ''' fetch file checksums from the hashmap table created by previous
+            versions, so that files ingested before the manifest existed
+            will not be loaded twice
         '''
         cur = self.dbconn.cursor()
         if isinstance(self.dbconn, SQLiteDBConn):
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS
-                hashmap(
-                    hash INTEGER PRIMARY KEY,
-                    bytes BLOB
-                )
-                ''')
+            cur.execute('SELECT name FROM sqlite_master '
+                        'WHERE type="table" AND name="hashmap"')
         elif isinstance(self.dbconn, PostgresDBConn):
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS
-                hashmap(
-                    hash TEXT PRIMARY KEY,
-                    bytes BYTEA
-                );''')
-
-        cur.execute('CREATE UNIQUE INDEX '
-                    'IF NOT EXISTS '
-                    'idx_map on hashmap(hash)')
-        self.dbconn.commit()
-
-    def insert_checksum(self, checksum):
+            cur.execute('SELECT table_name FROM information_schema.tables '
+                        'WHERE table_name = \'hashmap\'')
+        if cur.fetchall() == []:
+            return set()
+        cur.execute('SELECT hash FROM hashmap')
+        checksums = {str(row['hash']) for row in cur.fetchall()}
+        cur.close()
+        return checksums
+
+    def insert_records(self, records):
+        ''' insert or update manifest records.
+            each record is a tuple of (path, size, mtime, hash,
+            ingested_bytes)
+        '''
         if isinstance(self.dbconn, SQLiteDBConn):
-            self.dbconn.execute('INSERT INTO hashmap VALUES (?,?)',
-                                [checksum, pickle.dumps(None)])
+            placeholders = ','.join(['?' for _ in range(5)])
         elif isinstance(self.dbconn, PostgresDBConn):
-            self.dbconn.execute(
-                'INSERT INTO hashmap VALUES ($1,$2) ON CONFLICT DO NOTHING',
-                [checksum, pickle.dumps(None)])
-
-    def checksum_exists(self, checksum):
+            placeholders = ','.join(['%s' for _ in range(5)])
         cur = self.dbconn.cursor()
-        if isinstance(self.dbconn, SQLiteDBConn):
-            cur.execute('SELECT * FROM hashmap WHERE hash = ?', [checksum])
-        elif isinstance(self.dbconn, PostgresDBConn):
-            cur.execute('SELECT * FROM hashmap WHERE hash = %s', [checksum])
-        res = cur.fetchone()
-
-        if res is None or res is False:
-            return False
-
-        return True
+        cur.executemany(
+            'INSERT INTO ingest_manifest '
+            '(path, size, mtime, hash, ingested_bytes) '
+            f'VALUES ({placeholders}) ON CONFLICT (path) DO UPDATE SET '
+            'size = excluded.size, mtime = excluded.mtime, '
+            'hash = excluded.hash, ingested_bytes = excluded.ingested_bytes',
+            records)
+        cur.close()
 
     def get_md5(self, path, f):
         ''' get md5 hash from the first kilobyte of data '''
@@ -98,41 +156,494 @@ class FileChecksums():
         digest = md5(f.read(1000)).hexdigest()
         return digest
 
+    def check_files(self, filepaths, verbose=True):
+        ''' compare files against the ingest manifest.
+
+            args:
+                filepaths (list)
+                    raw data and archive filepaths
+                verbose (bool)
+                    print skipped files
+
+            returns:
+                tuple of (new_files, tails, records).
+                new_files is a list of files to be decoded in full.
+                tails is a dictionary of byte offsets keyed by path for
+                files that have grown since they were last ingested.
+                records is a dictionary of manifest records keyed by path, to
+                be inserted after decoding has completed
+        '''
+        manifest = self.load_manifest()
+        by_hash = {row['hash']: row for row in manifest.values()}
+        legacy = self.load_legacy_checksums()
+        new_files, tails, records, unchanged = [], {}, {}, []
+
+        for item in filepaths:
+            path = os.path.abspath(item)
+            stat = os.stat(path)
+            prev = manifest.get(path)
+            if prev is not None and prev['size'] == stat.st_size and prev[
+                    'mtime'] == stat.st_mtime:
+                if verbose:
+                    print(f'file unchanged, skipping {item}')
+                continue
+
+            is_archive = item.lower()[-4:] == '.zip' or item.lower(
+            )[-3:] == '.gz'
+            with open(path, 'rb') as f:
+                if is_archive:
+                    offset = stat.st_size
+                else:
+                    offset = _last_line_end(f, stat.st_size)
+                digest = _content_hash(item, f, offset)
+                record = (path, stat.st_size, stat.st_mtime, digest, offset)
+
+                if prev is not None and prev['ingested_bytes'] <= offset and (
+                        not is_archive or prev['ingested_bytes'] == offset
+                ) and _content_hash(item, f,
+                                    prev['ingested_bytes']) == prev['hash']:
+                    if prev['ingested_bytes'] == offset:
+                        unchanged.append(record)
+                        if verbose:
+                            print(f'no new data, skipping {item}')
+                    else:
+                        tails[item] = prev['ingested_bytes']
+                        records[item] = record
+                        if verbose:
+                            print(f'{offset - prev["ingested_bytes"]} '
+                                  f'new bytes found in {item}')
+                    continue
+
+                match = by_hash.get(digest)
+                if legacy:
+                    f.seek(0)
+                    signature = self.get_md5(item, f)
+                if (match is not None and match['ingested_bytes'] == offset
+                        and match['size'] == stat.st_size) or (
+                            legacy and signature in legacy):
+                    unchanged.append(record)
+                    if verbose:
+                        print(f'found matching checksum, skipping {item}')
+                    continue
+
+            new_files.append(item)
+            records[item] = record
+
+        if unchanged:
+            self.insert_records(unchanged)
+            self.dbconn.commit()
+
+        return new_files, tails, records
+
+
+# maximum bytes held in memory at a time while decompressing an archive
+_unzip_chunksize = 1024 * 1024 * 8
+
 
 def _fast_unzip(zipf, dirname):
-    ''' parallel process worker for fast_unzip() '''
+    ''' parallel process worker for fast_unzip().
+        archive contents are streamed in fixed-size chunks to a new
+        subdirectory of dirname
+
+        returns:
+            tuple of (zipf, list of extracted file paths)
+    '''
     if zipf.lower()[-4:] == '.zip':
-        exists = set(sorted(os.listdir(dirname)))
+        outdir = tempfile.mkdtemp(dir=dirname)
         with zipfile.ZipFile(zipf, 'r') as zip_ref:
-            contents = set(zip_ref.namelist())
-            members = list(contents - exists)
-            zip_ref.extractall(path=dirname, members=members)
+            # ZipFile.extract() copies member contents in chunks
+            return zipf, [
+                zip_ref.extract(member, path=outdir)
+                for member in zip_ref.namelist() if member[-1] != '/'
+            ]
     elif zipf.lower()[-3:] == '.gz':
-        unzip_file = os.path.join(dirname,
+        outdir = tempfile.mkdtemp(dir=dirname)
+        unzip_file = os.path.join(outdir,
                                   zipf.rsplit(os.path.sep, 1)[-1][:-3])
         with gzip.open(zipf, 'rb') as f1, open(unzip_file, 'wb') as f2:
-            f2.write(f1.read())
+            shutil.copyfileobj(f1, f2, _unzip_chunksize)
+        return zipf, [unzip_file]
     else:
         raise ValueError('unknown zip file type')
 
 
-def fast_unzip(zipfilenames, dirname, processes=12):
-    ''' unzip many files in parallel
-        any existing unzipped files in the target directory will be skipped
+def _unique_unzipped(results):
+    ''' remove extracted files having the same name as a file extracted from
+        a previous archive
     '''
+    extracted = set()
+    for zipf, unzipped in results:
+        new_files = []
+        for path in sorted(unzipped):
+            if os.path.basename(path) in extracted:
+                os.remove(path)
+            else:
+                extracted.add(os.path.basename(path))
+                new_files.append(path)
+        yield zipf, new_files
+
+
+@contextmanager
+def start_unzip(zipfilenames, dirname, processes=12):
+    ''' begin extracting archives in a bounded process pool immediately,
+        so that archives can be decompressed while other files are being
+        decoded. worker processes are stopped when the context is exited.
+        see iter_unzip() for more info
 
+        yields:
+            generator of tuples of (zipfilename, extracted file paths)
+
+        >>> with start_unzip(zipfilenames, dirname) as unzipped:
+        ...     decode_other_files()
+        ...     for zipf, files in unzipped:
+        ...         print(zipf, files)
+    '''
+    zipfilenames = sorted(zipfilenames)
     print(f'unzipping files to {dirname} ... '
           '(set the TMPDIR environment variable to change this)')
 
     fcn = partial(_fast_unzip, dirname=dirname)
+    with Pool(max(1, min(processes, len(zipfilenames)))) as pool:
+        try:
+            # tasks are submitted to the workers before results are requested
+            yield _unique_unzipped(pool.imap_unordered(fcn, zipfilenames))
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+def iter_unzip(zipfilenames, dirname, processes=12):
+    ''' unzip many files in parallel using a bounded process pool.
+        extraction begins when the generator is first iterated, and the
+        generator yields the archive path and a list of extracted file paths
+        for each archive as soon as it has been decompressed.
+        files having the same name as a file extracted from a previous
+        archive will be skipped.
+        worker processes are stopped when the generator is exhausted, closed,
+        or garbage collected. to begin extraction before iterating, use
+        start_unzip()
+
+        args:
+            zipfilenames (list)
+                .zip or .gz filepaths
+            dirname (string)
+                directory where files will be extracted
+            processes (int)
+                maximum number of archives to decompress at once
+
+        yields:
+            tuples of (zipfilename, extracted file paths)
     '''
-    with Pool(processes) as p:
-        p.imap_unordered(fcn, zipfilenames)
-        p.close()
-        p.join()
+    with start_unzip(zipfilenames, dirname, processes) as unzipped:
+        yield from unzipped
+
+
+def fast_unzip(zipfilenames, dirname, processes=12):
+    ''' unzip many files in parallel
+        files having the same name as a previously extracted file will be
+        skipped
+
+        returns:
+            list of extracted file paths
+    '''
+    return [
+        path for _, unzipped in iter_unzip(zipfilenames, dirname, processes)
+        for path in unzipped
+    ]
+
+
+def _open_archive_members(zipf):
+    ''' yield (filename, binary stream) for each file contained in a .zip
+        or .gz archive
+    '''
+    if zipf.lower()[-4:] == '.zip':
+        with zipfile.ZipFile(zipf, 'r') as zip_ref:
+            for member in zip_ref.namelist():
+                if member[-1] == '/':
+                    continue
+                yield member.rsplit('/', 1)[-1], zip_ref.open(member, 'r')
+    elif zipf.lower()[-3:] == '.gz':
+        yield zipf.rsplit(os.path.sep, 1)[-1][:-3], gzip.open(zipf, 'rb')
+    else:
+        raise ValueError('unknown zip file type')
+
+
+def _write_fifo(fifo, head, stream):
+    ''' write decompressed data to a named pipe. blocks until a reader
+        opens the pipe
     '''
-    for file in zipfilenames:
-        fcn(file)
+    try:
+        with open(fifo, 'wb') as f:
+            f.write(head)
+            shutil.copyfileobj(stream, f, _unzip_chunksize)
+    except BrokenPipeError:
+        pass
+
+
+def _close_fifo(fifo, writer):
+    ''' wait for the writer thread to finish. if the pipe was not fully
+        consumed, the read end is opened and closed to unblock the writer
+    '''
+    while writer.is_alive():
+        fd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+        writer.join(timeout=0.1)
+        os.close(fd)
+
+
+@contextmanager
+def _fifo_stream(fifo, stream, heads, prefix=b''):
+    ''' create a named pipe at the path ``fifo``, and write ``prefix``
+        followed by the contents of ``stream`` to it from a background
+        thread. the leading bytes are stored in ``heads``.
+        the pipe is removed on exit
+    '''
+    os.mkfifo(fifo)
+    heads[fifo] = prefix + stream.read(_unzip_chunksize)
+    writer = threading.Thread(target=_write_fifo,
+                              args=(fifo, heads[fifo], stream))
+    writer.start()
+    try:
+        yield fifo
+    finally:
+        _close_fifo(fifo, writer)
+        os.remove(fifo)
+        del heads[fifo]
+
+
+def iter_archive_streams(zipfilenames, dirname, heads):
+    ''' stream the contents of .zip and .gz archives through named pipes,
+        without writing decompressed data to disk.
+
+        for each file in each archive, a named pipe is created in dirname,
+        and a thread writes decompressed data to the pipe as it is read.
+        the leading bytes of each file are stored in the ``heads`` dictionary
+        with the pipe path as key, so that the file date can be
+        computed from the same stream before it is consumed.
+        the pipe will be removed when the generator is resumed.
+        files having the same name as a previously streamed file will be
+        skipped
+
+        args:
+            zipfilenames (list)
+                .zip or .gz filepaths
+            dirname (string)
+                directory where named pipes will be created
+            heads (dict)
+                leading bytes of each streamed file will be stored here
+
+        yields:
+            tuple of (zipfilename, list containing a single named pipe
+            path). if every file in an archive was skipped, the list will be
+            empty
+    '''
+    streamed = set()
+    for zipf in sorted(zipfilenames):
+        yielded = False
+        for name, stream in _open_archive_members(zipf):
+            with stream:
+                if name in streamed:
+                    continue
+                streamed.add(name)
+                with _fifo_stream(os.path.join(dirname, name), stream,
+                                  heads) as fifo:
+                    yielded = True
+                    yield zipf, [fifo]
+        if not yielded:
+            yield zipf, []
+
+
+def iter_tail_streams(tails, dirname, heads):
+    ''' stream data appended to files since they were last ingested
+        through named pipes, starting from the given byte offsets.
+        for CSV files, the header row is written to the pipe before the
+        appended data.
+        pipes are created in dirname and removed when the generator is
+        resumed
+
+        args:
+            tails (dict)
+                byte offsets to start reading from, keyed by filepath
+            dirname (string)
+                directory where named pipes will be created
+            heads (dict)
+                leading bytes of each streamed file will be stored here
+
+        yields:
+            tuple of (filepath, list containing a single named pipe path)
+    '''
+    for path, offset in sorted(tails.items()):
+        with open(path, 'rb') as f:
+            prefix = b''
+            if path[-4:].lower() == '.csv' and offset > 0:
+                prefix = f.readline()
+            f.seek(offset)
+            with _fifo_stream(os.path.join(dirname, os.path.basename(path)),
+                              f, heads, prefix) as fifo:
+                yield path, [fifo]
+
+
+def _shard_files(files, workers):
+    ''' partition files into at most ``workers`` groups of approximately
+        equal total size
+    '''
+    shards = [[] for _ in range(workers)]
+    sizes = [0 for _ in range(workers)]
+    for file in sorted(files, key=os.path.getsize, reverse=True):
+        i = sizes.index(min(sizes))
+        shards[i].append(file)
+        sizes[i] += os.path.getsize(file)
+    return [sorted(shard) for shard in shards if len(shard) > 0]
+
+
+def _decode_worker(files, dbpath, psql_conn_string, source, verbose,
+                   create_table_stmts):
+    ''' parallel process worker for _decode_parallel() '''
+    if dbpath != '':
+        with sqlite3.connect(dbpath) as conn:
+            # the journal mode is stored in the database file, so that it
+            # also applies to the connection opened by the decoder
+            conn.execute('PRAGMA journal_mode = WAL')
+            for stmt in create_table_stmts:
+                conn.execute(stmt)
+    return decoder(dbpath=dbpath,
+                   psql_conn_string=psql_conn_string,
+                   files=files,
+                   source=source,
+                   verbose=verbose)
+
+
+def _merge_staging_db(dbconn, staging_dbpath):
+    ''' copy monthly tables from a staging SQLite database into the
+        database connection. duplicate rows will be skipped
+    '''
+    dbconn.commit()
+    dbconn.execute('ATTACH DATABASE ? AS staging', [staging_dbpath])
+    cur = dbconn.cursor()
+    cur.execute('SELECT name, sql FROM staging.sqlite_master '
+                'WHERE type="table" AND name LIKE "ais_%"')
+    for table in cur.fetchall():
+        name = table['name']
+        if not (name.endswith('_dynamic') or name.endswith('_static')):
+            continue
+        cur.execute(
+            'SELECT name FROM main.sqlite_master '
+            'WHERE type="table" AND name=?', [name])
+        if cur.fetchall() == []:
+            cur.execute(table['sql'])
+        cur.execute(f'INSERT OR IGNORE INTO main.{name} '
+                    f'SELECT * FROM staging.{name}')
+    dbconn.commit()
+    cur.close()
+    dbconn.execute('DETACH DATABASE staging')
+
+
+def _decode_parallel(raw_files, *, dbconn, source, create_table_stmts,
+                     workers, verbose):
+    ''' decode files in parallel using a process pool.
+
+        for SQLite databases, each process writes to a separate staging
+        database, which are merged into the main database after decoding.
+        for Postgres databases, processes insert directly into the monthly
+        tables.
+
+        returns:
+            list of completed files
+    '''
+    shards = _shard_files(raw_files, workers)
+    if verbose:
+        print(f'decoding {len(raw_files)} files using {len(shards)} '
+              'processes...')
+
+    completed_files = []
+    if isinstance(dbconn, PostgresDBConn):
+        args = [(shard, '', dbconn.connection_string, source, verbose, [])
+                for shard in shards]
+        with Pool(len(shards)) as p:
+            for completed in p.starmap(_decode_worker, args):
+                completed_files += completed
+        return completed_files
+
+    assert isinstance(dbconn, SQLiteDBConn)
+    with tempfile.TemporaryDirectory() as staging_dir:
+        staging_paths = [
+            os.path.join(staging_dir, f'staging_{i}.db')
+            for i in range(len(shards))
+        ]
+        args = [(shard, path, '', source, verbose, create_table_stmts)
+                for shard, path in zip(shards, staging_paths)]
+        with Pool(len(shards)) as p:
+            for completed in p.starmap(_decode_worker, args):
+                completed_files += completed
+
+        if verbose:
+            print('merging staging databases...')
+        for path in staging_paths:
+            _merge_staging_db(dbconn, path)
+
+    return completed_files
+
+
+def _create_monthly_tables(dbconn, months):
+    ''' create monthly tables before insert.
+        for Postgres, constraints and indexes are dropped to speed up insert,
+        and should be rebuilt after inserting
+    '''
+    if isinstance(dbconn, PostgresDBConn):
+        for month in months:
+            dbconn.execute(sql_createtable_dynamic_noindex.format(month))
+            dbconn.execute(sql_createtable_static.format(month))
+            dbconn.execute(
+                f'ALTER TABLE ais_{month}_dynamic '
+                f'DROP CONSTRAINT IF EXISTS ais_{month}_dynamic_pkey')
+            for idx_name in ('mmsi', 'time', 'lon', 'lat', 'cluster'):
+                dbconn.execute(
+                    f'DROP INDEX IF EXISTS idx_ais_{month}_dynamic_{idx_name}')
+        dbconn.commit()
+
+    elif isinstance(dbconn, SQLiteDBConn):
+        for month in months:
+            dbconn.execute(sql_createtable_dynamic.format(month))
+    else:
+        assert False
+    dbconn.invalidate_schema_cache()
+
+
+def _decode_files(raw_files, *, dbconn, source, months, workers, verbose):
+    ''' insert decoded messages from raw_files into monthly tables.
+        returns a list of completed files
+    '''
+    if isinstance(dbconn, PostgresDBConn):
+        if workers > 1:
+            return _decode_parallel(raw_files,
+                                    dbconn=dbconn,
+                                    source=source,
+                                    create_table_stmts=[],
+                                    workers=workers,
+                                    verbose=verbose)
+        return decoder(dbpath='',
+                       psql_conn_string=dbconn.connection_string,
+                       files=raw_files,
+                       source=source,
+                       verbose=verbose)
+
+    elif isinstance(dbconn, SQLiteDBConn):
+        if workers > 1:
+            return _decode_parallel(
+                raw_files,
+                dbconn=dbconn,
+                source=source,
+                create_table_stmts=[
+                    sql_createtable_dynamic.format(month) for month in months
+                ],
+                workers=workers,
+                verbose=verbose)
+        return decoder(dbpath=dbconn.dbpath,
+                       psql_conn_string='',
+                       files=raw_files,
+                       source=source,
+                       verbose=verbose)
+    else:
+        assert False
 
 
 def decode_msgs(filepaths,
@@ -140,15 +651,23 @@ def decode_msgs(filepaths,
                 source,
                 vacuum=False,
                 skip_checksum=False,
-                verbose=True):
+                verbose=True,
+                workers=1,
+                stream_archives=False,
+                spatial_index=False,
+                bulk_ingest=True):
     ''' Decode NMEA format AIS messages and store in an SQLite database.
         To speed up decoding, create the database on a different hard drive
         from where the raw data is stored.
-        A checksum of the first kilobyte of every file will be stored to
-        prevent loading the same file twice.
+        The size, modification time, and a checksum of every file will be
+        stored in an ingest manifest to prevent loading the same file twice.
+        If a file has grown since it was last ingested, only the appended data
+        will be decoded.
 
         If the filepath has a .gz or .zip extension, the file will be
         decompressed into a temporary directory before database insert.
+        Archives are decompressed in parallel, and the contents of each
+        archive will be inserted as soon as it has been decompressed.
 
         args:
             filepaths (list)
@@ -164,6 +683,30 @@ def decode_msgs(filepaths,
                 if True, the database will be vacuumed after completion.
                 if string, the database will be vacuumed into the filepath
                 given. Consider vacuuming to second hard disk to speed this up
+            skip_checksum (bool)
+                if True, files will be decoded in full without checking or
+                updating the ingest manifest
+            workers (int)
+                number of processes used to decode files in parallel.
+                for SQLite databases, each process writes to a temporary
+                staging database which is merged into the main database after
+                decoding. set the TMPDIR environment variable to change the
+                staging location
+            stream_archives (bool)
+                if True, files contained in .zip and .gz archives will be
+                decompressed and decoded as a stream via named pipes, instead
+                of being extracted to a temporary directory. archive contents
+                are decoded one file at a time. requires a POSIX system
+            spatial_index (bool)
+                SQLite only. if True, an R*Tree spatial index will be created
+                for new monthly tables. see
+                :meth:`aisdb.database.dbconn.SQLiteDBConn.create_rtree_index`.
+                existing indexes are always updated upon insert
+            bulk_ingest (bool)
+                SQLite only. if True, the database will use the fast insert
+                settings of
+                :meth:`aisdb.database.dbconn.SQLiteDBConn.bulk_ingest`
+                while decoding
 
         returns:
             None
@@ -195,162 +738,170 @@ def decode_msgs(filepaths,
     if len(filepaths) == 0:  # pragma: no cover
         raise ValueError('must supply atleast one filepath.')
 
-    dbindex = FileChecksums(dbconn=dbconn)
-
-    # handle zipfiles
-    zipped = {
-        f
-        for f in filepaths
-        if f.lower()[-4:] == '.zip' or f.lower()[-3:] == '.gz'
-    }
-    not_zipped = sorted(list(set(filepaths) - set(zipped)))
-    zipped_checksums = []
-    not_zipped_checksums = []
-    unzipped_checksums = []
-    _skipped = []
+    # SQLite connection settings are switched to a fast insert profile
+    # while decoding, and restored before vacuuming. the decoder opens its
+    # own connection, which uses the write-ahead log journal mode from the
+    # database file
+    if isinstance(dbconn, SQLiteDBConn) and bulk_ingest:
+        ingest_profile = dbconn.bulk_ingest()
+    else:
+        ingest_profile = nullcontext()
 
-    if verbose:
-        print('generating file checksums...')
+    # the archive extraction pool is stopped when exiting the context
+    with ingest_profile, ExitStack() as stack:
+        dbindex = FileChecksums(dbconn=dbconn)
 
-    for item in deepcopy(zipped):
-        with open(os.path.abspath(item), 'rb') as f:
-            signature = dbindex.get_md5(item, f)
         if skip_checksum:
-            continue
-        if dbindex.checksum_exists(signature):
-            _skipped.append(item)
-            zipped.remove(item)
-            if verbose:
-                print(f'found matching checksum, skipping {item}')
+            new_files, tails, records = sorted(set(filepaths)), {}, {}
         else:
-            zipped_checksums.append(signature)
-
-    for item in deepcopy(not_zipped):
-        with open(os.path.abspath(item), 'rb') as f:
-            signature = dbindex.get_md5(item, f)
-        if skip_checksum:
-            continue
-        if dbindex.checksum_exists(signature):
-            _skipped.append(item)
-            not_zipped.remove(item)
             if verbose:
-                print(f'found matching checksum, skipping {item}')
+                print('checking ingest manifest...')
+            new_files, tails, records = dbindex.check_files(
+                sorted(set(filepaths)), verbose)
+
+        if not new_files and not tails:
+            print('All files returned an existing checksum.',
+                  'Cleaning temporary data...')
+            shutil.rmtree(dbindex.tmp_dir)
+            return
+
+        # handle zipfiles
+        zipped = [
+            f for f in new_files
+            if f.lower()[-4:] == '.zip' or f.lower()[-3:] == '.gz'
+        ]
+        not_zipped = [f for f in new_files if f not in zipped]
+
+        if (stream_archives
+                or tails) and not hasattr(os, 'mkfifo'):  # pragma: no cover
+            warnings.warn(
+                'named pipes are not supported on this system. '
+                'archives will be extracted to a temporary directory, '
+                'and appended files will be decoded in full')
+            stream_archives = False
+            not_zipped = sorted(not_zipped + list(tails.keys()))
+            tails = {}
+
+        # leading bytes of files streamed through named pipes, keyed by pipe
+        # path
+        heads = {}
+
+        # archives are decompressed by a pool of background processes while
+        # decoding. the contents of each archive are decoded as soon as
+        # extraction of that archive is complete.
+        # if stream_archives is True, the archive contents are streamed to the
+        # decoder instead.
+        # data appended to previously ingested files is streamed to the decoder
+        # starting from the last ingested byte offset
+        if zipped and stream_archives:
+            unzipped_batches = iter_archive_streams(zipped, dbindex.tmp_dir,
+                                                    heads)
+        elif zipped:
+            # extraction begins before plain files are decoded
+            unzipped_batches = stack.enter_context(
+                start_unzip(zipped, dbindex.tmp_dir))
         else:
-            not_zipped_checksums.append(signature)
-
-    if zipped:
-        fast_unzip(zipped, dbindex.tmp_dir)
-        unzipped = sorted([
-            os.path.join(dbindex.tmp_dir, f)
-            for f in os.listdir(dbindex.tmp_dir)
-        ])
-        assert unzipped
-        if not skip_checksum:
-            for item in unzipped:
-                with open(os.path.abspath(item), 'rb') as f:
-                    signature = dbindex.get_md5(item, f)
-                unzipped_checksums.append(signature)
-    else:
-        unzipped = []
-
-    raw_files = not_zipped + unzipped
-    raw_files
-
-    if not raw_files:
-        print('All files returned an existing checksum.',
-              'Cleaning temporary data...')
-        for tmpfile in unzipped:
-            os.remove(tmpfile)
-        os.removedirs(dbindex.tmp_dir)
-        return
-
-    assert skip_checksum or len(not_zipped) == len(not_zipped_checksums)
-    assert skip_checksum or len(zipped) == len(zipped_checksums)
-    assert skip_checksum or len(unzipped) == len(unzipped_checksums)
-
-    # TODO: get file dates and create new tables before insert
-    if verbose:
-        print('checking file dates...')
-    filedates = [getfiledate(f) for f in raw_files]
-    months = [
-        month.strftime('%Y%m') for month in rrule(
-            freq=MONTHLY,
-            dtstart=min(filedates) - (timedelta(days=min(filedates).day - 1)),
-            until=max(filedates),
+            unzipped_batches = iter([])
+
+        # each batch contains the input filepaths, the files to be decoded, and
+        # whether the decoded files were extracted from an archive
+        batches = chain(
+            [(not_zipped, not_zipped, False)] if not_zipped else [],
+            (([path], tail, False)
+             for path, tail in iter_tail_streams(tails, dbindex.tmp_dir, heads)
+             ),
+            (([zipf], unzipped, True) for zipf, unzipped in unzipped_batches),
         )
-    ]
 
-    if verbose:
-        print('creating tables and dropping table indexes...')
+        months = []
+        failed = set()
+        pending = []
+        for inputs, raw_files, is_unzipped in batches:
+            if len(raw_files) > 0:
+                # get file dates and create new tables before insert
+                if verbose:
+                    print('checking file dates...')
+                filedates = [getfiledate(f, heads.get(f)) for f in raw_files]
+                batch_months = [
+                    month.strftime('%Y%m') for month in rrule(
+                        freq=MONTHLY,
+                        dtstart=min(filedates) -
+                        (timedelta(days=min(filedates).day - 1)),
+                        until=max(filedates),
+                    )
+                ]
+                new_months = [
+                    month for month in batch_months if month not in months
+                ]
+                if len(new_months) > 0:
+                    if verbose:
+                        print('creating tables and dropping table indexes...')
+                    _create_monthly_tables(dbconn, new_months)
+                    if (isinstance(dbconn, PostgresDBConn)
+                            and dbconn.partitioned):
+                        dbconn.migrate_partitioned(new_months, verbose)
+                    if spatial_index and isinstance(dbconn, SQLiteDBConn):
+                        dbconn.create_rtree_index(new_months, verbose)
+                    months += new_months
+
+                completed_files = _decode_files(raw_files,
+                                                dbconn=dbconn,
+                                                source=source,
+                                                months=batch_months,
+                                                workers=workers,
+                                                verbose=verbose)
+
+                for filename in raw_files:
+                    if filename not in completed_files:
+                        # a failed file marks the input it was read from
+                        failed.add(filename if filename in
+                                   inputs else inputs[0])
+                        if verbose and not skip_checksum:
+                            print(f'error processing {filename}, '
+                                  'skipping checksum...')
+
+            finished = [p for p in inputs if p in records]
+            if is_unzipped and stream_archives:
+                # members of a streamed archive are decoded in consecutive
+                # batches. the archive is recorded once the next one begins
+                finished, pending = (pending
+                                     if pending != finished else []), finished
+            finished = [p for p in finished if p not in failed]
+
+            if finished:
+                if verbose:
+                    print('saving checksums...')
+                dbindex.insert_records([records[p] for p in finished])
+            dbindex.dbconn.commit()
+
+            if is_unzipped and not stream_archives:
+                for tmpfile in raw_files:
+                    os.remove(tmpfile)
+
+        pending = [p for p in pending if p not in failed]
+        if pending:
+            dbindex.insert_records([records[p] for p in pending])
+            dbindex.dbconn.commit()
+
+        months = sorted(months)
 
-    # drop constraints and indexes to speed up insert,
-    # and rebuild them after inserting
-    if isinstance(dbconn, PostgresDBConn):
-        with open(
-                os.path.join(sqlpath, 'psql_createtable_dynamic_noindex.sql'),
-                'r') as f:
-            create_dynamic_table_stmt = f.read()
-        with open(os.path.join(sqlpath, 'createtable_static.sql'), 'r') as f:
-            create_static_table_stmt = f.read()
-        for month in months:
-            dbconn.execute(create_dynamic_table_stmt.format(month))
-            dbconn.execute(create_static_table_stmt.format(month))
-            dbconn.execute(
-                f'ALTER TABLE ais_{month}_dynamic '
-                f'DROP CONSTRAINT IF EXISTS ais_{month}_dynamic_pkey')
-            for idx_name in ('mmsi', 'time', 'lon', 'lat', 'cluster'):
-                dbconn.execute(
-                    f'DROP INDEX IF EXISTS idx_ais_{month}_dynamic_{idx_name}')
-        dbconn.commit()
-        completed_files = decoder(dbpath='',
-                                  psql_conn_string=dbconn.connection_string,
-                                  files=raw_files,
-                                  source=source,
-                                  verbose=verbose)
-
-    elif isinstance(dbconn, SQLiteDBConn):
-        with open(os.path.join(sqlpath, 'createtable_dynamic_clustered.sql'),
-                  'r') as f:
-            create_table_stmt = f.read()
-        for month in months:
-            dbconn.execute(create_table_stmt.format(month))
-        completed_files = decoder(dbpath=dbconn.dbpath,
-                                  psql_conn_string='',
-                                  files=raw_files,
-                                  source=source,
-                                  verbose=verbose)
-    else:
-        assert False
+        if verbose:
+            print('cleaning temporary data...')
 
-    if verbose and not skip_checksum:
-        print('saving checksums...')
+        shutil.rmtree(dbindex.tmp_dir)
 
-    for filename, signature in zip(not_zipped + unzipped,
-                                   not_zipped_checksums + unzipped_checksums):
-        if filename in completed_files:
-            dbindex.insert_checksum(signature)
-        else:
+        if isinstance(dbconn, PostgresDBConn):
             if verbose:
-                print(f'error processing {filename}, skipping checksum...')
-
-    dbindex.dbconn.commit()
-
-    if verbose:
-        print('cleaning temporary data...')
-
-    for tmpfile in unzipped:
-        os.remove(tmpfile)
-    os.removedirs(dbindex.tmp_dir)
-
-    if isinstance(dbconn, PostgresDBConn):
-        if verbose:
-            print('rebuilding indexes...')
-        for month in months:
-            dbconn.rebuild_indexes(month, verbose)
-        dbconn.execute('ANALYZE')
-        dbconn.commit()
+                print('rebuilding indexes...')
+            dbconn.rebuild_indexes_parallel(months,
+                                            workers=max(workers, 4),
+                                            verbose=verbose)
+            dbconn.execute('ANALYZE')
+            dbconn.commit()
 
-    dbconn.aggregate_static_msgs(months, verbose)
+        dbconn.aggregate_static_msgs(months, verbose)
+        dbconn.update_partition_catalog(months, verbose)
+        dbconn.update_vessel_day_summary(months, verbose)
 
     if vacuum is not False:
         print("finished parsing data\nvacuuming...")
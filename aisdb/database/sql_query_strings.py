@@ -1,10 +1,58 @@
+import json
 import warnings
 
 from aisdb.gis import dt_2_epoch, shiftcoord
 
 
-# callback functions
-def in_bbox(*, alias, xmin, xmax, ymin, ymax, **_):
+def sql_params(clause):
+    ''' convert a callback result to a tuple of SQL code and a list of
+        parameters. callbacks returning SQL code as a string have no
+        parameters
+
+        args:
+            clause (string or tuple)
+                SQL code, or a tuple of (SQL code, parameters)
+
+        returns:
+            tuple of (SQL code (string), parameters (list))
+    '''
+    if isinstance(clause, str):
+        return clause, []
+    sql, params = clause
+    return sql, list(params)
+
+
+def sql_and(*clauses):
+    ''' combine callback results using AND.
+
+        args:
+            clauses (string or tuple)
+                SQL code, or tuples of (SQL code, parameters)
+
+        returns:
+            tuple of (SQL code (string), parameters (list))
+    '''
+    sqls, params = [], []
+    for clause in clauses:
+        sql, args = sql_params(clause)
+        sqls.append(sql)
+        params += args
+    return '    ' + ' AND\n    '.join(sqls) + ' ', params
+
+
+# callback functions.
+# values are passed as '?' placeholders in the returned SQL code, so that
+# the code is the same for every query and can be cached by the database.
+# DBQuery converts placeholders to the format used by the connection
+def in_bbox(*,
+            alias,
+            xmin,
+            xmax,
+            ymin,
+            ymax,
+            month=None,
+            rtree_months=(),
+            **_):
     ''' SQL callback restricting vessels in bounding box region
 
         args:
@@ -18,9 +66,15 @@ def in_bbox(*, alias, xmin, xmax, ymin, ymax, **_):
                 minimum latitude
             ymax (float)
                 maximum latitude
+            month (string)
+                month of the queried table, with format YYYYmm
+            rtree_months (list)
+                months having an SQLite R*Tree spatial index.
+                if the queried month is included, positions in the bounding
+                box will be selected using the index
 
         returns:
-            SQL code (string)
+            tuple of (SQL code (string), parameters (list))
     '''
     if not -180 <= xmin <= 180:
         warnings.warn(f'got {xmin}')
@@ -35,17 +89,17 @@ def in_bbox(*, alias, xmin, xmax, ymin, ymax, **_):
     assert ymin < ymax, f'got {ymin=} {ymax=}'
 
     if xmin == -180 and xmax == 180:
-        return f'''({alias}.longitude >= {xmin} AND {alias}.longitude <= {xmax}) AND
-    {alias}.latitude >= {ymin} AND
-    {alias}.latitude <= {ymax}'''
+        return f'''({alias}.longitude >= ? AND {alias}.longitude <= ?) AND
+    {alias}.latitude >= ? AND
+    {alias}.latitude <= ?''', list(map(float, (xmin, xmax, ymin, ymax)))
 
     #if xmin < xmax:
     assert xmin < xmax
     #if xmin < -180 and xmax > 180:
     #    raise ValueError(f'xmin, xmax are out of bounds! {xmin=} < -180,{xmax=} > 180')
     #elif -180 <= xmin <= 180 and -180 <= xmax <= 180:
-    s = f'''{alias}.longitude >= {xmin} AND
-            {alias}.longitude <= {xmax} AND '''
+    s = f'''{alias}.longitude >= ? AND
+            {alias}.longitude <= ? AND '''
     """
     elif xmin < -180:
         s = f'''(
@@ -64,10 +118,19 @@ def in_bbox(*, alias, xmin, xmax, ymin, ymax, **_):
     """
 
     query_args = f'''{s}
-    {alias}.latitude >= {ymin} AND
-    {alias}.latitude <= {ymax}'''
+    {alias}.latitude >= ? AND
+    {alias}.latitude <= ?'''
+    params = list(map(float, (xmin, xmax, ymin, ymax)))
+
+    if month in rtree_months:
+        query_args += f''' AND
+    ({alias}.mmsi, {alias}.time) IN (
+      SELECT r.mmsi, r.time FROM rtree_{month}_dynamic AS r WHERE
+        r.longitude1 >= ? AND r.longitude0 <= ? AND
+        r.latitude1 >= ? AND r.latitude0 <= ?)'''
+        params += list(map(float, (xmin, xmax, ymin, ymax)))
 
-    return query_args
+    return query_args, params
 
     #else:
     '''
@@ -96,10 +159,47 @@ def in_timerange(*, alias, start, end, **_):
             end (datetime)
 
         returns:
-            SQL code (string)
+            tuple of (SQL code (string), parameters (list))
+    '''
+    return f'''{alias}.time >= ? AND
+    {alias}.time <= ?''', [dt_2_epoch(start), dt_2_epoch(end)]
+
+
+def in_vessel_day_summary(*, alias, start, end, xmin, xmax, ymin, ymax, **_):
+    ''' SQL callback selecting vessels that were present in the bounding box
+        region on any day in the temporal range, according to the
+        vessel_day_summary table.
+        vessels are matched by MMSI, so that rows are selected using the
+        monthly table index on (mmsi, time)
+
+        args:
+            alias (string)
+                the 'alias' in a 'WITH tablename AS alias ...' SQL statement
+            start (datetime)
+            end (datetime)
+            xmin (float)
+                minimum longitude
+            xmax (float)
+                maximum longitude
+            ymin (float)
+                minimum latitude
+            ymax (float)
+                maximum latitude
+
+        returns:
+            tuple of (SQL code (string), parameters (list))
     '''
-    return f'''{alias}.time >= {dt_2_epoch(start)} AND
-    {alias}.time <= {dt_2_epoch(end)}'''
+    return f'''{alias}.mmsi IN (
+    SELECT DISTINCT s.mmsi FROM vessel_day_summary AS s WHERE
+      s.day >= ? AND
+      s.day <= ? AND
+      s.longitude_max >= ? AND
+      s.longitude_min <= ? AND
+      s.latitude_max >= ? AND
+      s.latitude_min <= ?)''', [
+        dt_2_epoch(start) // 86400,
+        dt_2_epoch(end) // 86400, *map(float, (xmin, xmax, ymin, ymax))
+    ]
 
 
 def has_mmsi(*, alias, mmsi, **_):
@@ -112,25 +212,33 @@ def has_mmsi(*, alias, mmsi, **_):
                 vessel identifier
 
         returns:
-            SQL code (string)
+            tuple of (SQL code (string), parameters (list))
     '''
-    return f'''CAST({alias}.mmsi AS INT) = {mmsi}'''
+    return f'''CAST({alias}.mmsi AS INT) = ?''', [int(mmsi)]
 
 
-def in_mmsi(*, alias, mmsis, **_):
-    ''' SQL callback selecting multiple vessel identifiers
+def in_mmsi(*, alias, mmsis, dialect='sqlite', **_):
+    ''' SQL callback selecting multiple vessel identifiers.
+        identifiers are passed as a single array parameter, so that the
+        size of the SQL code does not depend on the number of vessels
 
         args:
             alias (string)
                 the 'alias' in a 'WITH tablename AS alias ...' SQL statement
             mmsis (tuple)
                 tuple of vessel identifiers (int)
+            dialect (string)
+                either 'sqlite' or 'postgres'. SQLite databases receive
+                the identifiers as a JSON array
 
         returns:
-            SQL code (string)
+            tuple of (SQL code (string), parameters (list))
     '''
+    mmsis = [int(mmsi) for mmsi in mmsis]
+    if dialect == 'postgres':
+        return f'''{alias}.mmsi = ANY(?)''', [mmsis]
     return f'''{alias}.mmsi IN
-    ({", ".join(map(str, mmsis))})'''
+    (SELECT value FROM json_each(?))''', [json.dumps(mmsis)]
 
 
 def valid_mmsi(*, alias='m123', **_):
@@ -142,7 +250,7 @@ def valid_mmsi(*, alias='m123', **_):
                 the 'alias' in a 'WITH tablename AS alias ...' SQL statement
 
         returns:
-            SQL code (string)
+            tuple of (SQL code (string), parameters (list))
     '''
     return f'''{alias}.mmsi >= 201000000 AND
-    {alias}.mmsi < 776000000 '''
+    {alias}.mmsi < 776000000 ''', []
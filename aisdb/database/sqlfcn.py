@@ -1,7 +1,11 @@
 ''' pass these functions to DBQuery.gen_qry() as the function argument '''
+from calendar import monthrange
+from datetime import datetime
 import os
 
 from aisdb import sqlpath
+from aisdb.database.sql_query_strings import sql_params
+from aisdb.gis import dt_2_epoch
 
 with open(os.path.join(sqlpath, 'cte_dynamic_clusteredidx.sql'), 'r') as f:
     sql_dynamic = f.read()
@@ -16,13 +20,51 @@ with open(os.path.join(sqlpath, 'select_join_dynamic_static_clusteredidx.sql'),
 with open(os.path.join(sqlpath, 'cte_aliases.sql'), 'r') as f:
     sql_aliases = f.read()
 
+with open(os.path.join(sqlpath, 'cte_dynamic_partitioned.sql'), 'r') as f:
+    sql_dynamic_partitioned = f.read()
+
+with open(os.path.join(sqlpath, 'cte_static_aggregate_partitioned.sql'),
+          'r') as f:
+    sql_static_partitioned = f.read()
+
+with open(os.path.join(sqlpath, 'select_join_dynamic_static_partitioned.sql'),
+          'r') as f:
+    sql_leftjoin_partitioned = f.read()
+
+
+def _month_range(month):
+    ''' epoch time range of a month, as a tuple of the first second of the
+        month and the first second of the following month
+    '''
+    y, m = int(month[:4]), int(month[4:])
+    start = dt_2_epoch(datetime(y, m, 1))
+    return start, start + monthrange(y, m)[1] * 86400
+
+
+def _time_ranges(months):
+    ''' SQL predicate selecting rows in the time range of the given months.
+        consecutive months are merged into a single range, so that
+        Postgres can prune partitions outside of the range
+    '''
+    ranges = []
+    for month in sorted(months):
+        start, end = _month_range(month)
+        if ranges != [] and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return ' OR '.join(f'(d.time >= {start} AND d.time < {end})'
+                       for start, end in ranges)
+
 
 def _dynamic(*, month, callback, **kwargs):
-    ''' SQL common table expression for selecting from dynamic tables '''
+    ''' SQL common table expression for selecting from dynamic tables.
+        returns a tuple of SQL code and parameters
+    '''
     args = [month for _ in range(len(sql_dynamic.split('{}')) - 1)]
     sql = sql_dynamic.format(*args)
-    sql += callback(month=month, alias='d', **kwargs)
-    return sql
+    where, params = sql_params(callback(month=month, alias='d', **kwargs))
+    return sql + where, params
 
 
 def _static(*, month='197001', **_):
@@ -31,6 +73,27 @@ def _static(*, month='197001', **_):
     return sql_static.format(*args)
 
 
+def _dynamic_partitioned(*, months, callback, **kwargs):
+    ''' SQL common table expression for selecting from the partitioned
+        ais_dynamic table. returns a tuple of SQL code and parameters.
+        partition bounds are not parameterized, so that partitions can
+        be pruned when the query is planned
+    '''
+    sql = sql_dynamic_partitioned.format(_time_ranges(months))
+    where, params = sql_params(callback(alias='d', **kwargs))
+    return sql + where, params
+
+
+def _static_partitioned(*, months, **_):
+    ''' SQL common table expression for selecting from static tables, with
+        the time range of each month in columns time0 and time1
+    '''
+    return '\nUNION ALL\n'.join([
+        sql_static_partitioned.format(*_month_range(month), month)
+        for month in months
+    ])
+
+
 def _leftjoin(month='197001'):
     ''' SQL select statement using common table expressions.
         Joins columns from dynamic, static, and coarsetype_ref tables.
@@ -40,40 +103,81 @@ def _leftjoin(month='197001'):
 
 
 def _aliases(*, month, callback, kwargs):
-    ''' declare common table expression aliases '''
-    args = (month, _dynamic(month=month, callback=callback,
-                            **kwargs), month, _static(month=month))
-    return sql_aliases.format(*args)
+    ''' declare common table expression aliases.
+        returns a tuple of SQL code and parameters
+    '''
+    dynamic, params = _dynamic(month=month, callback=callback, **kwargs)
+    args = (month, dynamic, month, _static(month=month))
+    return sql_aliases.format(*args), params
+
+
+def _aliases_partitioned(*, months, callback, kwargs):
+    ''' declare common table expression aliases for partitioned tables.
+        returns a tuple of SQL code and parameters
+    '''
+    dynamic, params = _dynamic_partitioned(months=months,
+                                           callback=callback,
+                                           **kwargs)
+    args = ('all', dynamic, 'all', _static_partitioned(months=months))
+    return sql_aliases.format(*args), params
 
 
-def crawl_dynamic(*, months, callback, **kwargs):
+def crawl_dynamic(*, months, callback, partitioned=False, **kwargs):
     ''' iterate over position reports tables to create SQL query spanning
         desired time range
 
+        if partitioned is True, a single query on the partitioned ais_dynamic
+        table is created instead, see
+        :meth:`aisdb.database.dbconn.PostgresDBConn.migrate_partitioned`
+
         this function should be passed as a callback to DBQuery.gen_qry(),
         and should not be called directly
+
+        returns:
+            tuple of (SQL code (string), parameters (list))
     '''
-    sql_dynamic = '\nUNION\n'.join([
+    if partitioned:
+        sql, params = _dynamic_partitioned(months=months,
+                                           callback=callback,
+                                           **kwargs)
+        return sql + '\nORDER BY 1,2', params
+    selects = [
         _dynamic(month=month, callback=callback, **kwargs) for month in months
-    ]) + '\nORDER BY 1,2'
-    return sql_dynamic
+    ]
+    sql_dynamic = '\nUNION\n'.join([sql for sql, _ in selects])
+    sql_dynamic += '\nORDER BY 1,2'
+    return sql_dynamic, [arg for _, params in selects for arg in params]
 
 
-def crawl_dynamic_static(*, months, callback, **kwargs):
+def crawl_dynamic_static(*, months, callback, partitioned=False, **kwargs):
     ''' iterate over position reports and static messages tables to create SQL
         query spanning desired time range
 
+        if partitioned is True, position reports are selected from the
+        partitioned ais_dynamic table in a single query, see
+        :meth:`aisdb.database.dbconn.PostgresDBConn.migrate_partitioned`
+
         this function should be passed as a callback to DBQuery.gen_qry(),
         and should not be called directly
+
+        returns:
+            tuple of (SQL code (string), parameters (list))
     '''
     sqlfile = 'cte_coarsetype.sql'
     with open(os.path.join(sqlpath, sqlfile), 'r') as f:
         sql_coarsetype = f.read()
-    sql_aliases = ''.join([
+    if partitioned:
+        sql_aliases_all, params = _aliases_partitioned(months=months,
+                                                       callback=callback,
+                                                       kwargs=kwargs)
+        return (f'WITH\n{sql_aliases_all}\n{sql_coarsetype}\n'
+                f'{sql_leftjoin_partitioned} ORDER BY 1,2'), params
+    aliases = [
         _aliases(month=month, callback=callback, kwargs=kwargs)
         for month in months
-    ])
+    ]
+    sql_aliases = ''.join([sql for sql, _ in aliases])
     sql_union = '\nUNION\n'.join([_leftjoin(month=month) for month in months])
     sql_qry = f'WITH\n{sql_aliases}\n{sql_coarsetype}\n{sql_union}'
     sql_qry += ' ORDER BY 1,2'
-    return sql_qry
+    return sql_qry, [arg for _, params in aliases for arg in params]
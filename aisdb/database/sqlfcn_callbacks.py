@@ -1,5 +1,8 @@
 ''' redefinitions of functions in :py:mod:`aisdb.database.sql_query_strings`,
-    combined into lambdas for convenience
+    combined into lambdas for convenience.
+    each callback returns a tuple of SQL code and a list of parameters.
+    custom callbacks may also return SQL code as a string, in which case the
+    query has no parameters
 '''
 
 from datetime import datetime, timedelta
@@ -11,6 +14,8 @@ from aisdb.database.sql_query_strings import (
     in_bbox,
     in_mmsi,
     in_timerange,
+    in_vessel_day_summary,
+    sql_and,
     valid_mmsi,
 )
 
@@ -19,38 +24,45 @@ dt2monthstr = lambda start, end, **_: np.unique([
     for t in np.arange(start, end, timedelta(days=1)).astype(datetime)
 ]).astype(object)
 
-in_bbox_time = lambda **kwargs: f'''\
-    {in_bbox(**kwargs)} AND
-    {in_timerange(**kwargs)} '''
-in_bbox_time_validmmsi = lambda **kwargs: f'''\
-    {in_bbox(**kwargs)} AND
-    {in_timerange(**kwargs)} AND
-    {valid_mmsi(**kwargs)} '''
-in_time_bbox = lambda **kwargs: f'''\
-    {in_timerange(**kwargs)} AND
-    {in_bbox(**kwargs)} '''
-in_time_bbox_hasmmsi = lambda **kwargs: f'''\
-    {in_timerange(**kwargs)} AND
-    {in_bbox(**kwargs)} AND
-    {has_mmsi(**kwargs)}'''
-in_time_bbox_inmmsi = lambda **kwargs: f'''\
-    {in_timerange(**kwargs)} AND
-    {in_bbox(**kwargs)} AND
-    {in_mmsi(**kwargs)} '''
-in_time_bbox_validmmsi = lambda **kwargs: f'''\
-    {in_timerange(**kwargs)} AND
-    {in_bbox(**kwargs)} AND
-    {valid_mmsi(**kwargs)} '''
-in_time_mmsi = lambda **kwargs: f'''\
-    {in_timerange(**kwargs)} AND {valid_mmsi(**kwargs)}'''
-in_timerange_hasmmsi = lambda **kwargs: f'''\
-    {in_timerange(**kwargs)} AND {has_mmsi(**kwargs)}'''
-in_timerange_inmmsi = lambda **kwargs: f'''\
-    {in_timerange(**kwargs)} AND
-    {in_mmsi(**kwargs)}'''
-in_timerange_validmmsi = lambda **kwargs: f'''\
-    {in_timerange(**kwargs)} AND
-    {valid_mmsi(**kwargs)}'''
-in_validmmsi_bbox = lambda **kwargs: f'''\
-    {valid_mmsi(**kwargs)} AND
-    {in_bbox(**kwargs)} '''
+in_bbox_time = lambda **kwargs: sql_and(
+    in_bbox(**kwargs),
+    in_timerange(**kwargs))
+in_bbox_time_validmmsi = lambda **kwargs: sql_and(
+    in_bbox(**kwargs),
+    in_timerange(**kwargs),
+    valid_mmsi(**kwargs))
+in_time_bbox = lambda **kwargs: sql_and(
+    in_timerange(**kwargs),
+    in_bbox(**kwargs))
+in_time_bbox_hasmmsi = lambda **kwargs: sql_and(
+    in_timerange(**kwargs),
+    in_bbox(**kwargs),
+    has_mmsi(**kwargs))
+in_time_bbox_inmmsi = lambda **kwargs: sql_and(
+    in_timerange(**kwargs),
+    in_bbox(**kwargs),
+    in_mmsi(**kwargs))
+in_time_bbox_validmmsi = lambda **kwargs: sql_and(
+    in_timerange(**kwargs),
+    in_bbox(**kwargs),
+    valid_mmsi(**kwargs))
+in_time_bbox_validmmsi_summary = lambda **kwargs: sql_and(
+    in_vessel_day_summary(**kwargs),
+    in_timerange(**kwargs),
+    in_bbox(**kwargs),
+    valid_mmsi(**kwargs))
+in_time_mmsi = lambda **kwargs: sql_and(
+    in_timerange(**kwargs),
+    valid_mmsi(**kwargs))
+in_timerange_hasmmsi = lambda **kwargs: sql_and(
+    in_timerange(**kwargs),
+    has_mmsi(**kwargs))
+in_timerange_inmmsi = lambda **kwargs: sql_and(
+    in_timerange(**kwargs),
+    in_mmsi(**kwargs))
+in_timerange_validmmsi = lambda **kwargs: sql_and(
+    in_timerange(**kwargs),
+    valid_mmsi(**kwargs))
+in_validmmsi_bbox = lambda **kwargs: sql_and(
+    valid_mmsi(**kwargs),
+    in_bbox(**kwargs))
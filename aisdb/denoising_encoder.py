@@ -1,10 +1,12 @@
 import warnings
+from collections.abc import Mapping
 from functools import reduce
 
 import numpy as np
 
 from aisdb.aisdb import encoder_score_fcn
 from aisdb.gis import delta_knots, delta_meters
+from aisdb.track import as_track
 
 
 def _score_idx(scores):
@@ -50,31 +52,16 @@ def _scoresarray(track, *, pathways, i, segments_idx, distance_threshold,
 
 
 def _append_highscore(track, *, highscoreidx, pathways, i, segments_idx):
-    return dict(
-        **{k: track[k]
-           for k in track['static']},
-        **{
-            k:
-            np.append(pathways[highscoreidx][k],
-                      track[k][segments_idx[i]:segments_idx[i + 1]])
-            for k in track['dynamic']
-        },
-        static=track['static'],
-        dynamic=track['dynamic'],
-    )
+    return track.with_columns({
+        k:
+        np.append(pathways[highscoreidx][k],
+                  track[k][segments_idx[i]:segments_idx[i + 1]])
+        for k in track['dynamic']
+    })
 
 
 def _split_pathway(track, *, i, segments_idx):
-    path = dict(
-        **{k: track[k]
-           for k in track['static']},
-        **{
-            k: track[k][segments_idx[i]:segments_idx[i + 1]]
-            for k in track['dynamic']
-        },
-        static=track['static'],
-        dynamic=track['dynamic'],
-    )
+    path = track.slice(slice(segments_idx[i], segments_idx[i + 1]))
     return path
 
 
@@ -97,6 +84,7 @@ def encode_score(track, distance_threshold, speed_threshold, minscore):
         forming alternate trajectories according to highest likelihood of
         membership.
     '''
+    track = as_track(track)
     assert 'time' in track.keys()
     assert len(track['time']) > 0
     params = dict(distance_threshold=distance_threshold,
@@ -210,7 +198,7 @@ def encode_greatcircledistance(
         >>> os.remove(dbpath)
     '''
     for track in tracks:
-        assert isinstance(track, dict), f'got {type(track)} {track}'
+        assert isinstance(track, Mapping), f'got {type(track)} {track}'
         for path in encode_score(track, distance_threshold, speed_threshold,
                                  minscore):
             yield path
@@ -10,10 +10,14 @@ import numpy as np
 import shapely.ops
 import shapely.geometry
 import warnings
-from shapely.geometry import Polygon, LineString, Point
+from shapely.geometry import Polygon, LineString
 
 from aisdb.aisdb import haversine
 from aisdb.proc_util import glob_files
+from aisdb.track import as_track
+
+# earth radius in meters, also used by the haversine function in aisdb.aisdb
+_earth_radius_m = 6371088
 
 
 def shiftcoord(x, rng=180):
@@ -65,6 +69,49 @@ def epoch_2_dt(ep_arr, t0=datetime(1970, 1, 1, 0, 0, 0), unit='seconds'):
         )
 
 
+def haversine_array(x1, y1, x2, y2):
+    ''' compute haversine distance in meters between arrays of coordinates.
+        arrays are broadcast against each other, so a single coordinate
+        may be compared with an array of coordinates
+
+        args:
+            x1 (float or numpy.ndarray)
+                longitude of first coordinates
+            y1 (float or numpy.ndarray)
+                latitude of first coordinates
+            x2 (float or numpy.ndarray)
+                longitude of second coordinates
+            y2 (float or numpy.ndarray)
+                latitude of second coordinates
+
+        returns:
+            numpy.ndarray of float64 distances
+    '''
+    x1, y1, x2, y2 = (np.radians(np.asarray(v, dtype=np.float64))
+                      for v in (x1, y1, x2, y2))
+    a = np.sin((y2 - y1) / 2)**2 + np.cos(y1) * np.cos(y2) * np.sin(
+        (x2 - x1) / 2)**2
+    return 2 * _earth_radius_m * np.arcsin(np.sqrt(a))
+
+
+def bearing_array(x1, y1, x2, y2):
+    ''' compute initial great circle bearing in degrees from arrays of first
+        coordinates to arrays of second coordinates, in range [0, 360).
+        arrays are broadcast against each other as in
+        :func:`haversine_array`
+
+        returns:
+            numpy.ndarray of float64 bearings
+    '''
+    x1, y1, x2, y2 = (np.radians(np.asarray(v, dtype=np.float64))
+                      for v in (x1, y1, x2, y2))
+    dx = x2 - x1
+    theta = np.arctan2(
+        np.sin(dx) * np.cos(y2),
+        np.cos(y1) * np.sin(y2) - np.sin(y1) * np.cos(y2) * np.cos(dx))
+    return np.degrees(theta) % 360
+
+
 def delta_meters(track, rng=None):
     ''' compute haversine distance in meters between track positions for a
         given track
@@ -76,10 +123,8 @@ def delta_meters(track, rng=None):
                 optionally restrict computed values to given index range
     '''
     rng = range(len(track['time'])) if rng is None else rng
-    return np.array(
-        list(
-            map(haversine, track['lon'][rng][:-1], track['lat'][rng][:-1],
-                track['lon'][rng][1:], track['lat'][rng][1:])))
+    lon, lat = track['lon'][rng], track['lat'][rng]
+    return haversine_array(lon[:-1], lat[:-1], lon[1:], lat[1:])
 
 
 def delta_seconds(track, rng=None):
@@ -95,7 +140,7 @@ def delta_seconds(track, rng=None):
         track['time'] = np.array(track['time'])
     assert isinstance(track['time'], np.ndarray), f'got {track["time"] = }'
     rng = range(len(track['time'])) if rng is None else rng
-    return np.array(list((track['time'][rng][1:] - track['time'][rng][:-1])))
+    return np.diff(track['time'][rng].astype(np.int64))
 
 
 def delta_knots(track, rng=None):
@@ -109,8 +154,7 @@ def delta_knots(track, rng=None):
                 optionally restrict computed values to given index range
     '''
     rng = range(len(track['time'])) if rng is None else rng
-    ds = np.array([np.max((1, s)) for s in delta_seconds(track, rng)],
-                  dtype=object)
+    ds = np.fmax(delta_seconds(track, rng), 1)
     return delta_meters(track, rng) / ds * 1.9438445
 
 
@@ -155,9 +199,9 @@ def radial_coordinate_boundary(x, y, radius=100000):
 
 def distance3D(x1, y1, x2, y2, depth_metres):
     ''' haversine/pythagoras approximation of vessel distance to
-        point at given depth
+        point at given depth. x2 and y2 may be arrays of vessel positions
     '''
-    a2 = haversine(x1=x1, y1=y1, x2=x2, y2=y2)**2
+    a2 = haversine_array(x1, y1, x2, y2)**2
     b2 = abs(depth_metres)**2
     c2 = a2 + b2
     return np.sqrt(c2)
@@ -181,11 +225,11 @@ def vesseltrack_3D_dist(tracks, x1, y1, z1, colname='distance_metres'):
     '''
     for track in tracks:
         track['dynamic'] = track['dynamic'].union(set([colname]))
-        dists = [
-            distance3D(x1=x1, y1=y1, x2=x, y2=y, depth_metres=z1)
-            for x, y in zip(track['lon'], track['lat'])
-        ]
-        track[colname] = np.array(dists, dtype=object)
+        track[colname] = distance3D(x1=x1,
+                                    y1=y1,
+                                    x2=track['lon'],
+                                    y2=track['lat'],
+                                    depth_metres=z1)
         yield track
 
 
@@ -199,21 +243,12 @@ def mask_in_radius_2D(tracks, xy, distance_meters):
         distance_meters (int)
             maximum distance in meters
     '''
-    for track in tracks:
-        mask = [
-            haversine(track['lon'][i], track['lat'][i], xy[0], xy[1]) <
-            distance_meters for i in range(len(track['time']))
-        ]
+    for track in map(as_track, tracks):
+        mask = haversine_array(track['lon'], track['lat'], xy[0],
+                               xy[1]) < distance_meters
         if sum(mask) == 0:
             continue
-        yield dict(
-            **{k: track[k]
-               for k in track['static']},
-            **{k: track[k][mask]
-               for k in track['dynamic']},
-            static=track['static'],
-            dynamic=track['dynamic'],
-        )
+        yield track.slice(mask)
 
 
 class Domain():
@@ -236,6 +271,7 @@ class Domain():
         attr:
             self.name
             self.zones
+            self.zone_names
             self.boundary
             self.minX
             self.minY
@@ -399,6 +435,21 @@ class Domain():
             'ymax': self.maxY
         }
 
+        self._build_index()
+
+    def _build_index(self):
+        ''' build a spatial index of zone geometries for
+            :meth:`Domain.zones_for_points`
+        '''
+        # zone codes are indexes of zone_names. code 0 is outside all zones
+        self.zone_names = np.array(['Z0'] + list(self.zones.keys()))
+        geoms = [zone['geometry'] for zone in self.zones.values()]
+        self._tree = shapely.STRtree(geoms)
+        self._centroids = np.array([(g.centroid.x, g.centroid.y)
+                                    for g in geoms])
+        self._maxradius = np.array(
+            [zone['maxradius'] for zone in self.zones.values()])
+
     def nearest_polygons_to_point(self, x, y):
         ''' compute great circle distance for this point to each polygon
             centroid, subtracting the maximum polygon radius.
@@ -421,10 +472,55 @@ class Domain():
             })
         return dist_to_centroids
 
+    def zones_for_points(self, lon, lat, chunksize=10**5):
+        ''' Returns the zone code of each coordinate, as an index of
+            ``self.zone_names``. code 0 ('Z0') is used for coordinates
+            outside of all zones. if there are multiple zones containing
+            a coordinate, the zone with the nearest centroid (subtracting
+            the maximum zone radius) will be selected.
+
+            candidate zones are selected using a spatial index of zone
+            geometries, which is built when the domain is created
+
+            args:
+                lon (numpy.ndarray)
+                    longitude values
+                lat (numpy.ndarray)
+                    latitude values
+                chunksize (int)
+                    number of points tested at a time
+
+            returns:
+                numpy.ndarray of integer zone codes
+        '''
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        assert lon.shape == lat.shape
+        dtype = np.uint16 if len(self.zone_names) < 2**16 else np.uint32
+        codes = np.zeros(lon.size, dtype=dtype)
+        for i in range(0, lon.size, chunksize):
+            x, y = lon[i:i + chunksize], lat[i:i + chunksize]
+            pts, zones = self._tree.query(shapely.points(x, y),
+                                          predicate='within')
+            if pts.size == 0:
+                continue
+            dist = haversine_array(x[pts], y[pts], self._centroids[zones, 0],
+                                   self._centroids[zones, 1])
+            dist -= self._maxradius[zones]
+            inrange = dist < 0
+            pts, zones, dist = pts[inrange], zones[inrange], dist[inrange]
+            # nearest zone for each point
+            order = np.lexsort((dist, pts))
+            pts, zones = pts[order], zones[order]
+            first = np.append(True, pts[1:] != pts[:-1])
+            codes[i + pts[first]] = zones[first] + 1
+        return codes
+
     def point_in_polygon(self, x, y):
         ''' Returns the zone containing the given coordinates.
             if there are multiple zones containing the coordinates,
             the zone with the nearest centroid will be selected.
+            to check many coordinates, use :meth:`Domain.zones_for_points`
 
             args:
                 x (float)
@@ -435,18 +531,7 @@ class Domain():
         assert float(x) or x == 0.0, f'{type(x)} {x=}{y=}'
         assert float(y) or y == 0.0, f'{type(y)} {x=}{y=}'
         assert len(self.zones) > 0
-        # first pass filter using distance to centroid, subtracting max radius.
-        # discard all geometry with a distance over zero
-        nearest = {
-            k: v
-            for k, v in sorted(self.nearest_polygons_to_point(x, y).items(),
-                               key=lambda item: item[1]) if v < 0
-        }
-        # check for zone containment, starting with the nearest centroid
-        for key, value in nearest.items():
-            if self.zones[key]['geometry'].contains(Point(x, y)):
-                return key
-        return 'Z0'
+        return str(self.zone_names[self.zones_for_points([x], [y])[0]])
 
     def split_geom(self, zone):
         ''' Ensure that the zone doesn't intersect longitude 180 or -180.
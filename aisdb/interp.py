@@ -5,6 +5,8 @@ from datetime import timedelta
 import numpy as np
 import warnings
 
+from aisdb.track import as_track
+
 
 def np_interp_linear(track, key, intervals):
     assert len(track['time']) == len(track[key])
@@ -26,7 +28,7 @@ def interp_time(tracks, step=timedelta(minutes=10)):
         returns:
             dictionary of interpolated tracks
     '''
-    for track in tracks:
+    for track in map(as_track, tracks):
         if track['time'].size <= 1:
             # yield track
             warnings.warn('cannot interpolate track of length 1, skipping...')
@@ -40,17 +42,14 @@ def interp_time(tracks, step=timedelta(minutes=10)):
 
         assert len(intervals) >= 1
 
-        itr = dict(
-            **{k: track[k]
-               for k in track['static']},
-            time=intervals,
-            static=track['static'],
-            dynamic=track['dynamic'],
-            **{
-                k: np_interp_linear(track, k, intervals)
-                for k in track['dynamic'] if k != 'time'
-            },
-        )
+        itr = track.with_columns(
+            dict(
+                time=intervals,
+                **{
+                    k: np_interp_linear(track, k, intervals)
+                    for k in track['dynamic'] if k != 'time'
+                },
+            ))
         yield itr
 
     return
@@ -3,6 +3,7 @@
     trajectory statistics within the overall domain
 '''
 
+from collections.abc import Mapping
 import os
 import pickle
 import re
@@ -29,6 +30,7 @@ from aisdb.track_gen import (
 from aisdb.denoising_encoder import encode_greatcircledistance
 from aisdb.database.dbconn import PostgresDBConn, SQLiteDBConn, ConnectionType
 from aisdb.interp import interp_time
+from aisdb.pipeline import run_pipeline
 from aisdb.proc_util import _sanitize
 from aisdb.proc_util import _segment_rng
 from aisdb.webdata.bathymetry import Gebco
@@ -79,18 +81,21 @@ def _staticinfo(track, domain):
     return static
 
 
-def _transitinfo(track, zoneset, interp_resolution=timedelta(hours=1)):
+def _transitinfo(track,
+                 zoneset,
+                 domain,
+                 interp_resolution=timedelta(hours=1)):
     ''' aggregate statistics on vessel network graph connectivity '''
 
     dynamic = {}
 
-    # geofencing
+    # geofencing. zone codes are converted to zone names
+    src = domain.zone_names[track['in_zone'][zoneset][0]]
+    rcv = domain.zone_names[track['in_zone'][zoneset][-1]]
     dynamic.update(
-        dict(
-            src_zone=int(re.sub('[^0-9]', '', track['in_zone'][zoneset][0])),
-            rcv_zone=int(re.sub('[^0-9]', '', track['in_zone'][zoneset][-1])),
-            transit_nodes=
-            f"{track['in_zone'][zoneset][0]}_{track['in_zone'][zoneset][-1]}"))
+        dict(src_zone=int(re.sub('[^0-9]', '', src)),
+             rcv_zone=int(re.sub('[^0-9]', '', rcv)),
+             transit_nodes=f'{src}_{rcv}'))
 
     # timestamp info
     dynamic.update(
@@ -174,47 +179,66 @@ def _transitinfo(track, zoneset, interp_resolution=timedelta(hours=1)):
     return dynamic
 
 
-def _serialize_network_edge(tracks, domain, tmp_dir):
+def _network_edges(tracks, domain):
     ''' at each track position where the zone changes, a transit
         index is recorded, and trajectory statistics are aggregated for this
         index range using _staticinfo() and _transitinfo()
 
-        results will be serialized as binary files labelled by mmsi into the
-        'tmp_dir' directory, as defined in the config file. see graph() for
-        deserialization and concatenation of results
-
         args:
             tracks: dict
                 dictionary of vessel trajectory data, as output by
                 ais.track_gen.TrackGen() or its wrapper functions
 
-        returns: None
+        yields:
+            list of network edge dictionaries for each track
     '''
     for track in tracks:
-        assert isinstance(track, dict)
+        assert isinstance(track, Mapping)
         assert len(track['time']) > 0
-        filepath = os.path.join(tmp_dir, str(track['mmsi']).zfill(9))
         assert 'in_zone' in track.keys(
         ), 'need to append zone info from fence_tracks'
 
-        with open(filepath, 'ab') as f:
-            transits = np.where(
-                track['in_zone'][:-1] != track['in_zone'][1:])[0] + 1
+        edges = []
+        transits = np.where(
+            track['in_zone'][:-1] != track['in_zone'][1:])[0] + 1
 
-            for i in range(len(transits) - 1):
-                rng = np.array(range(transits[i], transits[i + 1] + 1))
-                track_stats = _staticinfo(track, domain)
-                track_stats.update(_transitinfo(track, rng))
-                pickle.dump(track_stats, f)
-
-            i0 = transits[-1] if len(transits) >= 1 else 0
-            rng = np.array(range(i0, len(track['in_zone'])))
+        for i in range(len(transits) - 1):
+            rng = np.array(range(transits[i], transits[i + 1] + 1))
             track_stats = _staticinfo(track, domain)
-            track_stats.update(_transitinfo(track, rng))
-            track_stats['rcv_zone'] = 'NULL'
-            track_stats['transit_nodes'] = track_stats['src_zone']
-            pickle.dump(track_stats, f)
-        yield
+            track_stats.update(_transitinfo(track, rng, domain))
+            edges.append(track_stats)
+
+        i0 = transits[-1] if len(transits) >= 1 else 0
+        rng = np.array(range(i0, len(track['in_zone'])))
+        track_stats = _staticinfo(track, domain)
+        track_stats.update(_transitinfo(track, rng, domain))
+        track_stats['rcv_zone'] = 'NULL'
+        track_stats['transit_nodes'] = track_stats['src_zone']
+        edges.append(track_stats)
+        yield edges
+
+
+def _serialize_network_edge(edges, tmp_dir):
+    ''' results of _network_edges() will be serialized as binary files
+        labelled by mmsi into the 'tmp_dir' directory. see graph() for
+        deserialization and concatenation of results.
+        files are only written by the calling process, so that the edges of
+        each vessel are not interleaved when tracks are processed in
+        parallel
+
+        args:
+            edges (iterable)
+                lists of network edge dictionaries, as yielded by
+                _network_edges()
+
+        returns: None
+    '''
+    for track_edges in edges:
+        filepath = os.path.join(tmp_dir,
+                                str(track_edges[0]['mmsi']).zfill(9))
+        with open(filepath, 'ab') as f:
+            for track_stats in track_edges:
+                pickle.dump(track_stats, f)
 
 
 def _aggregate_output(outputfile, tmp_dir, filters=[lambda row: False]):
@@ -295,6 +319,7 @@ def graph(
         shoredist_raster: str = None,
         portdist_raster: str = None,
         decimate: float = 0.0001,
+        processes: int = 1,
         verbose: bool = False):
     ''' Compute network graph of vessel movements within domain zones.
         Zone polygons will be used as network nodes, with graph edges
@@ -334,6 +359,10 @@ def graph(
                 minimum score for segments to be considered sequential. See
                 :func:`aisdb.denoising_encoder.encode_greatcircledistance` for
                 more info
+            processes (int)
+                number of processes used to segment, interpolate, and
+                geofence tracks. See :func:`aisdb.pipeline.run_pipeline`
+                for more info
 
         Network graph activity is computed following these steps:
 
@@ -455,9 +484,7 @@ def graph(
             print(f'\n{domain.name=} {domain.boundary=}')
 
         # configure processing pipeline
-        serialize_CSV = partial(_serialize_network_edge,
-                                domain=domain,
-                                tmp_dir=tmp_dir)
+        network_edges = partial(_network_edges, domain=domain)
         geofence = partial(fence_tracks, domain=domain)
         interp = partial(interp_time, step=interp_delta)
         encode_tracks = partial(encode_greatcircledistance,
@@ -467,17 +494,19 @@ def graph(
         timesplit = partial(split_timedelta, maxdelta=maxdelta)
         vinfo = partial(vessel_info, dbconn=vinfoDB)
 
-        # pipeline execution order
+        # pipeline execution order. vessel info is read from the database
+        # connection in this process, and each track is processed
+        # independently afterwards. results are ordered and written in this
+        # process, so that the edges of each vessel are serialized in order
         tracks = vinfo(tracks)
         tracks = wetted_surface_area(tracks)
-        tracks = timesplit(tracks)
-        tracks = encode_tracks(tracks)
-        tracks = interp(tracks)
-        tracks = geofence(tracks)
-        result = serialize_CSV(tracks)
-
-        for res in result:
-            assert res is None
+        edges = run_pipeline(
+            tracks,
+            [timesplit, encode_tracks, interp, geofence, network_edges],
+            processes=processes,
+            ordered=True,
+        )
+        _serialize_network_edge(edges, tmp_dir)
 
         if os.listdir(tmp_dir) == []:
             warnings.warn(f'no data for {outputfile}, skipping...\n')
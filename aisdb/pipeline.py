@@ -0,0 +1,269 @@
+''' parallel execution of track processing stages using a process pool '''
+
+from collections import namedtuple
+from collections.abc import Mapping
+from multiprocessing import Pool, resource_tracker, shared_memory
+import os
+import queue
+import secrets
+
+import numpy as np
+
+from aisdb.track import Track
+
+# location of an array copied to a shared memory block
+_SharedArray = namedtuple('_SharedArray', ['offset', 'dtype', 'shape'])
+
+# processing stages of each worker process, and the shared memory name
+# prefix of the current run, set by _init_worker
+_worker_stages = None
+_worker_prefix = None
+
+
+def _pack(items, name=None):
+    ''' copy the arrays of each track in a list to a new shared memory block.
+        values that are not arrays, or arrays of python objects, are kept in
+        the returned header instead. items that are not track dictionaries
+        (e.g. None) are also kept in the header.
+        if name is None, a random name is used for the shared memory block
+
+        returns:
+            picklable tuple of (shared memory name, layout)
+    '''
+    layout = []
+    arrays = []
+    size = 0
+    for item in items:
+        if not isinstance(item, Mapping):
+            layout.append(('value', item))
+            continue
+        fields = {}
+        for key, val in item.items():
+            if isinstance(val, np.ndarray) and not val.dtype.hasobject:
+                size = -(-size // 16) * 16
+                fields[key] = _SharedArray(size, val.dtype.str, val.shape)
+                arrays.append((size, val))
+                size += val.nbytes
+            else:
+                fields[key] = val
+        layout.append(('track' if isinstance(item, Track) else 'dict', fields))
+
+    if size == 0:
+        return None, layout
+    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    for offset, arr in arrays:
+        np.ndarray(arr.shape, arr.dtype, buffer=shm.buf,
+                   offset=offset)[...] = arr
+    shm.close()
+    return shm.name, layout
+
+
+def _unpack(header, unlink=False):
+    ''' copy tracks from a shared memory block created by _pack().
+        if unlink is True, the shared memory block is removed afterwards
+    '''
+    name, layout = header
+    shm = shared_memory.SharedMemory(name=name) if name is not None else None
+    items = []
+    try:
+        for kind, fields in layout:
+            if kind == 'value':
+                items.append(fields)
+                continue
+            item = Track() if kind == 'track' else {}
+            for key, val in fields.items():
+                if isinstance(val, _SharedArray):
+                    val = np.ndarray(val.shape,
+                                     val.dtype,
+                                     buffer=shm.buf,
+                                     offset=val.offset).copy()
+                item[key] = val
+            items.append(item)
+    finally:
+        if shm is not None:
+            shm.close()
+            if unlink:
+                shm.unlink()
+    return items
+
+
+def _unlink(header):
+    ''' remove the shared memory block of a header created by _pack() '''
+    if header[0] is not None:
+        shm = shared_memory.SharedMemory(name=header[0])
+        shm.close()
+        shm.unlink()
+
+
+def _shm_name(prefix, kind, i):
+    ''' shared memory block name for the input or output of chunk i '''
+    return f'{prefix}{kind}{i}'
+
+
+def _sweep(prefix, i):
+    ''' remove the shared memory blocks of chunk i, if they exist. blocks
+        created by a worker process are not referenced by the parent process
+        if the worker is terminated before returning
+    '''
+    for kind in ('i', 'o'):
+        try:
+            _unlink((_shm_name(prefix, kind, i), None))
+        except FileNotFoundError:
+            pass
+
+
+def _init_worker(stages, prefix):
+    global _worker_stages, _worker_prefix
+    _worker_stages = stages
+    _worker_prefix = prefix
+
+
+def _apply_stages(tracks, stages):
+    for stage in stages:
+        tracks = stage(tracks)
+    return tracks
+
+
+def _run_chunk(i, header):
+    ''' apply processing stages to a chunk of tracks in a worker process '''
+    tracks = _apply_stages(iter(_unpack(header)), _worker_stages)
+    return i, _pack(list(tracks), _shm_name(_worker_prefix, 'o', i))
+
+
+def _mmsi(item):
+    ''' MMSI of a track, or None for other items '''
+    return item.get('mmsi') if isinstance(item, Mapping) else None
+
+
+def _chunks(tracks, chunksize):
+    ''' group tracks into lists of at least chunksize tracks. consecutive
+        tracks with the same MMSI are always in the same chunk. items
+        without an MMSI are grouped by chunksize only
+    '''
+    chunk = []
+    for track in tracks:
+        if len(chunk) >= chunksize and (_mmsi(track) is None
+                                        or _mmsi(track) != _mmsi(chunk[-1])):
+            yield chunk
+            chunk = []
+        chunk.append(track)
+    if len(chunk) > 0:
+        yield chunk
+
+
+def run_pipeline(tracks,
+                 stages: list,
+                 *,
+                 processes: int = None,
+                 chunksize: int = 100,
+                 ordered: bool = True,
+                 max_pending: int = None):
+    ''' apply a list of processing stages to tracks using a process pool.
+
+        tracks are divided into chunks, which are processed by each stage in
+        order in a worker process. consecutive tracks of the same MMSI are
+        always processed in the same chunk. items without an 'mmsi' key are
+        divided into chunks by size only. track arrays are sent to and from
+        the worker processes using shared memory, which is removed if the
+        pipeline is stopped early or a stage raises an exception. at most max_pending chunks are
+        read from tracks before results are yielded, so that memory usage
+        is bounded when results are consumed slower than they are produced.
+
+        each stage is a callable which accepts a track iterator and yields
+        tracks, e.g. :func:`aisdb.track_gen.split_timedelta` or
+        ``functools.partial(aisdb.interp.interp_time, step=step)``.
+        stages are passed to the worker processes when the pool is started.
+        on platforms where processes are not forked, stages must be
+        picklable. stages should not use database connections, which cannot
+        be shared between processes.
+
+        args:
+            tracks (aisdb.track_gen.TrackGen)
+                track vectors generator
+            stages (list)
+                processing stage callables, in order of execution
+            processes (int)
+                number of worker processes. defaults to the number of CPUs.
+                if 1, stages are applied in the current process
+            chunksize (int)
+                minimum number of tracks sent to a worker at a time
+            ordered (bool)
+                if True, results are yielded in the same order as the input
+                tracks. otherwise, results are yielded as soon as each
+                chunk is completed
+            max_pending (int)
+                maximum number of chunks being processed at a time.
+                defaults to twice the number of processes
+
+        yields:
+            results of the last stage
+
+        >>> from functools import partial
+        >>> from datetime import timedelta
+        >>> from aisdb import TrackGen, interp_time, split_timedelta
+        >>> from aisdb.pipeline import run_pipeline
+        >>> stages = [
+        ...     partial(split_timedelta, maxdelta=timedelta(hours=6)),
+        ...     partial(interp_time, step=timedelta(minutes=10)),
+        ... ]
+        >>> tracks = TrackGen(qry.gen_qry(), decimate=False)
+        >>> for track in run_pipeline(tracks, stages, processes=4):
+        ...     print(track['mmsi'], track['time'])
+    '''
+    stages = list(stages)
+    processes = processes or os.cpu_count()
+    if processes == 1:
+        yield from _apply_stages(tracks, stages)
+        return
+    max_pending = max_pending or 2 * processes
+    assert max_pending > 0
+
+    # chunks in progress, by chunk index
+    pending = {}
+    last = None
+    completed = queue.Queue()
+    callbacks = {} if ordered else dict(callback=completed.put,
+                                        error_callback=completed.put)
+
+    def _next_result():
+        if ordered:
+            i = next(iter(pending.keys()))
+            _, out = pending[i][1].get()
+        else:
+            res = completed.get()
+            if isinstance(res, BaseException):
+                raise res
+            i, out = res
+        header, _ = pending.pop(i)
+        _unlink(header)
+        return _unpack(out, unlink=True)
+
+    # shared memory blocks of this run are named using a random prefix, so
+    # that blocks left by terminated workers can be found
+    prefix = f'aisdb{secrets.token_hex(4)}'
+
+    # start the resource tracker before forking, so that shared memory
+    # created by worker processes is tracked by the same process
+    resource_tracker.ensure_running()
+    with Pool(processes, initializer=_init_worker,
+              initargs=(stages, prefix)) as pool:
+        try:
+            for i, chunk in enumerate(_chunks(tracks, chunksize)):
+                last = i
+                header = _pack(chunk, _shm_name(prefix, 'i', i))
+                pending[i] = (header,
+                              pool.apply_async(_run_chunk, (i, header),
+                                               **callbacks))
+                while len(pending) >= max_pending:
+                    yield from _next_result()
+            while len(pending) > 0:
+                yield from _next_result()
+        finally:
+            # workers are stopped before removing the blocks of chunks in
+            # progress, so that no more blocks are created
+            pool.terminate()
+            swept = set(pending.keys())
+            if last is not None:
+                swept.add(last)
+            for i in swept:
+                _sweep(prefix, i)
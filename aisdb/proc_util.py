@@ -1,3 +1,4 @@
+from collections.abc import Mapping
 from datetime import datetime, timedelta
 from functools import partial, reduce
 from tempfile import SpooledTemporaryFile
@@ -75,7 +76,7 @@ def write_csv_rows(rows,
 
 def _datetime_column(tracks):
     for track in tracks:
-        assert isinstance(track, dict), f'got {track=}'
+        assert isinstance(track, Mapping), f'got {track=}'
         track['datetime'] = np.array(
             _epoch_2_dt(track['time'].astype(int)),
             dtype=object,
@@ -232,23 +233,49 @@ def glob_files(dirpath, ext='.txt', keyorder=lambda key: key):
     return sorted(extpaths, key=keyorder)
 
 
-def getfiledate(filename):
+def _mtime_date(filename):
+    ''' file modification date, or the current date if the file does not
+        exist
+    '''
+    if os.path.exists(filename):
+        return datetime.fromtimestamp(os.path.getmtime(filename)).date()
+    return datetime.now().date()
+
+
+def getfiledate(filename, data=None):
     ''' attempt to parse the first valid epoch timestamp from .nm4 data file.
         timestamp will be returned as :class:`datetime.date` if successful,
-        otherwise will return False if no date could be found
+        otherwise will return False if no date could be found.
+
+        if data is given and contains no timestamp, e.g. when data was
+        appended to a file without a ``c:`` tag in the leading bytes, the
+        file modification date is returned instead. for a named pipe, this
+        is the date the pipe was created
 
         args:
             filename (string)
                 raw AIS data file in .nm4 format
+            data (bytes)
+                optionally parse the leading bytes of the file contents
+                instead of reading from filename, e.g. when streaming
+                decompressed data from an archive
     '''
-    filesize = os.path.getsize(filename)
-    if filesize == 0:  # pragma: no cover
-        return False
-    with open(filename, 'r') as f:
+    if data is None:
+        filesize = os.path.getsize(filename)
+        if filesize == 0:  # pragma: no cover
+            return False
+        f = open(filename, 'r')
+    else:
+        if len(data) == 0:  # pragma: no cover
+            return _mtime_date(filename)
+        f = io.TextIOWrapper(io.BytesIO(data), errors='replace')
+    with f:
         if filename.lower()[-3:] == "csv":
             reader = csv.reader(f)
             head = next(reader)
-            row1 = next(reader)
+            row1 = next(reader, None)
+            if row1 is None and data is not None:
+                return _mtime_date(filename)
             rowdict = {a: b for a, b in zip(head, row1)}
             fdate = datetime.strptime(rowdict['Time'], '%Y%m%d_%H%M%S').date()
             return fdate
@@ -257,6 +284,8 @@ def getfiledate(filename):
             head = line.rsplit('\\', 1)[0]
             n = 0
             while 'c:' not in head:  # pragma: no cover
+                if line == '' and data is not None:
+                    return _mtime_date(filename)
                 n += 1
                 line = f.readline()
                 head = line.rsplit('\\', 1)[0]
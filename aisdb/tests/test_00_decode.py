@@ -1,8 +1,12 @@
-import os
 from datetime import datetime
+from multiprocessing import active_children
+import os
+import re
+import shutil
+from time import sleep
 
 from aisdb.database.dbconn import DBConn, PostgresDBConn
-from aisdb.database.decoder import decode_msgs
+from aisdb.database.decoder import decode_msgs, iter_unzip, start_unzip
 from aisdb.tests.create_testing_data import postgres_test_conn
 
 
@@ -63,3 +67,233 @@ def test_decode_1day_postgres(tmpdir):
         print(
             f'postgres total parse and insert time: {delta.total_seconds():.2f}s'
         )
+
+
+def test_decode_1day_parallel(tmpdir):
+    testingdata_nm4 = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20211101.nm4')
+    testingdata_csv = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20210701.csv')
+    testingdata_gz = os.path.join(os.path.dirname(__file__), 'testdata',
+                                  'test_data_20211101.nm4.gz')
+    testingdata_zip = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20211101.nm4.zip')
+    filepaths = [
+        testingdata_nm4, testingdata_csv, testingdata_gz, testingdata_zip
+    ]
+
+    counts = []
+    for workers in (1, 3):
+        dbpath = os.path.join(tmpdir, f'test_decode_{workers}_workers.db')
+        with DBConn(dbpath) as dbconn:
+            dt = datetime.now()
+            decode_msgs(filepaths=filepaths,
+                        dbconn=dbconn,
+                        source='TESTING',
+                        workers=workers,
+                        verbose=False)
+            delta = datetime.now() - dt
+            print(f'sqlite parse and insert time ({workers} workers): '
+                  f'{delta.total_seconds():.2f}s')
+            cur = dbconn.cursor()
+            cur.execute('SELECT name FROM sqlite_master '
+                        'WHERE type="table" AND name LIKE "ais_%" '
+                        'ORDER BY name')
+            count = []
+            for table in [row['name'] for row in cur.fetchall()]:
+                cur.execute(f'SELECT COUNT(*) FROM {table}')
+                count.append((table, cur.fetchone()[0]))
+            cur.execute('SELECT COUNT(*) FROM ingest_manifest')
+            count.append(cur.fetchone()[0])
+            counts.append(count)
+
+    assert counts[0] == counts[1]
+
+
+def test_iter_unzip(tmpdir):
+    testingdata_nm4 = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20211101.nm4')
+    testingdata_gz = os.path.join(os.path.dirname(__file__), 'testdata',
+                                  'test_data_20211101.nm4.gz')
+    testingdata_zip = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20211101.nm4.zip')
+    unzipped = [
+        path for _, batch in iter_unzip([testingdata_gz, testingdata_zip],
+                                        str(tmpdir),
+                                        processes=2) for path in batch
+    ]
+    # both archives contain the same file, which is only extracted once
+    assert len(unzipped) == 1
+    with open(unzipped[0], 'rb') as f1, open(testingdata_nm4, 'rb') as f2:
+        assert f1.read() == f2.read()
+
+
+def test_iter_unzip_abandoned(tmpdir):
+    testingdata_gz = os.path.join(os.path.dirname(__file__), 'testdata',
+                                  'test_data_20211101.nm4.gz')
+    testingdata_zip = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20211101.nm4.zip')
+    batches = iter_unzip([testingdata_gz, testingdata_zip],
+                         str(tmpdir),
+                         processes=2)
+    next(batches)
+    assert len(active_children()) > 0
+    # closing the generator early stops the worker processes
+    batches.close()
+    assert len(active_children()) == 0
+
+
+def test_start_unzip(tmpdir):
+    testingdata_gz = os.path.join(os.path.dirname(__file__), 'testdata',
+                                  'test_data_20211101.nm4.gz')
+    testingdata_zip = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20211101.nm4.zip')
+    with start_unzip([testingdata_gz, testingdata_zip],
+                     str(tmpdir),
+                     processes=2) as unzipped:
+        # archives are extracted before the results are iterated
+        assert len(active_children()) > 0
+        deadline = datetime.now().timestamp() + 30
+        while (len(os.listdir(tmpdir)) < 2
+               and datetime.now().timestamp() < deadline):
+            sleep(0.01)
+        assert len(os.listdir(tmpdir)) == 2
+        batches = list(unzipped)
+    assert len(batches) == 2
+    assert len(active_children()) == 0
+
+
+def test_decode_stream_archives(tmpdir):
+    testingdata_gz = os.path.join(os.path.dirname(__file__), 'testdata',
+                                  'test_data_20211101.nm4.gz')
+    testingdata_zip = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20211101.nm4.zip')
+    counts = []
+    for stream_archives in (False, True):
+        dbpath = os.path.join(tmpdir,
+                              f'test_decode_stream_{stream_archives}.db')
+        with DBConn(dbpath) as dbconn:
+            decode_msgs(filepaths=[testingdata_gz, testingdata_zip],
+                        dbconn=dbconn,
+                        source='TESTING',
+                        stream_archives=stream_archives,
+                        verbose=False)
+            cur = dbconn.cursor()
+            cur.execute('SELECT COUNT(*) FROM ais_202111_dynamic')
+            counts.append(cur.fetchone()[0])
+            cur.execute('SELECT COUNT(*) FROM ingest_manifest')
+            counts.append(cur.fetchone()[0])
+    assert counts[:2] == counts[2:]
+
+
+def test_decode_appended_file(tmpdir):
+    testingdata_nm4 = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20211101.nm4')
+    with open(testingdata_nm4, 'rb') as f:
+        lines = f.readlines()
+    half = len(lines) // 2
+
+    # file is read while a line is partially written
+    growing = os.path.join(tmpdir, 'test_data_growing.nm4')
+    with open(growing, 'wb') as f:
+        f.writelines(lines[:half])
+        f.write(lines[half][:10])
+
+    counts = []
+    with DBConn(os.path.join(tmpdir, 'test_decode_appended.db')) as dbconn:
+        decode_msgs(filepaths=[growing],
+                    dbconn=dbconn,
+                    source='TESTING',
+                    verbose=False)
+        with open(growing, 'ab') as f:
+            f.write(lines[half][10:])
+            f.writelines(lines[half + 1:])
+        dt = datetime.now()
+        decode_msgs(filepaths=[growing],
+                    dbconn=dbconn,
+                    source='TESTING',
+                    verbose=True)
+        delta = datetime.now() - dt
+        print(f'appended data parse and insert time: '
+              f'{delta.total_seconds():.2f}s')
+
+        # unchanged files and copies of ingested files are skipped
+        shutil.copy(growing, os.path.join(tmpdir, 'copy.nm4'))
+        decode_msgs(
+            filepaths=[growing, os.path.join(tmpdir, 'copy.nm4')],
+            dbconn=dbconn,
+            source='TESTING',
+            verbose=True)
+
+        cur = dbconn.cursor()
+        cur.execute('SELECT size, ingested_bytes FROM ingest_manifest')
+        assert [tuple(row) for row in cur.fetchall()
+                ] == [(os.path.getsize(growing), os.path.getsize(growing))
+                      for _ in range(2)]
+        cur.execute('SELECT COUNT(*) FROM ais_202111_dynamic')
+        counts.append(cur.fetchone()[0])
+
+    with DBConn(os.path.join(tmpdir, 'test_decode_complete.db')) as dbconn:
+        decode_msgs(filepaths=[testingdata_nm4],
+                    dbconn=dbconn,
+                    source='TESTING',
+                    verbose=False)
+        cur = dbconn.cursor()
+        cur.execute('SELECT COUNT(*) FROM ais_202111_dynamic')
+        counts.append(cur.fetchone()[0])
+
+    assert counts[0] == counts[1]
+
+
+def _scale_nm4(src, dst, copies):
+    ''' write copies of an .nm4 file, shifting the timestamp of each copy
+        by one minute so that messages are not duplicates
+    '''
+    with open(src, 'r') as f:
+        lines = [line for line in f.read().splitlines() if 'c:' in line]
+    with open(dst, 'w') as f:
+        for i in range(copies):
+            for line in lines:
+                tags, msg = line[1:].split('\\', 1)
+                tags = re.sub(r'c:(\d+)',
+                              lambda m: f'c:{int(m.group(1)) + i * 60}',
+                              tags.split('*')[0])
+                checksum = 0
+                for char in tags:
+                    checksum ^= ord(char)
+                f.write(f'\\{tags}*{checksum:02X}\\{msg}\n')
+
+
+def test_bulk_ingest_benchmark(tmpdir):
+    testingdata_nm4 = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20211101.nm4')
+    scaled_nm4 = os.path.join(tmpdir, 'test_bulk_ingest_20211101.nm4')
+    _scale_nm4(testingdata_nm4, scaled_nm4, 50)
+
+    counts = []
+    for bulk_ingest in (False, True):
+        dbpath = os.path.join(tmpdir, f'test_bulk_ingest_{bulk_ingest}.db')
+        with DBConn(dbpath) as dbconn:
+            dt = datetime.now()
+            decode_msgs(filepaths=[scaled_nm4],
+                        dbconn=dbconn,
+                        source='TESTING',
+                        verbose=False,
+                        bulk_ingest=bulk_ingest)
+            delta = datetime.now() - dt
+
+            cur = dbconn.cursor()
+            cur.execute('SELECT COUNT(*) FROM ais_202111_dynamic')
+            counts.append(cur.fetchone()[0])
+            print(f'bulk_ingest={bulk_ingest}: '
+                  f'{counts[-1] / delta.total_seconds():.0f} rows/s')
+
+            cur.execute('PRAGMA journal_mode')
+            assert cur.fetchone()[0] == 'delete'
+            with dbconn.read_optimized():
+                cur.execute('SELECT COUNT(*) FROM ais_202111_dynamic')
+                assert cur.fetchone()[0] == counts[-1]
+                # queries may create tables while reading
+                cur.execute('CREATE TABLE test_read_optimized (a INTEGER)')
+
+    assert counts[0] == counts[1] > 0
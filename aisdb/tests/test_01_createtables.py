@@ -1,6 +1,11 @@
+from collections import Counter
+from datetime import datetime
 import os
 import warnings
 
+import numpy as np
+import pytest
+
 from aisdb.database.dbconn import DBConn, PostgresDBConn
 from aisdb.database.decoder import decode_msgs
 from aisdb.database.create_tables import (
@@ -32,6 +37,117 @@ def test_create_static_aggregate_table(tmpdir):
         dbconn.aggregate_static_msgs(["202107"])
 
 
+def _aggregate_static_msgs_per_mmsi(dbconn, month):
+    ''' previous implementation of aggregate_static_msgs() running one
+        query per MMSI. used as a reference for comparing results and timing
+    '''
+    cur = dbconn.cursor()
+    cur.execute(f'SELECT DISTINCT s.mmsi FROM ais_{month}_static AS s')
+    mmsis = np.array(cur.fetchall(), dtype=int).flatten()
+    sql_select = f'''
+      SELECT
+        s.mmsi, s.imo, TRIM(vessel_name) as vessel_name, s.ship_type,
+        s.call_sign, s.dim_bow, s.dim_stern, s.dim_port, s.dim_star,
+        s.draught
+      FROM ais_{month}_static AS s WHERE s.mmsi = ?
+    '''
+    agg_rows = []
+    for mmsi in mmsis:
+        cur.execute(sql_select, (str(mmsi), ))
+        cols = np.array(cur.fetchall(), dtype=object).T
+        filtercols = np.array(
+            [np.array(list(filter(None, col)), dtype=object) for col in cols],
+            dtype=object,
+        )
+        paddedcols = np.array(
+            [col if len(col) > 0 else [None] for col in filtercols],
+            dtype=object,
+        )
+        agg_rows.append(
+            [Counter(col).most_common(1)[0][0] for col in paddedcols])
+    skip_nommsi = np.array(agg_rows, dtype=object)
+    skip_nommsi = skip_nommsi[skip_nommsi[:, 0] != None]
+    return [tuple(row) for row in skip_nommsi]
+
+
+def test_aggregate_static_msgs_benchmark(tmpdir):
+    dbpath = os.path.join(tmpdir, 'test_aggregate_static_msgs_benchmark.db')
+    testingdata_csv = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20210701.csv')
+    month = '202107'
+    with DBConn(dbpath) as dbconn:
+        decode_msgs([testingdata_csv],
+                    dbconn=dbconn,
+                    source='TESTING',
+                    verbose=False)
+
+        # scale up the number of unique vessels by copying static reports
+        for i in range(1, 20):
+            dbconn.execute(
+                f'INSERT OR IGNORE INTO ais_{month}_static '
+                f'SELECT mmsi + {i * 1000000000}, time, vessel_name, '
+                'ship_type, call_sign, imo, dim_bow, dim_stern, dim_port, '
+                'dim_star, draught, destination, ais_version, fixing_device, '
+                'eta_month, eta_day, eta_hour, eta_minute, source '
+                f'FROM ais_{month}_static WHERE mmsi < 1000000000')
+        dbconn.commit()
+
+        dt = datetime.now()
+        expected = _aggregate_static_msgs_per_mmsi(dbconn, month)
+        delta_per_mmsi = datetime.now() - dt
+
+        dt = datetime.now()
+        dbconn.aggregate_static_msgs([month], verbose=False)
+        delta_ordered = datetime.now() - dt
+
+        cur = dbconn.cursor()
+        cur.execute(f'SELECT * FROM static_{month}_aggregate ORDER BY mmsi')
+        result = [tuple(row) for row in cur.fetchall()]
+
+    assert result == sorted(expected)
+    print(f'aggregated {len(result)} vessels\n'
+          f'per-MMSI query: {delta_per_mmsi.total_seconds():.2f}s\n'
+          f'ordered pass: {delta_ordered.total_seconds():.2f}s')
+
+
+def test_aggregate_static_msgs_incremental(tmpdir):
+    dbpath = os.path.join(tmpdir, 'test_aggregate_static_msgs_incremental.db')
+    testingdata_csv = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20210701.csv')
+    month = '202107'
+    with DBConn(dbpath) as dbconn:
+        decode_msgs([testingdata_csv],
+                    dbconn=dbconn,
+                    source='TESTING',
+                    verbose=False)
+
+        # append static reports for a subset of vessels
+        dbconn.execute(f'INSERT OR IGNORE INTO ais_{month}_static '
+                       'SELECT mmsi, time + 1, vessel_name, ship_type, '
+                       'call_sign, imo, dim_bow, dim_stern, dim_port, '
+                       'dim_star, draught, destination, ais_version, '
+                       'fixing_device, eta_month, eta_day, eta_hour, '
+                       f'eta_minute, source FROM ais_{month}_static '
+                       'WHERE mmsi % 2 = 0')
+        dbconn.commit()
+        dbconn.aggregate_static_msgs([month], verbose=False)
+        cur = dbconn.cursor()
+        cur.execute(f'SELECT * FROM static_{month}_aggregate ORDER BY mmsi')
+        incremental = [tuple(row) for row in cur.fetchall()]
+
+        cur.execute(f'SELECT COUNT(*) FROM ais_{month}_static')
+        count = cur.fetchone()[0]
+        cur.execute('SELECT row_count FROM static_aggregate_watermark '
+                    'WHERE month = ?', [month])
+        assert cur.fetchone()[0] == count
+
+        dbconn.aggregate_static_msgs([month], verbose=False, incremental=False)
+        cur.execute(f'SELECT * FROM static_{month}_aggregate ORDER BY mmsi')
+        rebuilt = [tuple(row) for row in cur.fetchall()]
+
+    assert incremental == rebuilt
+
+
 def test_create_from_CSV(tmpdir):
     testingdata_csv = os.path.join(os.path.dirname(__file__), 'testdata',
                                    'test_data_20210701.csv')
@@ -52,7 +168,16 @@ def test_create_from_CSV(tmpdir):
         rows = cur.fetchall()
         temp = [row['name'] for row in rows]
         print(temp)
-        assert len(temp) == 5
+        assert set(temp) == {
+            'ais_202107_dynamic',
+            'ais_202107_static',
+            'coarsetype_ref',
+            'ingest_manifest',
+            'partition_catalog',
+            'static_202107_aggregate',
+            'static_aggregate_watermark',
+            'vessel_day_summary',
+        }
 
 
 def test_create_from_CSV_postgres(tmpdir):
@@ -72,3 +197,196 @@ def test_create_from_CSV_postgres(tmpdir):
             "WHERE table_schema = 'public' ORDER BY table_name;")
         tables = [row["table_name"] for row in cur.fetchall()]
         assert 'ais_202107_dynamic' in tables
+
+
+def test_bulk_load_postgres_benchmark(tmpdir):
+    count = 100000
+    rng = np.random.default_rng(0)
+    arrays = dict(
+        mmsi=rng.integers(200000000, 800000000, count),
+        time=(np.arange(count) + 4070908800) % 2**31,
+        longitude=rng.uniform(-180, 180, count),
+        latitude=rng.uniform(-90, 90, count),
+        rot=np.where(rng.random(count) < 0.1, np.nan, rng.random(count)),
+        sog=rng.random(count),
+        cog=rng.random(count),
+        source='TESTING',
+    )
+    columns = list(arrays.keys())
+    values = {col: arrays[col].tolist() for col in columns[:-1]}
+    values['rot'] = [None if np.isnan(v) else v for v in values['rot']]
+    values['source'] = [arrays['source'] for _ in range(count)]
+    rows = list(zip(*[values[col] for col in columns]))
+
+    with PostgresDBConn(**postgres_test_conn) as dbconn:
+        for month in ('209901', '209902'):
+            dbconn.execute(f'DROP TABLE IF EXISTS ais_{month}_dynamic')
+        dbconn.execute(sql_createtable_dynamic.format('209902'))
+        dbconn.commit()
+
+        dt = datetime.now()
+        cur = dbconn.cursor()
+        cur.executemany(
+            f'INSERT INTO ais_209902_dynamic ({",".join(columns)}) '
+            f'VALUES ({",".join(["%s" for _ in columns])})', rows)
+        dbconn.commit()
+        executemany_time = (datetime.now() - dt).total_seconds()
+
+        dt = datetime.now()
+        inserted = dbconn.bulk_load('209901', arrays)
+        bulk_load_time = (datetime.now() - dt).total_seconds()
+        print(f'executemany: {executemany_time:.2f}s\t'
+              f'bulk_load: {bulk_load_time:.2f}s')
+        assert inserted == count
+
+        # duplicate rows are skipped when merging from a staging table
+        assert dbconn.bulk_load('209901', arrays, staging=True) == 0
+
+        for month in ('209901', '209902'):
+            cur.execute(f'SELECT COUNT(*) AS n, COUNT(rot) AS rot '
+                        f'FROM ais_{month}_dynamic')
+            assert cur.fetchone() == {
+                'n': count,
+                'rot': int(np.sum(~np.isnan(arrays['rot'])))
+            }
+            dbconn.execute(f'DROP TABLE ais_{month}_dynamic')
+        dbconn.commit()
+
+
+def test_bulk_load_staging_decoded_postgres(tmpdir):
+    testingdata_csv = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20210701.csv')
+    columns = [
+        'mmsi', 'time', 'longitude', 'latitude', 'rot', 'sog', 'cog',
+        'heading', 'maneuver', 'utc_second', 'source'
+    ]
+    keys = ['mmsi', 'time', 'longitude', 'latitude', 'sog', 'cog', 'source']
+    with PostgresDBConn(**postgres_test_conn) as dbconn:
+        decode_msgs([testingdata_csv],
+                    dbconn=dbconn,
+                    source='TESTING',
+                    verbose=False)
+        cur = dbconn.cursor()
+
+        # tables created by decode_msgs have no primary key constraint
+        cur.execute('SELECT COUNT(*) AS n FROM pg_constraint '
+                    'WHERE conname = \'ais_202107_dynamic_pkey\'')
+        assert cur.fetchone()['n'] == 0
+        cur.execute('DELETE FROM ais_202107_dynamic '
+                    'WHERE source = \'TESTING_BULK\'')
+        dbconn.commit()
+
+        cur.execute(f'SELECT {",".join(columns)} FROM ais_202107_dynamic')
+        rows = cur.fetchall()
+        cur.execute('SELECT COUNT(*) AS n FROM ais_202107_dynamic')
+        count = cur.fetchone()['n']
+        assert count == len(rows) > 0
+        arrays = {
+            col: np.array([row[col] for row in rows], dtype=object)
+            for col in columns
+        }
+
+        # rows already inserted by decode_msgs are skipped
+        assert dbconn.bulk_load('202107', arrays, staging=True) == 0
+
+        # new rows are inserted once, including duplicates within the batch
+        half = len(rows) // 2
+        arrays['source'][:half] = 'TESTING_BULK'
+        expected = len({(*(row[k] for k in keys[:-1]), 'TESTING_BULK')
+                        for row in rows[:half]})
+        assert dbconn.bulk_load('202107', arrays, staging=True) == expected
+        assert dbconn.bulk_load('202107', arrays, staging=True) == 0
+        cur.execute('SELECT COUNT(*) AS n FROM ais_202107_dynamic')
+        assert cur.fetchone()['n'] == count + expected
+
+        cur.execute('DELETE FROM ais_202107_dynamic '
+                    'WHERE source = \'TESTING_BULK\'')
+        dbconn.commit()
+
+
+def test_rebuild_indexes_parallel_postgres(tmpdir):
+    count = 100000
+    rng = np.random.default_rng(0)
+    months = ['209901', '209902']
+    with PostgresDBConn(**postgres_test_conn) as dbconn:
+        for month in months:
+            dbconn.execute(f'DROP TABLE IF EXISTS ais_{month}_dynamic')
+            dbconn.execute(f'DROP TABLE IF EXISTS ais_{month}_static')
+            dbconn.bulk_load(
+                month,
+                dict(
+                    mmsi=rng.integers(200000000, 800000000, count),
+                    time=(np.arange(count) + 4070908800) % 2**31,
+                    longitude=rng.uniform(-180, 180, count),
+                    latitude=rng.uniform(-90, 90, count),
+                    sog=rng.random(count),
+                    cog=rng.random(count),
+                    source='TESTING',
+                ),
+                verbose=False,
+            )
+            dbconn.execute(sql_createtable_static.format(month))
+        dbconn.commit()
+
+        dt = datetime.now()
+        timings = dbconn.rebuild_indexes_parallel(months,
+                                                  workers=4,
+                                                  maintenance_work_mem='64MB')
+        delta = datetime.now() - dt
+        print(f'parallel index rebuild: {delta.total_seconds():.2f}s')
+        assert len(timings) == 16
+
+        with pytest.raises(ValueError):
+            dbconn.rebuild_indexes_parallel(months,
+                                            concurrently=True,
+                                            cluster=True)
+
+        # tables are not clustered when indexing concurrently
+        timings = dbconn.rebuild_indexes_parallel(months,
+                                                  workers=2,
+                                                  concurrently=True)
+        assert len(timings) == 14
+
+        cur = dbconn.cursor()
+        cur.execute('SELECT COUNT(*) AS n FROM pg_indexes '
+                    'WHERE indexname LIKE \'idx_ais_2099%\'')
+        assert cur.fetchone()['n'] == 14
+        for month in months:
+            dbconn.execute(f'DROP TABLE ais_{month}_dynamic')
+            dbconn.execute(f'DROP TABLE ais_{month}_static')
+        dbconn.commit()
+
+
+def test_deduplicate_dynamic_msgs_incremental_postgres(tmpdir):
+    rng = np.random.default_rng(0)
+
+    def _sample_rows(count):
+        return dict(
+            mmsi=rng.integers(1, 1000, count),
+            time=rng.integers(0, 100000, count),
+            longitude=rng.random(count),
+            latitude=rng.random(count),
+            sog=rng.random(count),
+            cog=rng.random(count),
+            source='TESTING',
+        )
+
+    with PostgresDBConn(**postgres_test_conn) as dbconn:
+        dbconn.execute('DROP TABLE IF EXISTS ais_209901_dynamic')
+        dbconn.bulk_load('209901', _sample_rows(200000), verbose=False)
+        dbconn.deduplicate_dynamic_msgs('209901', incremental=False)
+
+        dbconn.bulk_load('209901', _sample_rows(10000), verbose=False)
+        dt = datetime.now()
+        dbconn.deduplicate_dynamic_msgs('209901')
+        delta = datetime.now() - dt
+        print(f'incremental deduplication: {delta.total_seconds():.2f}s')
+
+        cur = dbconn.cursor()
+        cur.execute('SELECT COUNT(*) AS n, '
+                    'COUNT(DISTINCT (mmsi, time, source)) AS distinct_n '
+                    'FROM ais_209901_dynamic')
+        res = cur.fetchone()
+        assert res['n'] == res['distinct_n']
+        dbconn.execute('DROP TABLE ais_209901_dynamic')
+        dbconn.commit()
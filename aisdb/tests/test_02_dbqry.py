@@ -2,6 +2,7 @@ import os
 import warnings
 from datetime import datetime, timedelta
 
+import pytest
 from shapely.geometry import Polygon
 
 from aisdb import (
@@ -13,7 +14,9 @@ from aisdb import (
     sqlfcn_callbacks,
 )
 from aisdb.database.create_tables import sql_createtable_dynamic
+from aisdb.database.dbqry import _psycopg_placeholders
 from aisdb.database.decoder import decode_msgs
+from aisdb.gis import dt_2_epoch
 from aisdb.tests.create_testing_data import (
     postgres_test_conn,
     sample_database_file,
@@ -22,6 +25,13 @@ from aisdb.tests.create_testing_data import (
 from aisdb.track_gen import TrackGen
 
 
+def _string_callback(*, alias, start, end, **_):
+    ''' callback returning SQL code as a string, without parameters '''
+    return (f'{alias}.time >= {dt_2_epoch(start)} AND '
+            f'{alias}.time <= {dt_2_epoch(end)} AND '
+            f'{alias}.source NOT LIKE \'%?%\'')
+
+
 def test_query_emptytable(tmpdir):
     warnings.filterwarnings('error')
     dbpath = os.path.join(tmpdir, 'test_query_emptytable.db')
@@ -78,6 +88,7 @@ def test_sql_query_strings(tmpdir):
                 sqlfcn_callbacks.in_timerange,
                 sqlfcn_callbacks.in_timerange_hasmmsi,
                 sqlfcn_callbacks.in_timerange_validmmsi,
+                _string_callback,
         ]:
             rowgen = DBQuery(
                 dbconn=aisdatabase,
@@ -91,6 +102,14 @@ def test_sql_query_strings(tmpdir):
             next(rowgen)
 
 
+def test_psycopg_placeholders():
+    sql = ('SELECT * FROM t WHERE a = ? AND b LIKE \'%?\' AND "c?" = ? '
+           '-- d = ?\n AND e = \'it\'\'s ?\'')
+    assert _psycopg_placeholders(sql) == (
+        'SELECT * FROM t WHERE a = %s AND b LIKE \'%%?\' AND "c?" = %s '
+        '-- d = ?\n AND e = \'it\'\'s ?\'')
+
+
 def test_sql_query_strings_postgres(tmpdir):
     testingdata_nm4 = os.path.join(os.path.dirname(__file__), 'testdata',
                                    'test_data_20211101.nm4')
@@ -125,6 +144,7 @@ def test_sql_query_strings_postgres(tmpdir):
                 sqlfcn_callbacks.in_timerange,
                 sqlfcn_callbacks.in_timerange_hasmmsi,
                 sqlfcn_callbacks.in_timerange_validmmsi,
+                _string_callback,
         ]:
             rowgen = DBQuery(
                 dbconn=aisdatabase,
@@ -203,3 +223,302 @@ def test_compare_sqlite_postgres_query_output(tmpdir):
 
     for a, b in zip(tracks1, tracks2):
         assert a == b
+
+
+def test_query_server_side_cursor_postgres(tmpdir):
+    testingdata_csv = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20210701.csv')
+    months = ['202107']
+    start = datetime(int(months[0][0:4]), int(months[0][4:6]), 1)
+    end = start + timedelta(weeks=4)
+
+    with PostgresDBConn(**postgres_test_conn) as aisdatabase:
+        decode_msgs(filepaths=[testingdata_csv],
+                    dbconn=aisdatabase,
+                    source='TESTING',
+                    vacuum=False,
+                    verbose=False,
+                    skip_checksum=True)
+        qry = DBQuery(
+            dbconn=aisdatabase,
+            start=start,
+            end=end,
+            callback=sqlfcn_callbacks.in_timerange_validmmsi,
+        )
+        results = []
+        for itersize in (10**5, 100):
+            dt = datetime.now()
+            rows = list(qry.gen_qry(itersize=itersize))
+            delta = datetime.now() - dt
+            print(f'itersize={itersize}: {delta.total_seconds():.3f}s')
+            results.append([[tuple(r.values()) for r in g] for g in rows])
+        assert results[0] == results[1]
+        assert len(results[0]) > 1
+
+        # server-side cursor is closed with the generator
+        rowgen = qry.gen_qry(itersize=100)
+        next(rowgen)
+        cur = aisdatabase.cursor()
+        cur.execute('SELECT COUNT(*) AS n FROM pg_cursors')
+        assert cur.fetchone()['n'] == 1
+        rowgen.close()
+        cur.execute('SELECT COUNT(*) AS n FROM pg_cursors')
+        assert cur.fetchone()['n'] == 0
+
+
+def test_query_partitioned_postgres(tmpdir):
+    testingdata_nm4 = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20211101.nm4')
+    testingdata_csv = os.path.join(os.path.dirname(__file__), 'testdata',
+                                   'test_data_20210701.csv')
+    start = datetime(2021, 7, 1)
+    end = datetime(2021, 11, 30)
+
+    with PostgresDBConn(**postgres_test_conn) as aisdatabase:
+        decode_msgs(filepaths=[testingdata_csv, testingdata_nm4],
+                    dbconn=aisdatabase,
+                    source='TESTING',
+                    vacuum=False,
+                    verbose=False,
+                    skip_checksum=True)
+
+        # positions reported by more than one source are selected once,
+        # as in the UNION of monthly tables
+        aisdatabase.execute(
+            'INSERT INTO ais_202107_dynamic '
+            '(mmsi, time, longitude, latitude, sog, cog, source) '
+            'SELECT mmsi, time, longitude, latitude, sog, cog, '
+            '\'TESTING_DUPLICATE\' FROM ais_202107_dynamic '
+            'WHERE source = \'TESTING\' LIMIT 100 '
+            'ON CONFLICT DO NOTHING')
+        aisdatabase.commit()
+
+        aisdatabase.migrate_partitioned(verbose=True)
+        assert aisdatabase.partitioned
+
+        # attaching is idempotent
+        aisdatabase.migrate_partitioned(['202107', '202111'], verbose=False)
+
+        cur = aisdatabase.cursor()
+        cur.execute('SELECT COUNT(*) AS n FROM ais_dynamic '
+                    'WHERE time >= %s AND time < %s',
+                    [dt_2_epoch(start), dt_2_epoch(datetime(2021, 8, 1))])
+        count_partitioned = cur.fetchone()['n']
+        cur.execute('SELECT COUNT(*) AS n FROM ais_202107_dynamic')
+        assert cur.fetchone()['n'] == count_partitioned
+
+        for fcn in (sqlfcn.crawl_dynamic, sqlfcn.crawl_dynamic_static):
+            qry = DBQuery(
+                dbconn=aisdatabase,
+                start=start,
+                end=end,
+                callback=sqlfcn_callbacks.in_timerange_validmmsi,
+            )
+            results = []
+            for partitioned in (True, False):
+                aisdatabase.partitioned = partitioned
+                results.append(
+                    sorted((tuple(r.values()) for g in qry.gen_qry(fcn=fcn)
+                            for r in g),
+                           key=str))
+            aisdatabase.partitioned = True
+            assert results[0] == results[1]
+            assert len(results[0]) > 0
+
+
+def test_query_partition_catalog(tmpdir):
+    testdbpath = os.path.join(tmpdir, 'test_query_partition_catalog.db')
+    months = sample_database_file(testdbpath)
+    start = datetime(int(months[0][0:4]), int(months[0][4:6]), 1)
+    end = datetime(int(months[-1][0:4]), int(months[-1][4:6]), 28)
+    z1 = Polygon(zip(*sample_gulfstlawrence_bbox()))
+    domain = Domain('gulf domain', zones=[{'name': 'z1', 'geometry': z1}])
+
+    with DBConn(testdbpath) as aisdatabase:
+        catalog = aisdatabase.partition_catalog
+        assert set(catalog.keys()) == set(months)
+        for month in months:
+            assert catalog[month]['row_count'] > 0
+            assert catalog[month]['mmsi_count'] > 0
+        assert aisdatabase.db_daterange['start'] >= start.date()
+        assert aisdatabase.db_daterange['end'] <= end.date()
+
+        qry = DBQuery(
+            dbconn=aisdatabase,
+            start=start,
+            end=end,
+            **domain.boundary,
+            callback=sqlfcn_callbacks.in_time_bbox_validmmsi,
+        )
+        dt = datetime.now()
+        rows = [[tuple(r) for r in g] for g in qry.gen_qry()]
+        delta = datetime.now() - dt
+        print(f'query with catalog: {delta.total_seconds():.3f}s')
+
+        aisdatabase.partition_catalog = {}
+        dt = datetime.now()
+        rows_nocatalog = [[tuple(r) for r in g] for g in qry.gen_qry()]
+        delta = datetime.now() - dt
+        print(f'query without catalog: {delta.total_seconds():.3f}s')
+        assert rows == rows_nocatalog
+
+        # months without data in the time range are skipped
+        aisdatabase.partition_catalog = catalog
+        qry = DBQuery(
+            dbconn=aisdatabase,
+            start=start + timedelta(days=10),
+            end=start + timedelta(days=20),
+            callback=sqlfcn_callbacks.in_timerange_validmmsi,
+        )
+        assert qry._catalog_months() == []
+        assert list(qry.gen_qry()) == []
+
+        # statistics computed before the end of a month are not used, since
+        # data may have been added to the month since
+        aisdatabase.execute(
+            'UPDATE partition_catalog SET updated_at = ? WHERE month = ?',
+            [dt_2_epoch(start + timedelta(days=1)), months[0]])
+        aisdatabase.commit()
+
+    with DBConn(testdbpath) as aisdatabase:
+        assert set(aisdatabase.partition_catalog.keys()) == set(months[1:])
+        assert aisdatabase.db_daterange['start'] == start.date()
+        qry = DBQuery(
+            dbconn=aisdatabase,
+            start=start + timedelta(days=10),
+            end=start + timedelta(days=20),
+            callback=sqlfcn_callbacks.in_timerange_validmmsi,
+        )
+        assert qry._catalog_months() == [months[0]]
+
+
+def test_query_schema_cache(tmpdir):
+    testdbpath = os.path.join(tmpdir, 'test_query_schema_cache.db')
+    months = sample_database_file(testdbpath)
+    start = datetime(int(months[0][0:4]), int(months[0][4:6]), 1)
+    end = datetime(int(months[-1][0:4]), int(months[-1][4:6]), 28)
+
+    with DBConn(testdbpath) as aisdatabase:
+        assert set(f'ais_{month}_dynamic'
+                   for month in months) <= aisdatabase.table_names()
+        qry = DBQuery(
+            dbconn=aisdatabase,
+            start=start,
+            end=end,
+            callback=sqlfcn_callbacks.in_timerange_validmmsi,
+        )
+        rows = list(qry.gen_qry(fcn=sqlfcn.crawl_dynamic_static))
+
+        # no metadata is queried once table names are cached
+        statements = []
+        aisdatabase.set_trace_callback(statements.append)
+        assert list(qry.gen_qry(fcn=sqlfcn.crawl_dynamic_static)) == rows
+        aisdatabase.set_trace_callback(None)
+        assert not any('sqlite_master' in stmt for stmt in statements)
+        assert not any('aggregate' in stmt.split('WITH')[0]
+                       for stmt in statements)
+
+        # metadata is shared by new connections to the same database
+        with DBConn(testdbpath) as dbconn:
+            assert dbconn._schema() is aisdatabase._schema()
+            assert dbconn.db_daterange == aisdatabase.db_daterange
+
+        # the cache is cleared when tables are created
+        aisdatabase.create_rtree_index(months[:1], verbose=False)
+        assert f'rtree_{months[0]}_dynamic' in aisdatabase.table_names()
+
+        # aggregates are not built while querying unless requested
+        assert aisdatabase.static_aggregate_status(months[0]) == 'current'
+        aisdatabase.execute(
+            f'UPDATE static_aggregate_watermark SET watermark = 0 '
+            f'WHERE month = \'{months[0]}\'')
+        aisdatabase.commit()
+        aisdatabase.invalidate_schema_cache()
+        assert aisdatabase.static_aggregate_status(months[0]) == 'stale'
+        with pytest.warns(UserWarning, match='latest static reports'):
+            list(qry.gen_qry(fcn=sqlfcn.crawl_dynamic_static))
+
+        aisdatabase.execute(f'DROP TABLE static_{months[0]}_aggregate')
+        aisdatabase.commit()
+        aisdatabase.invalidate_schema_cache()
+        assert aisdatabase.static_aggregate_status(months[0]) == 'missing'
+        with pytest.raises(RuntimeError):
+            list(qry.gen_qry(fcn=sqlfcn.crawl_dynamic_static))
+        assert list(
+            qry.gen_qry(fcn=sqlfcn.crawl_dynamic_static,
+                        reaggregate_static=True)) == rows
+        assert aisdatabase.static_aggregate_status(months[0]) == 'current'
+
+
+def test_query_vessel_day_summary(tmpdir):
+    testdbpath = os.path.join(tmpdir, 'test_query_vessel_day_summary.db')
+    months = sample_database_file(testdbpath)
+    start = datetime(int(months[0][0:4]), int(months[0][4:6]), 1)
+    end = datetime(int(months[-1][0:4]), int(months[-1][4:6]), 28)
+    z1 = Polygon(zip(*sample_gulfstlawrence_bbox()))
+    domain = Domain('gulf domain', zones=[{'name': 'z1', 'geometry': z1}])
+
+    with DBConn(testdbpath) as aisdatabase:
+        aisdatabase.update_vessel_day_summary(months)
+        results = []
+        for callback in (
+                sqlfcn_callbacks.in_time_bbox_validmmsi,
+                sqlfcn_callbacks.in_time_bbox_validmmsi_summary,
+        ):
+            qry = DBQuery(
+                dbconn=aisdatabase,
+                start=start,
+                end=end,
+                **domain.boundary,
+                callback=callback,
+            )
+            dt = datetime.now()
+            rows = qry.gen_qry(fcn=sqlfcn.crawl_dynamic_static)
+            results.append([[tuple(r) for r in g] for g in rows])
+            delta = datetime.now() - dt
+            print(f'{callback.__name__}: {delta.total_seconds():.3f}s')
+        assert results[0] == results[1]
+        assert len(results[0]) > 1
+
+
+def test_query_rtree_index(tmpdir):
+    testdbpath = os.path.join(tmpdir, 'test_query_rtree_index.db')
+    months = sample_database_file(testdbpath)
+    start = datetime(int(months[0][0:4]), int(months[0][4:6]), 1)
+    end = datetime(int(months[-1][0:4]), int(months[-1][4:6]), 28)
+    z1 = Polygon(zip(*sample_gulfstlawrence_bbox()))
+    domain = Domain('gulf domain', zones=[{'name': 'z1', 'geometry': z1}])
+
+    with DBConn(testdbpath) as aisdatabase:
+        qry = DBQuery(
+            dbconn=aisdatabase,
+            start=start,
+            end=end,
+            **domain.boundary,
+            callback=sqlfcn_callbacks.in_time_bbox_validmmsi,
+        )
+        results = []
+        for rtree in (False, True):
+            if rtree:
+                aisdatabase.create_rtree_index(months)
+                assert aisdatabase.rtree_months() == months
+                assert qry._rtree_months(months) != []
+            dt = datetime.now()
+            rows = [[tuple(r) for r in g] for g in qry.gen_qry()]
+            delta = datetime.now() - dt
+            print(f'rtree={rtree}: {delta.total_seconds():.3f}s')
+            results.append(rows)
+        assert results[0] == results[1]
+        assert len(results[0]) > 1
+
+        # rows inserted after creating the index are added by a trigger
+        count = aisdatabase.execute(
+            f'SELECT COUNT(*) FROM rtree_{months[0]}_dynamic').fetchone()[0]
+        aisdatabase.execute(
+            f'INSERT INTO ais_{months[0]}_dynamic '
+            '(mmsi, time, longitude, latitude, source) '
+            'VALUES (316000000, ?, -63, 47, "TESTING")',
+            [int((start - datetime(1970, 1, 1)).total_seconds())])
+        assert aisdatabase.execute(
+            f'SELECT COUNT(*) FROM rtree_{months[0]}_dynamic').fetchone(
+            )[0] == count + 1
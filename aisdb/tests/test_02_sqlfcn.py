@@ -69,6 +69,7 @@ def test_callbacks(tmpdir):
             sqlfcn_callbacks.in_time_bbox_hasmmsi,
             sqlfcn_callbacks.in_time_bbox_inmmsi,
             sqlfcn_callbacks.in_time_bbox_validmmsi,
+            sqlfcn_callbacks.in_time_bbox_validmmsi_summary,
             sqlfcn_callbacks.in_time_mmsi,
             sqlfcn_callbacks.in_timerange,
             sqlfcn_callbacks.in_timerange_hasmmsi,
@@ -92,3 +93,52 @@ def test_callbacks(tmpdir):
                                           mmsis=[316000000],
                                           **kwargs)
         print(txt)
+
+
+def test_crawl_partitioned():
+    months = ['202105', '202106', '202108']
+    callback = sqlfcn_callbacks.in_time_bbox_validmmsi
+    txt, _ = sqlfcn.crawl_dynamic(months=months,
+                                  callback=callback,
+                                  partitioned=True,
+                                  **kwargs)
+    print(txt)
+    assert 'UNION' not in txt
+    assert 'FROM ais_dynamic AS d' in txt
+    # duplicate rows are removed, as in the UNION of monthly tables
+    assert 'SELECT DISTINCT' in txt
+    # consecutive months are merged into a single time range
+    assert txt.count('d.time < ') == 2
+
+    txt, _ = sqlfcn.crawl_dynamic_static(months=months,
+                                         callback=callback,
+                                         partitioned=True,
+                                         **kwargs)
+    print(txt)
+    assert txt.count('FROM ais_dynamic AS d') == 1
+    assert 'SELECT DISTINCT\n    dynamic_all.mmsi' in txt
+    assert txt.count('static_202106_aggregate') == 1
+
+
+def test_crawl_params():
+    months = ['202105', '202106']
+    callback = sqlfcn_callbacks.in_time_bbox_inmmsi
+    sizes = []
+    for mmsis in ([316000000], list(range(316000000, 316005000))):
+        for fcn in (sqlfcn.crawl_dynamic, sqlfcn.crawl_dynamic_static):
+            txt, params = fcn(months=months,
+                              callback=callback,
+                              mmsis=mmsis,
+                              **kwargs)
+            assert txt.count('?') == len(params)
+            assert str(mmsis[-1]) not in txt
+            sizes.append(len(txt))
+    # query code does not depend on the number of vessels
+    assert sizes[:2] == sizes[2:]
+
+    # callbacks returning SQL code without parameters are supported
+    txt, params = sqlfcn.crawl_dynamic(
+        months=months,
+        callback=lambda alias, **_: f'{alias}.mmsi = 316000000',
+        **kwargs)
+    assert params == []
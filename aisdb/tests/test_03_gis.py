@@ -1,14 +1,21 @@
 import os
+from datetime import datetime
 
-from shapely.geometry import Polygon
+from shapely.geometry import Point, Polygon
 import numpy as np
 import zipfile
 
+from aisdb.aisdb import haversine
 from aisdb.gis import (
     Domain,
     DomainFromPoints,
     DomainFromTxts,
+    bearing_array,
+    delta_knots,
+    delta_meters,
     distance3D,
+    haversine_array,
+    mask_in_radius_2D,
     shiftcoord,
 )
 from aisdb.tests.create_testing_data import random_polygons_domain
@@ -103,3 +110,136 @@ def test_distance3D():
     x2, y2 = -40, 50
     depth_metres = -500
     dist = distance3D(x1, y1, x2, y2, depth_metres)
+
+
+def _random_track(n):
+    rng = np.random.default_rng(0)
+    return dict(
+        mmsi=316000000,
+        time=np.cumsum(rng.integers(0, 600, n)).astype(np.uint32),
+        lon=(rng.random(n) * 20 - 70).astype(np.float32),
+        lat=(rng.random(n) * 10 + 40).astype(np.float32),
+        static={'mmsi'},
+        dynamic={'time', 'lon', 'lat'},
+    )
+
+
+def test_haversine_array():
+    track = _random_track(1000)
+    x, y = track['lon'], track['lat']
+    expected = np.array(list(map(haversine, x[:-1], y[:-1], x[1:], y[1:])))
+    result = haversine_array(x[:-1], y[:-1], x[1:], y[1:])
+    assert result.dtype == np.float64
+    assert np.allclose(result, expected, rtol=1e-6)
+    assert np.allclose(haversine_array(-63, 44, x, y),
+                       [haversine(-63, 44, xi, yi) for xi, yi in zip(x, y)],
+                       rtol=1e-6)
+
+
+def test_bearing_array():
+    bearings = bearing_array([0, 0, 0, 0], [0, 0, 0, 0], [0, 1, 0, -1],
+                             [1, 0, -1, 0])
+    assert np.allclose(bearings, [0, 90, 180, 270])
+
+
+def test_delta_knots_dtype():
+    track = _random_track(100)
+    assert delta_meters(track).dtype == np.float64
+    assert delta_knots(track).dtype == np.float64
+    assert len(delta_knots(track)) == 99
+
+
+def test_mask_in_radius_2D():
+    track = _random_track(1000)
+    xy = (-60, 45)
+    result = next(mask_in_radius_2D([track], xy, distance_meters=500000))
+    expected = [
+        haversine(x, y, *xy) < 500000
+        for x, y in zip(track['lon'], track['lat'])
+    ]
+    assert len(result['time']) == sum(expected) > 0
+    assert np.array_equal(result['lon'], track['lon'][expected])
+
+
+def test_delta_meters_benchmark():
+    track = _random_track(10**6)
+    x, y = track['lon'], track['lat']
+
+    dt = datetime.now()
+    expected = np.array(list(map(haversine, x[:-1], y[:-1], x[1:], y[1:])))
+    delta_scalar = datetime.now() - dt
+
+    dt = datetime.now()
+    result = delta_meters(track)
+    delta_array = datetime.now() - dt
+
+    assert np.allclose(result, expected, rtol=1e-6)
+    print(f'{len(x)} positions\n'
+          f'scalar haversine: {delta_scalar.total_seconds():.2f}s\n'
+          f'haversine_array: {delta_array.total_seconds():.3f}s')
+
+
+def _point_in_polygon_scalar(domain, x, y):
+    ''' per-point zone lookup, prior to Domain.zones_for_points '''
+    nearest = sorted(domain.nearest_polygons_to_point(x, y).items(),
+                     key=lambda item: item[1])
+    for key, value in nearest:
+        if value < 0 and domain.zones[key]['geometry'].contains(Point(x, y)):
+            return key
+    return 'Z0'
+
+
+def test_zones_for_points():
+    lon, lat = sample_gulfstlawrence_bbox()
+    z1 = Polygon(zip(lon, lat))
+    z2 = Polygon(zip(lon + 5, lat + 2))
+    z3 = Polygon(zip(lon, lat - 45))
+    domain = Domain('overlapping domain',
+                    zones=[
+                        {
+                            'name': 'z1',
+                            'geometry': z1
+                        },
+                        {
+                            'name': 'z2',
+                            'geometry': z2
+                        },
+                        {
+                            'name': 'z3',
+                            'geometry': z3
+                        },
+                    ])
+    rng = np.random.default_rng(0)
+    x = rng.random(5000) * 40 - 80
+    y = rng.random(5000) * 70 - 10
+    codes = domain.zones_for_points(x, y, chunksize=1000)
+    assert codes.dtype == np.uint16
+    result = domain.zone_names[codes]
+    expected = [_point_in_polygon_scalar(domain, xi, yi) for xi, yi in zip(x, y)]
+    assert list(result) == expected
+    assert len(set(expected)) == 4
+    assert domain.point_in_polygon(z1.centroid.x, z1.centroid.y) == 'z1'
+
+
+def test_zones_for_points_benchmark():
+    domain = random_polygons_domain(count=500)
+    rng = np.random.default_rng(0)
+    x = rng.random(10**5) * 360 - 180
+    y = rng.random(10**5) * 180 - 90
+
+    dt = datetime.now()
+    expected = [
+        _point_in_polygon_scalar(domain, xi, yi)
+        for xi, yi in zip(x[:10**4], y[:10**4])
+    ]
+    delta_scalar = (datetime.now() - dt) * 10
+
+    dt = datetime.now()
+    codes = domain.zones_for_points(x, y)
+    delta_index = datetime.now() - dt
+
+    assert list(domain.zone_names[codes[:10**4]]) == expected
+    print(f'{len(x)} positions, {len(domain.zones)} zones\n'
+          f'point_in_polygon (estimated): '
+          f'{delta_scalar.total_seconds():.2f}s\n'
+          f'zones_for_points: {delta_index.total_seconds():.2f}s')
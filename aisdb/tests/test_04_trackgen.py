@@ -3,7 +3,7 @@ from datetime import datetime, timedelta
 
 import numpy as np
 
-from aisdb import track_gen, sqlfcn_callbacks
+from aisdb import track_gen, sqlfcn, sqlfcn_callbacks
 from aisdb.gis import vesseltrack_3D_dist, mask_in_radius_2D
 from aisdb.database.dbconn import DBConn
 from aisdb.database.dbqry import DBQuery
@@ -37,6 +37,76 @@ def test_TrackGen(tmpdir):
             assert isinstance(track['time'], np.ndarray)
 
 
+def test_TrackGen_columnar(tmpdir):
+    dbpath = os.path.join(tmpdir, 'test_trackgen_columnar.db')
+    months = sample_database_file(dbpath)
+    start = datetime(int(months[0][0:4]), int(months[0][4:6]), 1)
+    end = start + timedelta(weeks=4)
+
+    with DBConn(dbpath) as dbconn:
+        qry = DBQuery(
+            dbconn=dbconn,
+            start=start,
+            end=end,
+            callback=sqlfcn_callbacks.in_timerange_validmmsi,
+        )
+        results = []
+        for columnar in (False, True):
+            dt = datetime.now()
+            rowgen = qry.gen_qry(fcn=sqlfcn.crawl_dynamic_static,
+                                 columnar=columnar)
+            results.append(list(track_gen.TrackGen(rowgen, decimate=False)))
+            delta = datetime.now() - dt
+            print(f'columnar={columnar}: {delta.total_seconds():.3f}s')
+
+    assert len(results[0]) == len(results[1]) > 0
+    for rows_track, columnar_track in zip(*results):
+        assert rows_track.keys() == columnar_track.keys()
+        for key in rows_track['static']:
+            assert rows_track[key] == columnar_track[key]
+        for key in rows_track['dynamic']:
+            assert rows_track[key].dtype == columnar_track[key].dtype
+            assert np.array_equal(rows_track[key],
+                                  columnar_track[key],
+                                  equal_nan=True)
+
+
+def test_TrackGen_parallel(tmpdir):
+    dbpath = os.path.join(tmpdir, 'test_trackgen_parallel.db')
+    months = sample_database_file(dbpath)
+    start = datetime(int(months[0][0:4]), int(months[0][4:6]), 1)
+    end = datetime(int(months[-1][0:4]), int(months[-1][4:6]), 1)
+    end += timedelta(weeks=4)
+
+    with DBConn(dbpath) as dbconn:
+        qry = DBQuery(
+            dbconn=dbconn,
+            start=start,
+            end=end,
+            callback=sqlfcn_callbacks.in_timerange_validmmsi,
+        )
+        for columnar in (False, True):
+            results = []
+            for parallel in (False, True):
+                dt = datetime.now()
+                rowgen = qry.gen_qry(fcn=sqlfcn.crawl_dynamic_static,
+                                     columnar=columnar,
+                                     parallel=parallel)
+                results.append(list(track_gen.TrackGen(rowgen,
+                                                       decimate=False)))
+                delta = datetime.now() - dt
+                print(f'columnar={columnar} parallel={parallel}: '
+                      f'{delta.total_seconds():.3f}s')
+
+            assert len(results[0]) == len(results[1]) > 0
+            for seq_track, par_track in zip(*results):
+                assert seq_track['mmsi'] == par_track['mmsi']
+                for key in seq_track['dynamic']:
+                    assert np.array_equal(seq_track[key],
+                                          par_track[key],
+                                          equal_nan=True)
+
+
 def test_min_speed_filter(tmpdir):
     dbpath = os.path.join(tmpdir, 'test_trackgen_min_speed_filter_encode.db')
     months = sample_database_file(dbpath)
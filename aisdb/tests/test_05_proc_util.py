@@ -117,6 +117,23 @@ def test_getfiledate():
                      'test_data_20210701.csv'))
 
 
+def test_getfiledate_data_without_timestamp(tmpdir):
+    # appended data may not contain a timestamp tag in the leading bytes
+    data = b'!AIVDM,1,1,,A,13aEOK?P00PD2wVMdLDRhgvL289?,0*26\r\n'
+    fpath = os.path.join(tmpdir, 'test_getfiledate_tail.nm4')
+    with open(fpath, 'wb') as f:
+        f.write(data)
+    os.utime(fpath, (1635724800, 1635724800))
+    expected = datetime.fromtimestamp(1635724800).date()
+    assert aisdb.proc_util.getfiledate(fpath, data) == expected
+
+    csvpath = os.path.join(tmpdir, 'test_getfiledate_tail.csv')
+    with open(csvpath, 'wb') as f:
+        f.write(b'MMSI,Time\n')
+    os.utime(csvpath, (1635724800, 1635724800))
+    assert aisdb.proc_util.getfiledate(csvpath, b'MMSI,Time\n') == expected
+
+
 def test_binarysearch():
     arr = np.array([1, 2, 3])
     arr_desc = arr[::-1]
@@ -112,6 +112,44 @@ def test_graph_minimal(tmpdir):
     os.remove(testdbpath)
 
 
+def test_graph_parallel(tmpdir):
+    domain = Domain('gulf domain', zones=[{'name': 'z1', 'geometry': z1}])
+    testdbpath = os.path.join(tmpdir, 'test_graph_parallel.db')
+    months = sample_database_file(testdbpath)
+    start = datetime(int(months[0][0:4]), int(months[0][4:6]), 1)
+    end = start + timedelta(weeks=1)
+
+    results = []
+    with DBConn(testdbpath) as aisdatabase:
+        qry = DBQuery(
+            dbconn=aisdatabase,
+            start=start,
+            end=end,
+            callback=sqlfcn_callbacks.in_bbox,
+            fcn=sqlfcn.crawl_dynamic_static,
+            **domain.boundary,
+        )
+        for processes in (1, 2):
+            outputfile = os.path.join(tmpdir, f'output_{processes}.csv')
+            graph(
+                qry,
+                outputfile=outputfile,
+                data_dir=data_dir,
+                dbconn=aisdatabase,
+                domain=domain,
+                trafficDBpath=trafficDBpath,
+                processes=processes,
+            )
+            if not os.path.isfile(outputfile):
+                warnings.warn("no output file generated for test graph")
+                return
+            with open(outputfile, 'r') as f:
+                results.append(f.readlines())
+
+    # edges of each vessel are written in the same order by every process
+    assert results[0] == results[1]
+
+
 '''
     import tempfile
     import cProfile
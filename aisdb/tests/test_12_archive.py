@@ -0,0 +1,57 @@
+import os
+from datetime import datetime, timedelta
+
+from aisdb import (
+    DBConn,
+    DBQuery,
+    MonthArchive,
+    TrackGen,
+    export_month_archive,
+    sqlfcn,
+    sqlfcn_callbacks,
+)
+from aisdb.tests.create_testing_data import sample_database_file
+
+
+def test_export_month_archive(tmpdir):
+    testdbpath = os.path.join(tmpdir, 'test_export_month_archive.db')
+    months = sample_database_file(testdbpath)
+    month = months[0]
+    start = datetime(int(month[:4]), int(month[4:]), 1)
+    end = start + timedelta(days=31) - timedelta(seconds=1)
+
+    with DBConn(testdbpath) as aisdatabase:
+        path = export_month_archive(aisdatabase, month, tmpdir, verbose=True)
+        qry = DBQuery(
+            dbconn=aisdatabase,
+            start=start,
+            end=end,
+            callback=sqlfcn_callbacks.in_timerange,
+        )
+        tracks_db = list(
+            TrackGen(qry.gen_qry(fcn=sqlfcn.crawl_dynamic_static,
+                                 columnar=True),
+                     decimate=False))
+
+    archive = MonthArchive(path)
+    assert archive.month == month
+    assert len(archive) == sum(len(t['time']) for t in tracks_db)
+    assert list(archive.mmsis) == sorted(archive.mmsis)
+
+    tracks_archive = list(TrackGen(archive.gen_qry(), decimate=False))
+    assert len(tracks_archive) == len(tracks_db)
+    for a, b in zip(tracks_archive, tracks_db):
+        assert a['mmsi'] == b['mmsi']
+        assert a['static'] == b['static']
+        # rows having the same time may be returned in any order
+        assert sorted(zip(a['time'], a['lon'], a['lat'])) == sorted(
+            zip(b['time'], b['lon'], b['lat']))
+
+    # vessel and time range selection
+    mmsi = int(archive.mmsis[0])
+    rows = list(archive.gen_qry(mmsis=[mmsi, 1]))
+    assert len(rows) == 1 and rows[0]['mmsi'][0] == mmsi
+    t0 = datetime.utcfromtimestamp(int(rows[0]['time'][-1]))
+    rows = list(archive.gen_qry(start=t0, mmsis=[mmsi]))
+    assert len(rows[0]['time']) >= 1
+    assert rows[0]['time'][0] == rows[0]['time'][-1]
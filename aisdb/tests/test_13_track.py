@@ -0,0 +1,137 @@
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+import json
+import pickle
+
+import numpy as np
+
+from aisdb.track import Track
+from aisdb.track_gen import split_timedelta
+
+
+def _short_track(n=8, mmsi=316000000):
+    return Track.from_columns(
+        {
+            'mmsi': mmsi,
+            'vessel_name': 'TEST',
+            'ship_type': 70
+        },
+        {
+            'time': np.arange(n, dtype=np.uint32) * 600,
+            'lon': np.linspace(-63, -62, n, dtype=np.float32),
+            'lat': np.linspace(44, 45, n, dtype=np.float32),
+            'sog': np.full(n, 10, dtype=np.float32),
+            'cog': np.full(n, 90, dtype=np.uint32),
+        },
+    )
+
+
+def test_track_slice():
+    track = _short_track()
+    assert isinstance(track, Mapping)
+    assert not hasattr(track, '__dict__')
+    assert track.time is track['time']
+    assert 'cog' in track and 'heading' not in track
+    assert track['static'] == {'mmsi', 'vessel_name', 'ship_type'}
+    assert track['dynamic'] == {'time', 'lon', 'lat', 'sog', 'cog'}
+
+    segment = track.slice(range(2, 5))
+    assert isinstance(segment, Track)
+    assert segment['mmsi'] == track['mmsi']
+    assert segment['static'] is track['static']
+    assert segment['dynamic'] is track['dynamic']
+    for key in track['dynamic']:
+        assert np.shares_memory(segment[key], track[key])
+        assert np.array_equal(segment[key], track[key][2:5])
+
+    mask = track['time'] >= 1800
+    masked = track.slice(mask)
+    assert masked.keys() == track.keys()
+    assert np.array_equal(masked['lon'], track['lon'][mask])
+
+    # updating a segment does not change the original track
+    segment['label'] = 1
+    segment['static'] = set(segment['static']).union({'label'})
+    assert 'label' not in track.keys()
+    assert 'label' not in track['static']
+    assert isinstance(segment.copy(), Track)
+    del segment['label']
+    assert segment.keys() == track.keys()
+
+
+def test_track_dict_compatible():
+    track = _short_track()
+    assert isinstance(track, dict)
+    assert {**track} == dict(track) == track
+    assert type(track.copy()) is Track
+
+    # column vectors and key sets are encoded as lists
+    encoded = json.loads(
+        json.dumps(track,
+                   default=lambda v: sorted(v)
+                   if isinstance(v, set) else v.tolist()))
+    assert encoded['mmsi'] == track['mmsi']
+    assert encoded['lon'] == track['lon'].tolist()
+    assert set(encoded['dynamic']) == track['dynamic']
+
+    # fields are updated by dict methods
+    track.update(mmsi=316000001)
+    assert track.mmsi == 316000001
+    track |= {'sog': track['sog'] * 2}
+    assert track.sog is track['sog']
+    track.setdefault('cog', None)
+    assert track.pop('cog') is not None
+    assert not hasattr(track, 'cog') and 'cog' not in track
+    track.time = track['time'] + 1
+    assert track['time'][0] == 1
+
+
+def test_track_pickle():
+    track = _short_track()
+    restored = pickle.loads(pickle.dumps(track))
+    assert isinstance(restored, Track)
+    assert restored.keys() == track.keys()
+    assert np.array_equal(restored['time'], track['time'])
+
+
+def test_split_timedelta_dict():
+    track = dict(_short_track())
+    track['time'][4:] += 86400
+    segments = list(split_timedelta([track], maxdelta=timedelta(hours=1)))
+    assert [len(s['time']) for s in segments] == [4, 4]
+    assert all(isinstance(s, Track) for s in segments)
+
+
+def _dict_slice(track, rng):
+    ''' track segmentation prior to aisdb.track.Track '''
+    return dict(
+        **{k: track[k]
+           for k in track['static']},
+        **{k: track[k][rng]
+           for k in track['dynamic']},
+        static=track['static'],
+        dynamic=track['dynamic'],
+    )
+
+
+def test_track_slice_benchmark():
+    tracks = [_short_track(n=8, mmsi=316000000 + i) for i in range(20000)]
+
+    dt = datetime.now()
+    for track in tracks:
+        for i in range(0, 8, 2):
+            _dict_slice(track, np.arange(i, i + 2))
+    delta_dict = datetime.now() - dt
+
+    dt = datetime.now()
+    for track in tracks:
+        for i in range(0, 8, 2):
+            track.slice(range(i, i + 2))
+    delta_track = datetime.now() - dt
+
+    segments = len(tracks) * 4
+    print(f'split {len(tracks)} tracks into {segments} segments\n'
+          f'dict rebuild: '
+          f'{delta_dict.total_seconds() / segments * 1e6:.2f}us/segment\n'
+          f'Track.slice: '
+          f'{delta_track.total_seconds() / segments * 1e6:.2f}us/segment')
@@ -0,0 +1,148 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+from shapely.geometry import Polygon
+
+from aisdb import track_gen, sqlfcn, sqlfcn_callbacks
+from aisdb.database.dbconn import DBConn
+from aisdb.database.dbqry import DBQuery
+from aisdb.gis import Domain, delta_knots
+from aisdb.interp import interp_time
+from aisdb.track import Track
+from aisdb.track_batch import (
+    TrackBatch,
+    batch_tracks,
+    delta_knots_batch,
+    fence_tracks_batch,
+    interp_time_batch,
+    min_speed_filter_batch,
+    split_timedelta_batch,
+    unbatch_tracks,
+)
+from aisdb.tests.create_testing_data import (
+    sample_database_file,
+    sample_gulfstlawrence_bbox,
+)
+
+
+def _sample_tracks(tmpdir, name):
+    dbpath = os.path.join(tmpdir, f'{name}.db')
+    months = sample_database_file(dbpath)
+    start = datetime(int(months[0][0:4]), int(months[0][4:6]), 1)
+    end = start + timedelta(weeks=4)
+    with DBConn(dbpath) as dbconn:
+        qry = DBQuery(
+            dbconn=dbconn,
+            start=start,
+            end=end,
+            callback=sqlfcn_callbacks.in_timerange_validmmsi,
+        )
+        rowgen = qry.gen_qry(fcn=sqlfcn.crawl_dynamic_static)
+        return list(track_gen.TrackGen(rowgen, decimate=False))
+
+
+def _assert_tracks_equal(tracks, batched):
+    assert len(tracks) == len(batched) > 0
+    for track, batch_track in zip(tracks, batched):
+        assert isinstance(batch_track, Track)
+        for key in track['static']:
+            assert track[key] == batch_track[key]
+        for key in track['dynamic']:
+            assert np.allclose(np.asarray(track[key], dtype=float),
+                               np.asarray(batch_track[key], dtype=float),
+                               equal_nan=True), key
+
+
+def test_batch_tracks(tmpdir):
+    tracks = _sample_tracks(tmpdir, 'test_batch_tracks')
+    batches = list(batch_tracks(tracks, batchsize=10))
+    assert sum(len(b) for b in batches) == len(tracks)
+    assert all(isinstance(b, TrackBatch) for b in batches)
+    _assert_tracks_equal(tracks, list(unbatch_tracks(batches)))
+
+
+def test_split_timedelta_batch(tmpdir):
+    tracks = _sample_tracks(tmpdir, 'test_split_timedelta_batch')
+    maxdelta = timedelta(hours=1)
+    expected = list(track_gen.split_timedelta(tracks, maxdelta))
+    batched = unbatch_tracks(
+        split_timedelta_batch(b, maxdelta) for b in batch_tracks(tracks))
+    _assert_tracks_equal(expected, list(batched))
+
+
+def test_delta_knots_batch(tmpdir):
+    tracks = _sample_tracks(tmpdir, 'test_delta_knots_batch')
+    batch = TrackBatch.from_tracks(tracks)
+    knots = delta_knots_batch(batch)
+    for i, track in enumerate(tracks):
+        lo, hi = batch.offsets[i], batch.offsets[i + 1]
+        assert np.isnan(knots[hi - 1])
+        assert np.allclose(knots[lo:hi - 1],
+                           delta_knots(track).astype(float),
+                           rtol=1e-6)
+
+
+def test_min_speed_filter_batch(tmpdir):
+    tracks = _sample_tracks(tmpdir, 'test_min_speed_filter_batch')
+    expected = [
+        t for t in track_gen.min_speed_filter(tracks, minspeed=1)
+        if len(t['time']) > 0
+    ]
+    batch = min_speed_filter_batch(TrackBatch.from_tracks(tracks), 1)
+    _assert_tracks_equal(expected, list(batch.tracks()))
+
+
+def test_interp_time_batch(tmpdir):
+    tracks = _sample_tracks(tmpdir, 'test_interp_time_batch')
+    step = timedelta(minutes=10)
+    expected = list(interp_time(tracks, step=step))
+    batch = interp_time_batch(TrackBatch.from_tracks(tracks), step=step)
+    _assert_tracks_equal(expected, list(batch.tracks()))
+
+
+def test_fence_tracks_batch(tmpdir):
+    tracks = _sample_tracks(tmpdir, 'test_fence_tracks_batch')
+    z1 = Polygon(zip(*sample_gulfstlawrence_bbox()))
+    domain = Domain('gulf domain', zones=[{'name': 'z1', 'geometry': z1}])
+    expected = list(track_gen.fence_tracks(map(Track, tracks), domain))
+    batch = fence_tracks_batch(TrackBatch.from_tracks(tracks), domain)
+    assert len(expected) == len(batch)
+    for track, batch_track in zip(expected, batch.tracks()):
+        assert np.issubdtype(batch_track['in_zone'].dtype, np.unsignedinteger)
+        assert list(track['in_zone']) == list(batch_track['in_zone'])
+        assert set(domain.zone_names[batch_track['in_zone']]) <= {'Z0', 'z1'}
+
+
+def test_track_batch_benchmark():
+    n, length = 20000, 8
+    tracks = [
+        Track.from_columns(
+            {'mmsi': 316000000 + i},
+            {
+                'time': np.arange(length, dtype=np.uint32) * 600 + i,
+                'lon': np.linspace(-63, -62, length, dtype=np.float32),
+                'lat': np.linspace(44, 45, length, dtype=np.float32),
+                'sog': np.full(length, 10, dtype=np.float32),
+            },
+        ) for i in range(n)
+    ]
+
+    dt = datetime.now()
+    tracks_split = track_gen.split_timedelta(tracks, timedelta(minutes=30))
+    tracks_filtered = track_gen.min_speed_filter(tracks_split, minspeed=1)
+    count_tracks = sum(1 for _ in interp_time(tracks_filtered))
+    delta_tracks = datetime.now() - dt
+
+    dt = datetime.now()
+    count_batch = 0
+    for batch in batch_tracks(tracks):
+        batch = split_timedelta_batch(batch, timedelta(minutes=30))
+        batch = min_speed_filter_batch(batch, minspeed=1)
+        count_batch += len(interp_time_batch(batch))
+    delta_batch = datetime.now() - dt
+
+    assert count_tracks == count_batch
+    print(f'processed {n} tracks of {length} positions\n'
+          f'per-track stages: {delta_tracks.total_seconds():.2f}s\n'
+          f'batched stages: {delta_batch.total_seconds():.2f}s')
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+from functools import partial
+import os
+
+import numpy as np
+import pytest
+
+from aisdb.interp import interp_time
+from aisdb.pipeline import _chunks, run_pipeline
+from aisdb.track import Track
+from aisdb.track_gen import split_timedelta
+
+
+def _sample_tracks(n=500, length=20):
+    for i in range(n):
+        time = np.arange(length, dtype=np.uint32) * 600 + 1625097600
+        time[length // 2:] += 86400
+        yield Track.from_columns(
+            {
+                'mmsi': 316000000 + i,
+                'vessel_name': f'TEST {i}',
+                'marinetraffic_info': {
+                    'summer_dwt': i
+                },
+            },
+            {
+                'time': time,
+                'lon': np.linspace(-63, -62, length, dtype=np.float32),
+                'lat': np.linspace(44, 45, length, dtype=np.float32),
+                'sog': np.full(length, 10, dtype=np.float32),
+            },
+        )
+
+
+_stages = [
+    partial(split_timedelta, maxdelta=timedelta(hours=6)),
+    partial(interp_time, step=timedelta(minutes=5)),
+]
+
+
+def _failing_stage(tracks):
+    for track in tracks:
+        if track['mmsi'] == 316000100:
+            raise ValueError('testing error')
+        yield track
+
+
+def _assert_tracks_equal(expected, result):
+    assert len(expected) == len(result) > 0
+    for track, res in zip(expected, result):
+        assert isinstance(res, Track)
+        assert track.keys() == res.keys()
+        for key in track['static']:
+            assert track[key] == res[key]
+        for key in track['dynamic']:
+            assert track[key].dtype == res[key].dtype
+            assert np.array_equal(track[key], res[key])
+
+
+def test_run_pipeline_ordered():
+    expected = list(run_pipeline(_sample_tracks(), _stages, processes=1))
+    result = list(
+        run_pipeline(_sample_tracks(),
+                     _stages,
+                     processes=2,
+                     chunksize=16,
+                     max_pending=2))
+    _assert_tracks_equal(expected, result)
+
+
+def test_run_pipeline_unordered():
+    key = lambda t: (t['mmsi'], t['time'][0])
+    expected = sorted(run_pipeline(_sample_tracks(), _stages, processes=1),
+                      key=key)
+    result = sorted(run_pipeline(_sample_tracks(),
+                                 _stages,
+                                 processes=2,
+                                 chunksize=16,
+                                 ordered=False),
+                    key=key)
+    _assert_tracks_equal(expected, result)
+
+
+def _shm_blocks():
+    ''' names of shared memory blocks created by run_pipeline() '''
+    if not os.path.isdir('/dev/shm'):  # pragma: no cover
+        return set()
+    return {name for name in os.listdir('/dev/shm') if name[:5] == 'aisdb'}
+
+
+def test_run_pipeline_error():
+    blocks = _shm_blocks()
+    with pytest.raises(ValueError):
+        for _ in run_pipeline(_sample_tracks(), [_failing_stage],
+                              processes=2,
+                              chunksize=16):
+            pass
+    # blocks created by workers that were terminated are removed
+    assert _shm_blocks() == blocks
+
+
+def test_run_pipeline_closed():
+    blocks = _shm_blocks()
+    results = run_pipeline(_sample_tracks(),
+                           _stages,
+                           processes=2,
+                           chunksize=16,
+                           ordered=False)
+    next(results)
+    results.close()
+    assert _shm_blocks() == blocks
+
+
+def test_chunks_without_mmsi():
+    items = [None, {'time': np.arange(3)}] * 10
+    chunks = list(_chunks(iter(items), 4))
+    assert [len(chunk) for chunk in chunks] == [4] * 5
+    tracks = [{'mmsi': 316000000}] * 6 + [{'mmsi': 316000001}] * 2
+    assert [len(chunk) for chunk in _chunks(iter(tracks), 4)] == [6, 2]
+
+
+def test_run_pipeline_benchmark():
+    tracks = list(_sample_tracks(n=5000, length=100))
+    for processes in (1, 2, 4):
+        dt = datetime.now()
+        count = sum(1 for _ in run_pipeline(
+            iter(tracks), _stages, processes=processes, chunksize=100))
+        delta = datetime.now() - dt
+        print(f'processes={processes}: {count} tracks in '
+              f'{delta.total_seconds():.2f}s')
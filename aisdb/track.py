@@ -0,0 +1,180 @@
+''' compact container for vessel trajectory column vectors '''
+
+from collections.abc import Mapping
+
+import numpy as np
+
+# keys which are also stored in a fixed field of each track, and can be
+# read as attributes
+_fields = ('mmsi', 'time', 'lon', 'lat', 'sog', 'cog', 'static', 'dynamic')
+_field_keys = frozenset(_fields)
+
+
+class Track(dict):
+    ''' vessel trajectory, stored as static values and a set of dynamic
+        column vectors of equal length.
+
+        the set of static keys (e.g. mmsi, vessel_name) is stored in
+        ``track['static']``, and the set of dynamic column keys (e.g. time,
+        lon, lat) is stored in ``track['dynamic']``.
+
+        Track is a dict subclass, so existing code using track dictionaries
+        is unaffected, e.g. ``isinstance(track, dict)``, ``{**track}``, and
+        ``json.dumps(track)``. the MMSI, the time, lon, lat, sog, and cog
+        column vectors, and the key sets are also stored in fixed fields,
+        which can be read as attributes, e.g. ``track.time``. the fields are
+        updated by the dict methods of Track which modify the track.
+        instances do not have an attribute ``__dict__``.
+
+        track segments created with :meth:`Track.slice` share static values
+        and key sets with the original track, and contiguous index ranges
+        are sliced without copying the column vectors.
+
+        >>> import numpy as np
+        >>> from aisdb.track import Track
+        >>> track = Track.from_columns(
+        ...     {'mmsi': 316000000},
+        ...     {'time': np.array([0, 60, 120]), 'lon': np.zeros(3),
+        ...      'lat': np.ones(3)})
+        >>> segment = track.slice(slice(1, 3))
+        >>> segment['mmsi'], segment['time']
+        (316000000, array([ 60, 120]))
+        >>> np.shares_memory(segment['lon'], track['lon'])
+        True
+    '''
+    __slots__ = _fields
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if key in _field_keys:
+            object.__setattr__(self, key, value)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        if key in _field_keys:
+            object.__delattr__(self, key)
+
+    def __setattr__(self, key, value):
+        if key not in _field_keys:
+            raise AttributeError(f'Track has no field {key!r}')
+        self[key] = value
+
+    def __delattr__(self, key):
+        if key not in _field_keys:
+            raise AttributeError(f'Track has no field {key!r}')
+        del self[key]
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __repr__(self):
+        return f'Track({super().__repr__()})'
+
+    def __reduce__(self):
+        return Track, (dict(self), )
+
+    def update(self, *args, **kwargs):
+        for key, val in dict(*args, **kwargs).items():
+            self[key] = val
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in _field_keys and key in self:
+            object.__delattr__(self, key)
+        return super().pop(key, *default)
+
+    def popitem(self):
+        key, val = super().popitem()
+        if key in _field_keys:
+            object.__delattr__(self, key)
+        return key, val
+
+    def clear(self):
+        for key in _fields:
+            if key in self:
+                object.__delattr__(self, key)
+        super().clear()
+
+    @classmethod
+    def from_columns(cls, static: dict, columns: dict):
+        ''' create a track from a dictionary of static values and a
+            dictionary of dynamic column vectors
+
+            args:
+                static (dict)
+                    static values, e.g. mmsi and vessel_name
+                columns (dict)
+                    dynamic column vectors, e.g. time, lon, and lat
+
+            returns:
+                :class:`Track`
+        '''
+        track = cls(static)
+        track.update(columns)
+        track['static'] = set(static.keys())
+        track['dynamic'] = set(columns.keys())
+        return track
+
+    def with_columns(self, columns: dict):
+        ''' create a new track with the same static values as this track,
+            and the given dynamic column vectors
+
+            args:
+                columns (dict)
+                    dynamic column vectors. keys should match
+                    ``track['dynamic']``
+
+            returns:
+                :class:`Track`
+        '''
+        static = self['static']
+        track = Track({k: self[k] for k in static})
+        for key, val in columns.items():
+            track[key] = val
+        track['static'] = static
+        track['dynamic'] = self['dynamic']
+        return track
+
+    def slice(self, idx):
+        ''' create a new track with each dynamic column vector indexed by idx
+
+            args:
+                idx (slice, range, or numpy.ndarray)
+                    index range, boolean mask, or array of integer indexes.
+                    slices and ranges with step 1 return views of the
+                    column vectors instead of copies
+
+            returns:
+                :class:`Track`
+        '''
+        if isinstance(idx, range) and idx.step == 1:
+            idx = slice(idx.start, idx.stop)
+        return self.with_columns({
+            k: (self[k] if isinstance(self[k], np.ndarray) else np.asarray(
+                self[k]))[idx]
+            for k in self['dynamic']
+        })
+
+    def copy(self):
+        ''' shallow copy of the track '''
+        return Track(self)
+
+
+def as_track(track):
+    ''' returns the track as a :class:`Track`. track dictionaries created
+        outside of :func:`aisdb.track_gen.TrackGen` are copied to a new
+        Track, without copying their column vectors
+    '''
+    if isinstance(track, Track):
+        return track
+    assert isinstance(track, Mapping), f'got {type(track)}'
+    return Track(track)
@@ -0,0 +1,326 @@
+''' batches of vessel trajectories stored as concatenated column arrays, for
+    processing many short tracks with vectorized numpy operations
+'''
+
+from datetime import timedelta
+import warnings
+
+import numpy as np
+
+from aisdb.gis import Domain, haversine_array
+from aisdb.track import Track
+
+
+class TrackBatch():
+    ''' collection of vessel trajectories stored as a ragged array.
+
+        dynamic column vectors of all tracks are concatenated into a single
+        array for each column, and the rows of the i-th track are
+        ``offsets[i]:offsets[i + 1]``. static values are stored as an array
+        with one value per track. batches can be created from a track
+        generator with :func:`batch_tracks`, and converted back to tracks
+        with :meth:`TrackBatch.tracks` or :func:`unbatch_tracks`.
+
+        attributes:
+            static (dict)
+                static value arrays, with one value for each track
+            columns (dict)
+                concatenated dynamic column vectors
+            offsets (numpy.ndarray)
+                index of the first row of each track. the last offset is the
+                total number of rows
+
+        >>> from datetime import timedelta
+        >>> from aisdb import TrackGen
+        >>> from aisdb.track_batch import batch_tracks, split_timedelta_batch
+        >>> from aisdb.track_batch import unbatch_tracks
+        >>> batches = batch_tracks(TrackGen(qry.gen_qry(), decimate=False))
+        >>> batches = (split_timedelta_batch(b, timedelta(hours=6))
+        ...            for b in batches)
+        >>> for track in unbatch_tracks(batches):
+        ...     print(track['mmsi'], track['time'])
+    '''
+    __slots__ = ('static', 'columns', 'offsets')
+
+    def __init__(self, static: dict, columns: dict, offsets: np.ndarray):
+        self.static = static
+        self.columns = columns
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        for key, col in self.columns.items():
+            assert len(col) == self.offsets[-1], f'bad column length {key}'
+        for key, val in self.static.items():
+            assert len(val) == len(self), f'bad static length {key}'
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self):
+        ''' number of positions in each track '''
+        return np.diff(self.offsets)
+
+    @property
+    def track_index(self):
+        ''' index of the track containing each row '''
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    @classmethod
+    def from_tracks(cls, tracks):
+        ''' concatenate a list of tracks into a batch. all tracks must have
+            the same static and dynamic keys as the first track
+
+            args:
+                tracks (list)
+                    track dictionaries, e.g. from
+                    :func:`aisdb.track_gen.TrackGen`
+
+            returns:
+                :class:`TrackBatch`
+        '''
+        if len(tracks) == 0:
+            raise ValueError('cannot create a batch with no tracks')
+        staticcols, dynamiccols = tracks[0]['static'], tracks[0]['dynamic']
+        lengths = [len(track['time']) for track in tracks]
+        assert min(lengths) > 0, 'cannot batch empty tracks'
+        static = {}
+        for key in staticcols:
+            static[key] = np.empty(len(tracks), dtype=object)
+            static[key][:] = [track[key] for track in tracks]
+        columns = {
+            key: np.concatenate([np.asarray(track[key]) for track in tracks])
+            for key in dynamiccols
+        }
+        return cls(static, columns, np.append(0, np.cumsum(lengths)))
+
+    def tracks(self):
+        ''' yields each track in the batch as a :class:`aisdb.track.Track`.
+            dynamic column vectors are views of the batch columns
+        '''
+        staticcols, dynamiccols = set(self.static), set(self.columns)
+        for i in range(len(self)):
+            lo, hi = self.offsets[i], self.offsets[i + 1]
+            track = Track({k: v[i] for k, v in self.static.items()})
+            track.update({k: v[lo:hi] for k, v in self.columns.items()})
+            track['static'] = staticcols
+            track['dynamic'] = dynamiccols
+            yield track
+
+    def with_columns(self, **columns):
+        ''' create a new batch with additional or replaced dynamic columns.
+            other columns are shared with this batch
+        '''
+        return TrackBatch(self.static, dict(self.columns, **columns),
+                          self.offsets)
+
+    def take(self, mask):
+        ''' create a new batch from rows where mask is True. tracks with no
+            remaining positions are removed from the batch
+
+            args:
+                mask (numpy.ndarray)
+                    boolean array with one value for each row
+        '''
+        mask = np.asarray(mask, dtype=bool)
+        offsets = np.append(0, np.cumsum(mask))[self.offsets]
+        keep = offsets[1:] > offsets[:-1]
+        return TrackBatch(
+            {k: v[keep]
+             for k, v in self.static.items()},
+            {k: v[mask]
+             for k, v in self.columns.items()},
+            np.append(0, offsets[1:][keep]),
+        )
+
+    def split(self, starts):
+        ''' create a new batch where each track is divided into segments.
+            static values are copied to each segment of a track
+
+            args:
+                starts (numpy.ndarray)
+                    boolean array with one value for each row. True where a
+                    new segment should start
+        '''
+        starts = np.array(starts, dtype=bool)
+        starts[self.offsets[:-1]] = True
+        offsets = np.append(np.flatnonzero(starts), self.offsets[-1])
+        idx = np.searchsorted(self.offsets, offsets[:-1], side='right') - 1
+        return TrackBatch({k: v[idx]
+                           for k, v in self.static.items()}, self.columns,
+                          offsets)
+
+
+def batch_tracks(tracks, batchsize: int = 10000):
+    ''' group tracks from a track generator into batches
+
+        args:
+            tracks (aisdb.track_gen.TrackGen)
+                track vectors generator
+            batchsize (int)
+                maximum number of tracks in each batch
+
+        yields:
+            :class:`TrackBatch`
+    '''
+    batch = []
+    for track in tracks:
+        batch.append(track)
+        if len(batch) >= batchsize:
+            yield TrackBatch.from_tracks(batch)
+            batch = []
+    if len(batch) > 0:
+        yield TrackBatch.from_tracks(batch)
+
+
+def unbatch_tracks(batches):
+    ''' yields each track from a generator of :class:`TrackBatch` '''
+    for batch in batches:
+        yield from batch.tracks()
+
+
+def _next_delta(batch, values):
+    ''' difference between each row and the next row of the same track.
+        the last row of each track is set to NaN
+    '''
+    delta = np.full(batch.offsets[-1], np.nan)
+    delta[:-1] = values
+    delta[batch.offsets[1:] - 1] = np.nan
+    return delta
+
+
+def delta_seconds_batch(batch):
+    ''' compute elapsed time between each position and the next position of
+        the same track. the last position of each track is NaN.
+
+        also see :func:`aisdb.gis.delta_seconds`
+    '''
+    time = batch.columns['time'].astype(np.int64)
+    return _next_delta(batch, np.diff(time))
+
+
+def delta_meters_batch(batch):
+    ''' compute haversine distance in meters between each position and the
+        next position of the same track. the last position of each track is
+        NaN.
+
+        also see :func:`aisdb.gis.delta_meters`
+    '''
+    lon, lat = batch.columns['lon'], batch.columns['lat']
+    return _next_delta(batch,
+                       haversine_array(lon[:-1], lat[:-1], lon[1:], lat[1:]))
+
+
+def delta_knots_batch(batch):
+    ''' compute speed over ground in knots between each position and the
+        next position of the same track using (haversine distance / time).
+        the last position of each track is NaN.
+
+        also see :func:`aisdb.gis.delta_knots`
+    '''
+    seconds = np.fmax(delta_seconds_batch(batch), 1)
+    return delta_meters_batch(batch) / seconds * 1.9438445
+
+
+def split_timedelta_batch(batch, maxdelta=timedelta(weeks=2)):
+    ''' partitions tracks where delta time exceeds maxdelta.
+
+        also see :func:`aisdb.track_gen.split_timedelta`
+
+        args:
+            batch (:class:`TrackBatch`)
+                batch of tracks
+            maxdelta (datetime.timedelta)
+                threshold at which tracks should be
+                partitioned
+
+        returns:
+            :class:`TrackBatch`
+    '''
+    starts = np.zeros(batch.offsets[-1], dtype=bool)
+    starts[1:] = np.diff(batch.columns['time'].astype(
+        np.int64)) >= maxdelta.total_seconds()
+    return batch.split(starts)
+
+
+def min_speed_filter_batch(batch, minspeed):
+    ''' remove positions where the computed speed to the next position is
+        less than minspeed. the last position of each track uses the speed
+        from the previous position, and tracks with a single position are
+        not filtered.
+
+        also see :func:`aisdb.track_gen.min_speed_filter`
+
+        returns:
+            :class:`TrackBatch`
+    '''
+    knots = delta_knots_batch(batch)
+    last = batch.offsets[1:] - 1
+    single = batch.lengths == 1
+    knots[last[~single]] = knots[last[~single] - 1]
+    mask = knots >= minspeed
+    mask[last[single]] = True
+    return batch.take(mask)
+
+
+def interp_time_batch(batch, step=timedelta(minutes=10)):
+    ''' linear interpolation of all tracks in the batch on temporal axis.
+        tracks with a single position are skipped.
+
+        also see :func:`aisdb.interp.interp_time`
+
+        args:
+            batch (:class:`TrackBatch`)
+                batch of tracks
+            step (datetime.timedelta)
+                interpolation interval
+
+        returns:
+            :class:`TrackBatch`
+    '''
+    if np.any(batch.lengths <= 1):
+        warnings.warn('cannot interpolate track of length 1, skipping...')
+        batch = batch.take(np.repeat(batch.lengths > 1, batch.lengths))
+    if len(batch) == 0:
+        return batch
+    step = int(step.total_seconds())
+    time = batch.columns['time'].astype(np.int64)
+    t0 = time[batch.offsets[:-1]]
+    t1 = time[batch.offsets[1:] - 1]
+
+    # number of intervals for each track, as in np.arange(t0, t1 + step, step)
+    counts = -((t0 - t1) // step) + 1
+    offsets = np.append(0, np.cumsum(counts))
+    idx = np.repeat(np.arange(len(batch)), counts)
+    intervals = t0[idx] + (np.arange(offsets[-1]) - offsets[idx]) * step
+
+    # index of the position preceding each interval in the same track,
+    # searching by track index and time. epoch times are less than 2**32
+    keys = (batch.track_index << 32) + time
+    i = np.searchsorted(keys, (idx << 32) + intervals, side='right') - 1
+    i = np.clip(i, batch.offsets[idx], batch.offsets[idx + 1] - 2)
+    dt = time[i + 1] - time[i]
+    frac = np.clip((intervals - time[i]) / np.where(dt > 0, dt, 1), 0, 1)
+
+    columns = {'time': intervals}
+    for key, col in batch.columns.items():
+        if key == 'time':
+            continue
+        col = col.astype(float)
+        columns[key] = col[i] + (col[i + 1] - col[i]) * frac
+    return TrackBatch(batch.static, columns, offsets)
+
+
+def fence_tracks_batch(batch, domain):
+    ''' compute points-in-polygons for vessel positions within domain
+        polygons. the zone code of each position is stored in the 'in_zone'
+        column, as an index of ``domain.zone_names``.
+
+        also see :func:`aisdb.track_gen.fence_tracks`
+
+        returns:
+            :class:`TrackBatch`
+    '''
+    assert isinstance(domain, Domain), 'Not a domain object'
+    if 'in_zone' in batch.columns.keys():
+        return batch
+    return batch.with_columns(in_zone=domain.zones_for_points(
+        batch.columns['lon'], batch.columns['lat']))
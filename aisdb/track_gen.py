@@ -1,5 +1,6 @@
 ''' generation, segmentation, and filtering of vessel trajectories '''
 
+from collections.abc import Mapping
 from functools import reduce
 from datetime import timedelta
 import sqlite3
@@ -11,6 +12,7 @@ from aisdb.aisdb import simplify_linestring_idx
 from aisdb.gis import delta_knots
 from aisdb.proc_util import _segment_rng
 from aisdb import Domain
+from aisdb.track import Track, as_track
 
 staticcols = set([
     'mmsi', 'vessel_name', 'ship_type', 'ship_type_txt', 'dim_bow',
@@ -36,38 +38,52 @@ def _segment_longitude(track, tolerance=300):
 
     segments_idx = reduce(np.append, ([0], diff, [track['time'].size]))
     for i in range(segments_idx.size - 1):
-        tracksplit = dict(
-            **{k: track[k]
-               for k in track['static']},
-            **{
-                k: track[k][segments_idx[i]:segments_idx[i + 1]]
-                for k in track['dynamic']
-            },
-            static=track['static'],
-            dynamic=track['dynamic'],
-        )
+        tracksplit = track.slice(slice(segments_idx[i], segments_idx[i + 1]))
         assert 'time' in tracksplit.keys()
         yield tracksplit
 
 
 def _yieldsegments(rows, staticcols, dynamiccols, decimate=0.0001):
+    columns = dict(
+        **{col: [rows[0][col]]
+           for col in staticcols},
+        longitude=np.array([r['longitude'] for r in rows], dtype=float),
+        latitude=np.array([r['latitude'] for r in rows], dtype=float),
+        time=np.array([r['time'] for r in rows], dtype=np.uint32),
+        sog=np.array([r['sog'] for r in rows], dtype=np.float32),
+        cog=np.array([r['cog'] for r in rows], dtype=np.uint32),
+    )
+    yield from _yieldsegments_columnar(columns, staticcols, dynamiccols,
+                                       decimate)
+
+
+def _yieldsegments_columnar(columns,
+                            staticcols,
+                            dynamiccols,
+                            decimate=0.0001):
+    ''' convert a dictionary of column arrays for a single MMSI to track
+        segments
+    '''
     if decimate is True:
         decimate = 0.0001
-    lon = np.array([r['longitude'] for r in rows], dtype=float)
-    lat = np.array([r['latitude'] for r in rows], dtype=float)
-    time = np.array([r['time'] for r in rows], dtype=np.uint32)
+    lon = np.asarray(columns['longitude'], dtype=float)
+    lat = np.asarray(columns['latitude'], dtype=float)
+    time = np.asarray(columns['time'], dtype=np.uint32)
     if decimate is not False:
         idx = simplify_linestring_idx(lon, lat, precision=decimate)
     else:
         idx = np.array(range(len(lon)))
-    trackdict = dict(
-        **{col: rows[0][col]
-           for col in staticcols},
+    trackdict = Track(
+        **{
+            col: (columns[col][0].item() if isinstance(
+                columns[col][0], np.generic) else columns[col][0])
+            for col in staticcols
+        },
         lon=lon[idx].astype(np.float32),
         lat=lat[idx].astype(np.float32),
         time=time[idx],
-        sog=np.array([r['sog'] for r in rows], dtype=np.float32)[idx],
-        cog=np.array([r['cog'] for r in rows], dtype=np.uint32)[idx],
+        sog=np.asarray(columns['sog'], dtype=np.float32)[idx],
+        cog=np.asarray(columns['cog'], dtype=np.uint32)[idx],
         static=staticcols,
         dynamic=dynamiccols,
     )
@@ -92,15 +108,16 @@ def TrackGen(rowgen: iter, decimate: False) -> dict:
         args:
             rowgen (aisdb.database.dbqry.DBQuery.gen_qry())
                 DBQuery rows generator. Yields rows returned
-                by a database query
+                by a database query, or dictionaries of column arrays
+                if the query was made with ``gen_qry(columnar=True)``
             decimate (bool)
                 if True, linear curve decimation will be applied to reduce
                 the number of unnecessary datapoints
 
         yields:
-            dictionary containing track column vectors.
-            static data (e.g. mmsi, name, geometry) will be stored as
-            scalar values
+            :class:`aisdb.track.Track` dictionary containing track column
+            vectors. static data (e.g. mmsi, name, geometry) will be stored
+            as scalar values
 
         >>> import os
         >>> import numpy as np
@@ -133,16 +150,21 @@ def TrackGen(rowgen: iter, decimate: False) -> dict:
     for rows in rowgen:
         if (rows is None or len(rows) == 0):
             raise EmptyRowsException('rows cannot be empty')
-        assert isinstance(
+        columnar = isinstance(rows, dict)
+        assert columnar or isinstance(
             rows[0], (sqlite3.Row, dict)), f'unknown row type: {type(rows[0])}'
         if firstrow:
-            keys = set(rows[0].keys())
+            keys = set(rows.keys() if columnar else rows[0].keys())
             static = keys.intersection(set(staticcols))
             dynamiccols = keys ^ static
             dynamiccols = dynamiccols.difference(set(['longitude',
                                                       'latitude']))
             dynamiccols = dynamiccols.union(set(['lon', 'lat']))
             firstrow = False
+        if columnar:
+            yield from _yieldsegments_columnar(rows, static, dynamiccols,
+                                               decimate)
+            continue
         for track in _yieldsegments(rows, static, dynamiccols, decimate):
             yield track
 
@@ -157,40 +179,29 @@ def split_timedelta(tracks, maxdelta=timedelta(weeks=2)):
                 threshold at which tracks should be
                 partitioned
     '''
-    for track in tracks:
+    for track in map(as_track, tracks):
         for rng in _segment_rng(track, maxdelta):
             assert len(rng) > 0
-            yield dict(
-                **{k: track[k]
-                   for k in track['static']},
-                **{
-                    k: np.array(track[k], dtype=type(track[k][0]))[rng]
-                    for k in track['dynamic']
-                },
-                static=track['static'],
-                dynamic=track['dynamic'],
-            )
+            yield track.slice(rng)
 
 
 def fence_tracks(tracks, domain):
     ''' compute points-in-polygons for vessel positions within domain polygons
 
-        yields track dictionaries
+        yields track dictionaries. the zone of each position is stored in
+        the 'in_zone' column as an array of integer zone codes, with code 0
+        for positions outside of all zones. zone names can be looked up
+        with ``domain.zone_names[track['in_zone']]``.
 
-        Also see zone_mask()
+        Also see zone_mask() and :meth:`aisdb.gis.Domain.zones_for_points`
     '''
     assert isinstance(domain, Domain), 'Not a domain object'
 
     for track in tracks:
-        assert isinstance(track, dict)
+        assert isinstance(track, Mapping)
         if 'in_zone' not in track.keys():
-            track['in_zone'] = np.array(
-                [
-                    domain.point_in_polygon(x, y)
-                    for x, y in zip(track['lon'], track['lat'])
-                ],
-                dtype=object,
-            )
+            track['in_zone'] = domain.zones_for_points(
+                track['lon'], track['lat'])
             track['dynamic'] = set(track['dynamic']).union(set(['in_zone']))
         yield track
 
@@ -203,31 +214,17 @@ def zone_mask(tracks, domain):
 
         also see fence_tracks()
     '''
-    for track in fence_tracks(tracks, domain):
-        mask = track['in_zone'] != 'Z0'
-        yield dict(
-            **{k: track[k]
-               for k in track['static']},
-            **{k: track[k][mask]
-               for k in track['dynamic']},
-            static=track['static'],
-            dynamic=track['dynamic'],
-        )
+    for track in map(as_track, fence_tracks(tracks, domain)):
+        mask = track['in_zone'] != 0
+        yield track.slice(mask)
 
 
 def min_speed_filter(tracks, minspeed):
-    for track in tracks:
+    for track in map(as_track, tracks):
         if len(track['time']) == 1:
             yield track
             continue
         deltas = delta_knots(track)
         deltas = np.append(deltas, [deltas[-1]])
         mask = deltas >= minspeed
-        yield dict(
-            **{k: track[k]
-               for k in track['static']},
-            **{k: track[k][mask]
-               for k in track['dynamic']},
-            static=track['static'],
-            dynamic=track['dynamic'],
-        )
+        yield track.slice(mask)
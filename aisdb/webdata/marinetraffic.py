@@ -1,5 +1,6 @@
 ''' scrape vessel information such as deadweight tonnage from marinetraffic.com '''
 
+from collections.abc import Mapping
 import os
 
 import numpy as np
@@ -177,7 +178,7 @@ def vessel_info(tracks: iter, dbconn: sqlite3.Connection):
         )
     meta = _vessel_info_dict(dbconn)
     for track in tracks:
-        assert isinstance(track, dict)
+        assert isinstance(track, Mapping)
         track['static'] = set(track['static']).union({'marinetraffic_info'})
         if track['mmsi'] in meta.keys():
             track['marinetraffic_info'] = meta[track['mmsi']]
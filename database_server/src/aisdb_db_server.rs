@@ -286,7 +286,82 @@ pub fn track_generator(
     }
 }
 
+/// Returns true if the partition catalog table exists.
+/// The catalog is maintained by the Python package when data is ingested
+fn has_partition_catalog(pg: &mut Client) -> Result<bool, Box<dyn std::error::Error>> {
+    let row = pg.query_one("SELECT to_regclass('partition_catalog') IS NOT NULL", &[])?;
+    Ok(row.get(0))
+}
+
+/// SQL condition which is true for partition catalog rows computed after the
+/// end of their month. Data may still be added to the current month by the
+/// receiver, so other rows are not used to prune months
+const CATALOG_COMPLETE: &str =
+    "updated_at >= extract(epoch FROM to_date(month, 'YYYYMM') + interval '1 month')";
+
+/// Remove months from the query that are empty, or outside of the requested
+/// time range or bounding box according to the partition catalog.
+/// Months missing from the catalog, or with statistics computed before the
+/// end of the month, will be kept
+fn prune_months(pg: &mut Client, qry: &mut QueryTracks) -> Result<(), Box<dyn std::error::Error>> {
+    if !has_partition_catalog(pg)? {
+        return Ok(());
+    }
+    let mut sql = format!("SELECT month FROM partition_catalog WHERE {} AND (", CATALOG_COMPLETE);
+    sql.push_str("row_count = 0");
+    sql.push_str(" OR time_max < $1 OR time_min > $2");
+    sql.push_str(" OR longitude_max < $3 OR longitude_min > $4");
+    sql.push_str(" OR latitude_max < $5 OR latitude_min > $6)");
+    let area = &qry.area;
+    let skip: Vec<String> = pg
+        .query(
+            &sql,
+            &[&qry.start, &qry.end, &area.x0, &area.x1, &area.y0, &area.y1],
+        )?
+        .iter()
+        .map(|r| r.get(0))
+        .collect();
+    let months: Vec<String> = qry
+        .month_strings
+        .iter()
+        .filter(|m| !skip.contains(m))
+        .cloned()
+        .collect();
+    // at least one table is needed to build the query.
+    // rows from the remaining month are excluded by the query filters
+    if !months.is_empty() {
+        qry.month_strings = months;
+    } else {
+        qry.month_strings.truncate(1);
+    }
+    Ok(())
+}
+
+/// Returns the range of message times in the database.
+/// Months with a complete partition catalog row span their message times,
+/// and other months with a dynamic table span the entire month
 fn query_validrange(pg: &mut Client) -> Result<(i32, i32), Box<dyn std::error::Error>> {
+    if has_partition_catalog(pg)? {
+        let mut sql = "WITH months AS (SELECT substring(table_name FROM 5 FOR 6) AS month".to_string();
+        sql.push_str(" FROM information_schema.tables");
+        sql.push_str(" WHERE table_schema='public' AND table_type='BASE TABLE'");
+        sql.push_str(" AND table_name LIKE 'ais\\_______\\_dynamic'),");
+        sql.push_str(" ranges AS (SELECT to_date(month, 'YYYYMM') AS month_start, row_count,");
+        sql.push_str(" time_min, time_max, ");
+        sql.push_str(CATALOG_COMPLETE);
+        sql.push_str(" AS complete FROM months LEFT JOIN partition_catalog USING (month))");
+        sql.push_str(" SELECT MIN(CASE WHEN complete THEN time_min");
+        sql.push_str(" ELSE extract(epoch FROM month_start)::integer END),");
+        sql.push_str(" MAX(CASE WHEN complete THEN time_max");
+        sql.push_str(" ELSE extract(epoch FROM month_start + interval '1 month')::integer - 1 END)");
+        sql.push_str(" FROM ranges WHERE complete IS NOT TRUE OR row_count > 0");
+        let row = pg.query_one(&sql, &[])?;
+        if let (Some(start), Some(end)) =
+            (row.get::<_, Option<i32>>(0), row.get::<_, Option<i32>>(1))
+        {
+            return Ok((start, end));
+        }
+    }
     let mut sql = "SELECT table_name FROM information_schema.tables".to_string();
     sql.push_str(" WHERE table_schema='public' AND table_type='BASE TABLE'");
     sql.push_str(" AND table_name LIKE '%_dynamic'");
@@ -414,7 +489,8 @@ fn query_dynamic_tables(
     sql.push_str(&filter);
 
     // parse client request into query parameters
-    let qry = parse_request(req).expect("parsing request params");
+    let mut qry = parse_request(req).expect("parsing request params");
+    prune_months(pg, &mut qry).expect("reading partition catalog");
 
     // perform UNION of data request for each monthly table
     let sql_union = qry
@@ -464,7 +540,8 @@ fn query_merged_tables(
     );
 
     // parse client request into query parameters
-    let qry = parse_request(req).expect("parsing request params");
+    let mut qry = parse_request(req).expect("parsing request params");
+    prune_months(pg, &mut qry).expect("reading partition catalog");
     let area = qry.area;
 
     // perform UNION of data request for each monthly table